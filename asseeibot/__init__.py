@@ -5,12 +5,18 @@ from typing import Any
 from aiosseclient import aiosseclient  # type: ignore
 
 import config
+from asseeibot import runtime_variables
 from asseeibot.helpers.argparse_setup import setup_argparse_and_return_args
 from asseeibot.helpers.console import console
+from asseeibot.models.crossref.response_cache import CrossrefResponseCache
 from asseeibot.models.match_cache import MatchCache
 from asseeibot.models.fuzzy_match import FuzzyMatch
+from asseeibot.models.ontology_dataframe import Dataframe
+from asseeibot.models.subject_match_table import SubjectMatchTableBuilder
 from asseeibot.models.wikimedia.enums import WikimediaSite
 from asseeibot.models.wikimedia.event_stream import EventStream
+from asseeibot.models.wikimedia.wikidata.doi_bloom_filter import DoiBloomFilterBuilder
+from asseeibot.models.wikimedia.wikidata.doi_index import DoiIndexBuilder
 from asseeibot.models.wikimedia.wikidata.entity import EntityId
 
 logging.basicConfig(level=config.loglevel)
@@ -26,6 +32,59 @@ def delete_match(args: Any):
         console.print("Match not found")
 
 
+def build_doi_bloom_filter(args: Any):
+    if config.doi_bloom_filter_filename is None:
+        raise ValueError("doi_bloom_filter_filename is not set in the config")
+    with console.status(f"Building the DOI Bloom filter from {args.build_doi_bloom_filter}..."):
+        number_of_dois = DoiBloomFilterBuilder(
+            dump_filename=args.build_doi_bloom_filter,
+            false_positive_rate=config.doi_bloom_filter_false_positive_rate
+        ).build(filename=config.doi_bloom_filter_filename)
+    console.print(f"Wrote {number_of_dois} DOIs to {config.doi_bloom_filter_filename}")
+
+
+def prewarm_crossref_cache(args: Any):
+    if config.crossref_cache_filename is None:
+        raise ValueError("crossref_cache_filename is not set in the config")
+    cache = CrossrefResponseCache(
+        filename=config.crossref_cache_filename,
+        ttl_seconds=config.crossref_cache_ttl_days * 86400,
+        max_megabytes=config.crossref_cache_max_megabytes
+    )
+    with console.status(f"Loading the works in {args.prewarm_crossref_cache}..."):
+        number_of_works = cache.prewarm(filename=args.prewarm_crossref_cache)
+    console.print(f"Loaded {number_of_works} works into the Crossref cache")
+
+
+def build_doi_index(args: Any):
+    if config.doi_index_filename is None:
+        raise ValueError("doi_index_filename is not set in the config")
+    with console.status(f"Building the DOI index from {args.build_doi_index}..."):
+        number_of_dois = DoiIndexBuilder(dump_filename=args.build_doi_index).build(
+            filename=config.doi_index_filename
+        )
+    console.print(f"Wrote {number_of_dois} DOIs to {config.doi_index_filename}")
+
+
+def build_subject_match_table(args: Any):
+    if config.subject_match_table_filename is None:
+        raise ValueError("subject_match_table_filename is not set in the config")
+    with console.status("Loading the ontology..."):
+        Dataframe().prepare_the_dataframe()
+    with console.status(f"Matching the subjects in {args.build_subject_match_table}..."):
+        number_of_subjects = SubjectMatchTableBuilder(
+            vocabulary_filename=args.build_subject_match_table
+        ).build(
+            filename=config.subject_match_table_filename,
+            dataframe=runtime_variables.ontology_dataframe,
+            engine=runtime_variables.ontology_scoring_engine,
+            k=config.number_of_candidates_to_show,
+            label_threshold=config.label_threshold_ratio,
+            alias_threshold=config.alias_threshold_ratio
+        )
+    console.print(f"Wrote the matches of {number_of_subjects} subjects to {config.subject_match_table_filename}")
+
+
 def main():
     # logger = logging.getLogger(__name__)
     # print("Running main")
@@ -34,7 +93,26 @@ def main():
         console.print(args)
     if args.delete_match:
         delete_match(args)
+    elif args.build_doi_index:
+        build_doi_index(args)
+    elif args.build_doi_bloom_filter:
+        build_doi_bloom_filter(args)
+    elif args.prewarm_crossref_cache:
+        prewarm_crossref_cache(args)
+    elif args.build_subject_match_table:
+        build_subject_match_table(args)
     else:
-        console.print("Looking for new DOIs from the WikimediaEvent stream")
+        if args.replay:
+            console.print(f"Looking for new DOIs in the events recorded in {args.replay}")
+        elif args.synthetic:
+            console.print(f"Generating {args.synthetic} synthetic events")
+        else:
+            console.print("Looking for new DOIs from the WikimediaEvent stream")
         # We support only the English Wikipedia for now
-        EventStream(language_code="en", event_site=WikimediaSite.WIKIPEDIA)
+        EventStream(language_code="en",
+                    event_site=WikimediaSite.WIKIPEDIA,
+                    replay_file=args.replay,
+                    replay_speed=args.replay_speed,
+                    synthetic_events=args.synthetic,
+                    record_file=args.record,
+                    process_events=not args.no_processing)
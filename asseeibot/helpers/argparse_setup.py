@@ -18,4 +18,59 @@ NOTE: we do not yet support removing statements from Wikidata based on the bad m
         nargs='?',
         help="Delete a match from your local cache of earlier matches."
     )
+    parser.add_argument(
+        '--replay',
+        metavar="FILE",
+        help="Replay recorded events from a JSONL file (optionally gzipped) instead of the live stream."
+    )
+    parser.add_argument(
+        '--replay-speed',
+        type=float,
+        default=0,
+        metavar="N",
+        help="Replay the events at N times the pace of their original timestamps. 0 = as fast as possible."
+    )
+    parser.add_argument(
+        '--record',
+        metavar="FILE",
+        help="Record the live stream to a JSONL file (gzipped if it ends in .gz) that can be replayed later."
+    )
+    parser.add_argument(
+        '--synthetic',
+        type=int,
+        default=0,
+        metavar="N",
+        help="Generate N synthetic events instead of reading the live stream."
+    )
+    parser.add_argument(
+        '--no-processing',
+        action='store_true',
+        help="Only read, triage and queue the events. "
+             "Useful for measuring the throughput of the pipeline without network access."
+    )
+    parser.add_argument(
+        '--build-doi-index',
+        metavar="DUMP",
+        help="Build the offline DOI index from a Wikidata JSON dump or a CSV/TSV extract "
+             "with the item and the DOI (optionally compressed) and exit."
+    )
+    parser.add_argument(
+        '--build-doi-bloom-filter',
+        metavar="DUMP",
+        help="Build the DOI Bloom filter from a Wikidata JSON dump or a CSV/TSV file "
+             "with the DOIs in the last column (optionally compressed) and exit."
+    )
+    parser.add_argument(
+        '--prewarm-crossref-cache',
+        metavar="FILE",
+        help="Load works from a JSONL file (optionally gzipped) with Crossref API responses "
+             "or messages into the Crossref cache and exit."
+    )
+    parser.add_argument(
+        '--build-subject-match-table',
+        metavar="FILE",
+        help="Match the Crossref subjects in a file with one subject per line (optionally compressed) "
+             "and the parts they are split into against the ontology and exit. "
+             "The table is used instead of matching these subjects live."
+    )
     return parser.parse_args()
@@ -1,12 +1,12 @@
 from rich.console import Console
 from rich.table import Table
 
-from asseeibot.models.crossref.work import CrossrefWork
+from asseeibot.models.crossref.work import CrossrefWorkBase
 
 console = Console()
 
 
-def print_match_table(crossref_work: CrossrefWork):
+def print_match_table(crossref_work: CrossrefWorkBase):
     table = Table(title="Matches approved by you or from your previous choices")
     table.add_column(f"Q-item")
     table.add_column(f"Label")
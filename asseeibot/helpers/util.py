@@ -7,8 +7,16 @@ if sys.version_info.major == 3 and sys.version_info.minor == 7:
 else:
     from typing import Union, Literal
 
+import bz2
+import gzip
+import re
+from typing import IO, Optional
+from urllib.parse import unquote
+
 import requests
 
+doi_prefix_pattern = re.compile(r"^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)", re.IGNORECASE)
+
 
 def yes_no_question(message: str):
     # https://www.quora.com/
@@ -67,3 +75,26 @@ def check_if_pdf(response) -> bool:
             return True
     else:
         return False
+
+
+def normalize_doi(doi: str) -> Optional[str]:
+    """DOIs are case-insensitive and Wikidata stores them in upper case.
+    Returns None if the string does not look like a DOI"""
+    if doi is None:
+        return None
+    doi = doi_prefix_pattern.sub("", unquote(doi.strip())).strip().rstrip(".,;")
+    if not doi.startswith("10."):
+        return None
+    return doi.upper()
+
+
+def open_text_file(filename: str, mode: str = "r") -> IO:
+    """Files ending in .gz or .bz2 are compressed"""
+    if filename is None or filename == "":
+        raise ValueError("filename was None or empty string")
+    if filename.endswith(".gz"):
+        return gzip.open(filename, f"{mode}t", encoding="utf-8")
+    elif filename.endswith(".bz2"):
+        return bz2.open(filename, f"{mode}t", encoding="utf-8")
+    else:
+        return open(filename, mode, encoding="utf-8")
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import re
+from enum import Enum
+from time import monotonic
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+from aiohttp import ClientError, ClientResponse, ClientSession, ClientTimeout, TCPConnector
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class CrossrefFetchResult(Enum):
+    FOUND = "found"
+    NOT_FOUND = "not found"
+    # The lookup failed and can be tried again later
+    RETRYABLE = "retryable"
+
+
+class CrossrefFetch(NamedTuple):
+    result: CrossrefFetchResult
+    message: Optional[Dict[str, Any]] = None
+
+
+class CrossrefClient:
+    """This fetches works from the Crossref REST API over a pooled session
+
+    Crossref tells us how many requests we may make per interval in the
+    X-Rate-Limit-Limit and X-Rate-Limit-Interval headers. The starts of the
+    requests are spaced out to stay inside that and the spacing is adapted
+    to the headers of every response. At most max_concurrent_requests are
+    in flight at a time and concurrent fetches of the same DOI share one
+    request. Errors are returned as retryable fetches.
+
+    Many works are fetched with one /works?filter=doi:A,doi:B query and
+    the works that don't come back are fetched one by one.
+
+    The workers run in threads so they call the blocking methods which
+    run the fetches on the event loop of the EventStream."""
+    api_url: str = "https://api.crossref.org/works/"
+    batch_size: int = 20
+    in_flight: Dict[str, asyncio.Future] = None
+    loop: asyncio.AbstractEventLoop = None
+    mailto: str = None
+    max_concurrent_requests: int = 5
+    next_request_time: float = 0
+    number_of_requests: int = 0
+    # Crossref allowed 50 requests per second when this was written
+    seconds_between_requests: float = 0.02
+    semaphore: asyncio.Semaphore = None
+    session: Optional[ClientSession] = None
+    spacing_lock: asyncio.Lock = None
+    timeout_seconds: float = 30
+
+    def __init__(self,
+                 loop: asyncio.AbstractEventLoop = None,
+                 mailto: str = None,
+                 max_concurrent_requests: int = 5,
+                 timeout_seconds: float = 30,
+                 batch_size: int = 20):
+        if loop is None:
+            raise ValueError("loop was None")
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive int")
+        self.batch_size = batch_size
+        self.loop = loop
+        self.mailto = mailto
+        self.max_concurrent_requests = max_concurrent_requests
+        self.timeout_seconds = timeout_seconds
+        self.in_flight = dict()
+
+    def __adapt_to_the_rate_limit__(self, response: ClientResponse):
+        limit = response.headers.get("X-Rate-Limit-Limit")
+        interval = response.headers.get("X-Rate-Limit-Interval")
+        if limit is not None and interval is not None:
+            # The interval looks like "1s"
+            match = re.match(r"^(\d+(?:\.\d+)?)s$", interval.strip())
+            if match is not None and limit.strip().isdigit() and int(limit) > 0:
+                seconds_between_requests = float(match.group(1)) / int(limit)
+                if seconds_between_requests != self.seconds_between_requests:
+                    logger.info(f"Crossref allows {limit} requests per {interval}")
+                    self.seconds_between_requests = seconds_between_requests
+
+    async def __get__(self, doi: str) -> CrossrefFetch:
+        status, data = await self.__request__(url=self.api_url + quote(doi))
+        if status == 200:
+            return CrossrefFetch(result=CrossrefFetchResult.FOUND, message=data.get("message"))
+        elif status == 404:
+            return CrossrefFetch(result=CrossrefFetchResult.NOT_FOUND)
+        else:
+            return CrossrefFetch(result=CrossrefFetchResult.RETRYABLE)
+
+    async def __get_batch__(self, dois: List[str]) -> Dict[str, CrossrefFetch]:
+        """Fetch up to batch_size works with one filter query. The works
+        that don't come back are fetched one by one and so are all of
+        them if the query fails"""
+        status, data = await self.__request__(
+            url=self.api_url.rstrip("/"),
+            params={"filter": ",".join(f"doi:{doi}" for doi in dois), "rows": str(len(dois))}
+        )
+        fetches = dict()
+        missing_dois = []
+        if status == 200:
+            messages = {item["DOI"].lower(): item
+                        for item in data.get("message", {}).get("items", []) if "DOI" in item}
+            for doi in dois:
+                message = messages.get(doi.lower())
+                if message is not None:
+                    fetches[doi] = CrossrefFetch(result=CrossrefFetchResult.FOUND, message=message)
+                else:
+                    missing_dois.append(doi)
+        else:
+            logger.warning(f"Could not fetch a batch of {len(dois)} works, fetching them one by one")
+            missing_dois = dois
+        if len(missing_dois) > 0:
+            logger.debug(f"Fetching {len(missing_dois)} works one by one")
+            # The DOIs of the batch are in flight already so they are not fetched with fetch_work
+            for doi, fetch in zip(missing_dois, await asyncio.gather(*[self.__get__(doi)
+                                                                       for doi in missing_dois])):
+                fetches[doi] = fetch
+        return fetches
+
+    @staticmethod
+    async def __get_from_the_batch__(batch: asyncio.Future, doi: str) -> CrossrefFetch:
+        return (await batch)[doi]
+
+    async def __request__(self, url: str, params: Dict[str, str] = None) -> Tuple[Optional[int], Any]:
+        """Returns the status and the JSON. The status is None if the request failed"""
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+            self.spacing_lock = asyncio.Lock()
+        params = dict(params or {})
+        if self.mailto:
+            params["mailto"] = self.mailto
+        async with self.semaphore:
+            await self.__wait_for_our_turn__()
+            self.number_of_requests += 1
+            try:
+                async with self.__get_session__().get(url, params=params) as response:
+                    self.__adapt_to_the_rate_limit__(response)
+                    if response.status == 200:
+                        return response.status, await response.json()
+                    elif response.status == 404:
+                        return response.status, None
+                    elif response.status == 429:
+                        logger.warning("Crossref says we are making too many requests, slowing down")
+                        self.seconds_between_requests *= 2
+                    else:
+                        logger.error(f"Got {response.status} from Crossref")
+            except (ClientError, asyncio.TimeoutError, ValueError) as e:
+                logger.error(f"Could not fetch {url} from Crossref: {e}")
+        return None, None
+
+    def __get_session__(self) -> ClientSession:
+        if self.session is None or self.session.closed:
+            user_agent = config.user_agent
+            if self.mailto:
+                # This gets us into the polite pool
+                user_agent = f"{user_agent} (mailto:{self.mailto})"
+            self.session = ClientSession(
+                connector=TCPConnector(limit=self.max_concurrent_requests),
+                headers={"User-Agent": user_agent},
+                timeout=ClientTimeout(total=self.timeout_seconds)
+            )
+        return self.session
+
+    def __start_batch__(self, dois: List[str]):
+        batch = asyncio.ensure_future(self.__get_batch__(dois))
+        for doi in dois:
+            future = asyncio.ensure_future(self.__get_from_the_batch__(batch, doi))
+            self.in_flight[doi] = future
+            future.add_done_callback(lambda _, doi=doi: self.in_flight.pop(doi, None))
+
+    async def __wait_for_our_turn__(self):
+        async with self.spacing_lock:
+            now = monotonic()
+            if self.next_request_time > now:
+                await asyncio.sleep(self.next_request_time - now)
+            self.next_request_time = max(now, self.next_request_time) + self.seconds_between_requests
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def fetch_work(self, doi: str) -> CrossrefFetch:
+        if doi is None or doi == "":
+            raise ValueError("doi was None or empty string")
+        future = self.in_flight.get(doi)
+        if future is None:
+            future = asyncio.ensure_future(self.__get__(doi))
+            self.in_flight[doi] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(doi, None))
+        # Shielded because the future can be shared by several callers
+        return await asyncio.shield(future)
+
+    async def fetch_works(self, dois: List[str]) -> List[CrossrefFetch]:
+        """Fetch the works in batches with the filter query. The batches are fetched concurrently
+
+        Every DOI of a batch is in flight until the batch is done so
+        concurrent fetches of it share the batch"""
+        if self.batch_size > 1:
+            # A comma would split the filter so those DOIs are fetched one by one
+            batchable_dois = list(dict.fromkeys(doi for doi in dois
+                                                if "," not in doi and doi not in self.in_flight))
+            for start in range(0, len(batchable_dois), self.batch_size):
+                self.__start_batch__(batchable_dois[start:start + self.batch_size])
+        unique_dois = list(dict.fromkeys(dois))
+        fetches = dict(zip(unique_dois, await asyncio.gather(*[self.fetch_work(doi) for doi in unique_dois])))
+        return [fetches[doi] for doi in dois]
+
+    def fetch_work_blocking(self, doi: str) -> CrossrefFetch:
+        """This is called from the worker threads, never from the event loop"""
+        return asyncio.run_coroutine_threadsafe(self.fetch_work(doi), self.loop).result()
+
+    def fetch_works_blocking(self, dois: List[str]) -> List[CrossrefFetch]:
+        """Fetch the works concurrently. This is called from the worker threads"""
+        return asyncio.run_coroutine_threadsafe(self.fetch_works(dois), self.loop).result()
@@ -1,16 +1,18 @@
 import logging
 from time import sleep
-from typing import Any, Dict
+from typing import Any
 
-from caseconverter import snakecase
 from habanero import Crossref
 from pydantic.dataclasses import dataclass
 from requests import HTTPError
 
 import config
+from asseeibot import runtime_variables
 from asseeibot.helpers.console import console, print_match_table
+from asseeibot.models.crossref.client import CrossrefFetch, CrossrefFetchResult
 from asseeibot.models.crossref.enums import CrossrefEntryType
-from asseeibot.models.crossref.work import CrossrefWork
+from asseeibot.models.crossref.work import CrossrefWork, CrossrefWorkBase, LazyCrossrefWork, lazy_fields, \
+    snake_case_key, snake_case_nested_keys
 
 
 @dataclass
@@ -18,7 +20,10 @@ class CrossrefEngine:
     """Lookup a work in Crossref"""
     doi: Any
     result: Any = None
-    work: CrossrefWork = None
+    work: CrossrefWorkBase = None
+    lookup_failed: bool = False
+    # The work came from our own cache so it was validated when it was fetched
+    from_cache: bool = False
 
     # def __post_init_post_parse__(self):
     #     logger = logging.getLogger(__name__)
@@ -27,58 +32,67 @@ class CrossrefEngine:
         """This converts to snakecase 2 levels down in the dictionary
 
         It is needed because pydantic cannot map e.g. "short-title" -> "short_title"
+        The nested keys of the fields the LazyCrossrefWork parses on first access are left as they are.
 
         See also https://github.com/nficano/humps which does not support kebabcase yet"""
-
-        def dekebabcase_dictionary_keys(dictionary) -> Dict:
-            if dictionary is None:
-                raise ValueError("dictionary was None")
-            new_dictionary = dict()
-            for key in dictionary.keys():
-                value = dictionary[key]
-                renamed_key = snakecase(key).lower()
-                new_dictionary[renamed_key] = value
-            return new_dictionary
-
         logger = logging.getLogger(__name__)
-        # pseudo code
-        # we have a dict with keys
-        data = self.data
         finished_data = dict()
-        for key in data.keys():
-            value = data[key]
-            if isinstance(value, dict):
-                # data[key]
-                new_value = dekebabcase_dictionary_keys(value)
-                value = new_value
-            if isinstance(value, list):
-                new_list = []
-                for item in value:
-                    if isinstance(item, dict):
-                        item = dekebabcase_dictionary_keys(item)
-                    new_list.append(item)
-                value = new_list
-            renamed_key = snakecase(key).lower()
+        for key, value in self.data.items():
+            renamed_key = snake_case_key(key)
+            if not config.lazy_crossref_parsing or renamed_key not in lazy_fields:
+                value = snake_case_nested_keys(value)
             finished_data[renamed_key] = value
         if config.loglevel == logging.DEBUG:
             logger.debug("Here is the renamed dict")
             console.print(finished_data)
         self.data = finished_data
 
-    def __lookup_work__(self):
-        """Lookup the data"""
+    def __cache_the_message__(self):
+        """The message is only cached after the work was validated
+        because the cached works are built without validating them"""
+        cache = runtime_variables.crossref_response_cache
+        if cache is not None and not self.from_cache:
+            cache.put(self.doi.value, self.result["message"])
+
+    def __use_the_fetch__(self, fetch: CrossrefFetch):
+        if fetch.result == CrossrefFetchResult.FOUND:
+            self.result = dict(message=fetch.message)
+        elif fetch.result == CrossrefFetchResult.NOT_FOUND:
+            logger = logging.getLogger(__name__)
+            logger.info(f"{self.doi.value} was not found in Crossref")
+        else:
+            self.lookup_failed = True
+
+    def __lookup_work__(self, fetch: CrossrefFetch = None):
+        """Lookup the data
+
+        The work is usually fetched already together with the other works on the page"""
         logger = logging.getLogger(__name__)
         # https://www.crossref.org/education/retrieve-metadata/rest-api/
         # async client here https://github.com/izihawa/aiocrossref but only 1 contributor
         # https://github.com/sckott/habanero >6 contributors not async
         logger.debug(f"Looking up work {self.doi.value} in Crossref")
-        # logging.info("Looking up from Crossref")
-        cr = Crossref(mailto=config.crossref_polite_pool_email)
-        # result = cr.works(doi=doi)
-        try:
-            self.result = cr.works(ids=self.doi.value)
-        except (HTTPError, ConnectionError) as e:
-            logger.error(f"Got error from Crossref: {e}")
+        cache = runtime_variables.crossref_response_cache
+        if cache is not None:
+            message = cache.get(self.doi.value)
+            if message is not None:
+                logger.debug("Using the cached work")
+                self.result = dict(message=message)
+                self.from_cache = True
+                return
+        if fetch is not None:
+            self.__use_the_fetch__(fetch)
+        elif runtime_variables.crossref_client is not None:
+            self.__use_the_fetch__(runtime_variables.crossref_client.fetch_work_blocking(self.doi.value))
+        else:
+            # logging.info("Looking up from Crossref")
+            cr = Crossref(mailto=config.crossref_polite_pool_email)
+            # result = cr.works(doi=doi)
+            try:
+                self.result = cr.works(ids=self.doi.value)
+            except (HTTPError, ConnectionError) as e:
+                logger.error(f"Got error from Crossref: {e}")
+                self.lookup_failed = True
 
     def __parse_habanero_data__(self):
         logger = logging.getLogger(__name__)
@@ -99,7 +113,12 @@ class CrossrefEngine:
                         #     logger.debug("Data from Habanero")
                         #     console.print(self.data)
                         self.__convert_to_snake_case__()
-                        work = CrossrefWork(**self.data)
+                        if config.lazy_crossref_parsing and self.from_cache:
+                            work = LazyCrossrefWork.construct_trusted(**self.data)
+                        elif config.lazy_crossref_parsing:
+                            work = LazyCrossrefWork(**self.data)
+                        else:
+                            work = CrossrefWork(**self.data)
                         if work is not None:
                             if config.loglevel == logging.DEBUG:
                                 logger.debug("Finished model dict")
@@ -112,6 +131,7 @@ class CrossrefEngine:
                             #             int(reference.first_page)
                         # exit(0)
                         self.work = work
+                        self.__cache_the_message__()
                 else:
                     raise ValueError("type not found")
             else:
@@ -122,10 +142,10 @@ class CrossrefEngine:
         if self.work.number_of_subject_matches > 0:
             print_match_table(self.work)
 
-    def lookup_work(self):
+    def lookup_work(self, fetch: CrossrefFetch = None):
         """Lookup, parse and match subjects and store the
         CrossrefWork in the attribute self.work"""
-        self.__lookup_work__()
+        self.__lookup_work__(fetch=fetch)
         self.__parse_habanero_data__()
 
     def match_subjects(self):
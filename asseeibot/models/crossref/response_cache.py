@@ -0,0 +1,145 @@
+import json
+import logging
+import sqlite3
+import threading
+import zlib
+from time import time
+from typing import Any, Dict, Optional
+
+from asseeibot.helpers.util import open_text_file
+from asseeibot.models.crossref.work import validate_message
+
+logger = logging.getLogger(__name__)
+
+
+class CrossrefResponseCache:
+    """This caches the raw message of the works we got from Crossref in SQLite
+
+    The messages are compressed with zlib and keyed by the lowercase DOI.
+    They expire after the TTL and the least recently used messages are evicted
+    when the cache grows beyond the max size.
+
+    The workers use it from several threads so all access is locked."""
+    connection: sqlite3.Connection = None
+    hits: int = 0
+    lock: threading.Lock = None
+    max_bytes: int = 0
+    misses: int = 0
+    puts_since_eviction: int = 0
+    ttl_seconds: float = 0
+
+    def __init__(self,
+                 filename: str = None,
+                 ttl_seconds: float = 0,
+                 max_megabytes: float = 500):
+        """The cache is only kept in memory if no filename is given"""
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = int(max_megabytes * 1024 * 1024)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(filename if filename is not None else ":memory:",
+                                          check_same_thread=False)
+        self.connection.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS crossref_response (
+                doi TEXT PRIMARY KEY,
+                message BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS crossref_response_last_access ON crossref_response (last_access);
+        """)
+        self.connection.commit()
+
+    def __contains__(self, doi: str) -> bool:
+        """This does not count as a hit or a miss"""
+        with self.lock:
+            row = self.connection.execute("SELECT fetched FROM crossref_response WHERE doi = ?",
+                                          (doi.lower(),)).fetchone()
+            return row is not None and time() - row[0] <= self.ttl_seconds
+
+    def __evict__(self):
+        """This is done now and then because summing the sizes is not free"""
+        self.puts_since_eviction = 0
+        total = self.size
+        if total <= self.max_bytes:
+            return
+        dois = []
+        for doi, size in self.connection.execute("SELECT doi, size FROM crossref_response ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            dois.append((doi,))
+            total -= size
+        logger.debug(f"Evicting {len(dois)} works from the Crossref cache")
+        self.connection.executemany("DELETE FROM crossref_response WHERE doi = ?", dois)
+        self.connection.commit()
+
+    def __put__(self, doi: str, message: Dict[str, Any], fetched: float):
+        blob = zlib.compress(json.dumps(message, separators=(",", ":")).encode())
+        self.connection.execute(
+            "INSERT OR REPLACE INTO crossref_response VALUES (?, ?, ?, ?, ?)",
+            (doi.lower(), blob, len(blob), fetched, fetched)
+        )
+        self.puts_since_eviction += 1
+        if self.puts_since_eviction >= 100:
+            self.__evict__()
+
+    def get(self, doi: str) -> Optional[Dict[str, Any]]:
+        """Returns the message or None if not cached or expired"""
+        with self.lock:
+            row = self.connection.execute("SELECT message, fetched FROM crossref_response WHERE doi = ?",
+                                          (doi.lower(),)).fetchone()
+            if row is None or time() - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.connection.execute("UPDATE crossref_response SET last_access = ? WHERE doi = ?",
+                                    (time(), doi.lower()))
+            self.connection.commit()
+            return json.loads(zlib.decompress(row[0]))
+
+    def put(self, doi: str, message: Dict[str, Any]):
+        with self.lock:
+            self.__put__(doi=doi, message=message, fetched=time())
+            self.connection.commit()
+
+    def prewarm(self, filename: str) -> int:
+        """Load works from a JSONL file (optionally gzipped) with either
+        responses from the Crossref API or the bare messages, one per line.
+        The works are validated like the ones we fetch and the invalid ones
+        are skipped. Returns the number of works loaded"""
+        number_of_works = 0
+        fetched = time()
+        with open_text_file(filename) as file, self.lock:
+            for line in file:
+                if line.strip() == "":
+                    continue
+                data = json.loads(line)
+                message = data.get("message", data)
+                if "DOI" not in message:
+                    logger.warning(f"Skipping a work without a DOI in {filename}")
+                    continue
+                try:
+                    validate_message(message)
+                except ValueError as e:
+                    logger.warning(f"Skipping the invalid work {message['DOI']} in {filename}: {e}")
+                    continue
+                self.__put__(doi=message["DOI"], message=message, fetched=fetched)
+                number_of_works += 1
+            self.__evict__()
+            self.connection.commit()
+        return number_of_works
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        if lookups > 0:
+            return self.hits / lookups
+        else:
+            return 0.0
+
+    @property
+    def size(self) -> int:
+        """The size of the compressed messages in bytes"""
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM crossref_response").fetchone()[0]
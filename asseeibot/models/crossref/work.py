@@ -1,15 +1,59 @@
 #!/usr/bin/env python3
 from datetime import datetime
-from typing import List, Any, Optional, Union
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Union
 
+from caseconverter import snakecase
 from habanero import Crossref  # type: ignore
-from pydantic import BaseModel, PositiveInt, conint
+from pydantic import BaseModel, PositiveInt, PrivateAttr, conint, parse_obj_as
 
 from asseeibot.models.crossref.enums import CrossrefEntryType, CrossrefContentType
 from asseeibot.models.identifiers.isbn import Isbn
 from asseeibot.models.named_entity_recognition import NamedEntityRecognition
 
 
+# The keys in the Crossref schema that we know of. They are converted when the module is loaded
+# and the keys we don't know of are converted once when they are first seen.
+# See https://github.com/CrossRef/rest-api-doc/blob/master/api_format.md
+crossref_schema_keys = [
+    "abstract", "affiliation", "alternative-id", "archive", "article-number", "article-title", "assertion",
+    "author", "chair", "clinical-trial-number", "container-title", "content-created", "content-domain",
+    "content-type", "content-version", "created", "crossmark-restriction", "date-parts", "date-time",
+    "delay-in-days", "deposited", "DOI", "doi-asserted-by", "edition-number", "editor", "family",
+    "first-page", "funder", "given", "indexed", "intended-application", "is-referenced-by-count", "ISBN",
+    "ISSN", "issn-type", "issue", "issued", "journal-issue", "journal-title", "key", "language", "license",
+    "link", "member", "name", "ORCID", "original-title", "page", "prefix", "published", "published-online",
+    "published-print", "publisher", "publisher-location", "reference", "reference-count", "references-count",
+    "relation", "score", "sequence", "short-container-title", "short-title", "source", "subject", "subtitle",
+    "timestamp", "title", "translator", "type", "unstructured", "update-policy", "URL", "volume", "year",
+]
+
+
+@lru_cache(maxsize=None)
+def snake_case_key(key: str) -> str:
+    return snakecase(key).lower()
+
+
+for schema_key in crossref_schema_keys:
+    snake_case_key(schema_key)
+
+
+def snake_case_keys(dictionary: Dict) -> Dict:
+    """Crossref uses kebab case e.g. "short-title" which pydantic cannot map to short_title"""
+    if dictionary is None:
+        raise ValueError("dictionary was None")
+    return {snake_case_key(key): value for key, value in dictionary.items()}
+
+
+def snake_case_nested_keys(value: Any) -> Any:
+    """This converts the keys of a dictionary or of the dictionaries in a list"""
+    if isinstance(value, dict):
+        return snake_case_keys(value)
+    if isinstance(value, list):
+        return [snake_case_keys(item) if isinstance(item, dict) else item for item in value]
+    return value
+
+
 class OrdinalWordToIntegerConverter(BaseModel):
     word: str
     words = ["first", "second"]
@@ -56,26 +100,21 @@ class CrossrefReference(BaseModel):
     journal_tile: Optional[str]
 
 
-class CrossrefWork(BaseModel):
-    author: Optional[List[CrossrefAuthor]]
+class CrossrefWorkBase(BaseModel):
+    """The fields we need on the hot path"""
     doi: str  # typing it here does not work. We get an ugly " not yet prepared so type is still a ForwardRef" error
     is_referenced_by_count: Optional[conint(ge=0)]
     __isbn: Optional[List[str]]
     issn: Optional[List[str]]
     issn_qid: Optional[str]
-    issued: Optional[CrossrefDateParts]
     __license_url: Optional[str]
-    link: Optional[List[CrossrefLink]]
     ner: NamedEntityRecognition = None
     object_type: Optional[CrossrefEntryType]
     original_title: Optional[List[str]]
     pdf_urls: Optional[List[str]]
     prefix: Optional[str]
-    published: Optional[CrossrefDateParts]
-    published_print: Optional[CrossrefDateParts]
     publisher: Optional[str]
     publisher_location: Optional[str]
-    reference: Optional[List[CrossrefReference]]
     references_count: Optional[conint(ge=0)]
     score: str
     subject: Optional[List[str]]  # raw subjects
@@ -111,11 +150,6 @@ class CrossrefWork(BaseModel):
         else:
             return 0
 
-    @property
-    def references(self):
-        return self.reference
-        # raise NotImplementedError("resolve the license url before returning")
-
     def __str__(self):
         return f"<{self.doi} {self.first_title} with {self.references_count} references>"
 
@@ -274,3 +308,96 @@ class CrossrefWork(BaseModel):
     #         if found is False:
     #             logger.info("No fulltext links found")
 
+
+class CrossrefWork(CrossrefWorkBase):
+    """A work with all the fields parsed when it is created"""
+    author: Optional[List[CrossrefAuthor]]
+    issued: Optional[CrossrefDateParts]
+    link: Optional[List[CrossrefLink]]
+    published: Optional[CrossrefDateParts]
+    published_print: Optional[CrossrefDateParts]
+    reference: Optional[List[CrossrefReference]]
+
+    @property
+    def references(self):
+        return self.reference
+        # raise NotImplementedError("resolve the license url before returning")
+
+
+class LazyCrossrefWork(CrossrefWorkBase):
+    """A work where the heavy fields are kept raw until they are first used
+
+    A work can have hundreds of references and we rarely need them.
+    The nested keys of the raw fields are not converted to snake case yet either."""
+    _parsed: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    _raw: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    def __init__(self, **data):
+        raw = {field: data.pop(field) for field in list(data.keys()) if field in lazy_fields}
+        super().__init__(**data)
+        self._raw = raw
+
+    @classmethod
+    def construct_trusted(cls, **data) -> "LazyCrossrefWork":
+        """Build the work without validating it. Only use this on data we validated before
+        e.g. from our own cache. The lazy fields are still validated when they are parsed"""
+        raw = {field: data.pop(field) for field in list(data.keys()) if field in lazy_fields}
+        work = cls.construct(**{field: value for field, value in data.items() if field in cls.__fields__})
+        work._raw = raw
+        return work
+
+    def __parse_field__(self, field: str) -> Any:
+        if field not in self._parsed:
+            value = self._raw.get(field)
+            if value is not None:
+                value = parse_obj_as(lazy_fields[field], snake_case_nested_keys(value))
+            self._parsed[field] = value
+        return self._parsed[field]
+
+    @property
+    def author(self) -> Optional[List[CrossrefAuthor]]:
+        return self.__parse_field__("author")
+
+    @property
+    def issued(self) -> Optional[CrossrefDateParts]:
+        return self.__parse_field__("issued")
+
+    @property
+    def link(self) -> Optional[List[CrossrefLink]]:
+        return self.__parse_field__("link")
+
+    @property
+    def published(self) -> Optional[CrossrefDateParts]:
+        return self.__parse_field__("published")
+
+    @property
+    def published_print(self) -> Optional[CrossrefDateParts]:
+        return self.__parse_field__("published_print")
+
+    @property
+    def reference(self) -> Optional[List[CrossrefReference]]:
+        return self.__parse_field__("reference")
+
+    @property
+    def references(self) -> Optional[List[CrossrefReference]]:
+        return self.reference
+
+
+def validate_message(message: Dict[str, Any]):
+    """Raises ValueError if the message from Crossref can't be parsed into a work.
+    All the fields are validated so the work can later be built with construct_trusted"""
+    if "type" not in message:
+        raise ValueError("type not found")
+    CrossrefEntryType(message["type"])
+    CrossrefWork(**{snake_case_key(key): snake_case_nested_keys(value) for key, value in message.items()})
+
+
+# These are parsed on first access by the LazyCrossrefWork
+lazy_fields = {
+    "author": List[CrossrefAuthor],
+    "issued": CrossrefDateParts,
+    "link": List[CrossrefLink],
+    "published": CrossrefDateParts,
+    "published_print": CrossrefDateParts,
+    "reference": List[CrossrefReference],
+}
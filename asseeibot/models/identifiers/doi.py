@@ -1,8 +1,12 @@
 import logging
 import re
 
+from asseeibot import runtime_variables
+from asseeibot.models.crossref.client import CrossrefFetch
 from asseeibot.models.crossref.engine import CrossrefEngine
 from asseeibot.models.identifiers.identifier import Identifier
+from asseeibot.models.resolved_doi_cache import ResolvedDoi
+from asseeibot.models.wikimedia.wikidata.entity import EntityId
 # @dataclass
 from asseeibot.models.wikimedia.wikidata.scientific_item import WikidataScientificItem
 
@@ -16,6 +20,12 @@ class Doi(Identifier):
     regex_validated: bool = True
     found_in_crossref: bool = False
     found_in_wikidata: bool = False
+    # Hub could not be asked so we don't know if it is missing in Wikidata
+    hub_lookup_failed: bool = False
+    resolved_from_cache: bool = False
+    # The page reads the cache before the batched lookups and the DOI again
+    # when it is looked up. This makes sure it is only counted once.
+    resolved_cache_checked: bool = False
 
     def __post_init_post_parse__(self):
         # todo test it with a regex on init
@@ -36,11 +46,14 @@ class Doi(Identifier):
         can easily look them up via SPARQL later"""
         return self.value.upper()
 
-    def lookup_in_crossref(self):
-        """Lookup in Crossref and parse the whole result into an object we can use"""
+    def lookup_in_crossref(self, fetch: CrossrefFetch = None):
+        """Lookup in Crossref and parse the whole result into an object we can use.
+        This is only done once, usually together with the other DOIs on the page"""
+        if self.crossref is not None:
+            return
         logger.debug(f"Looking up {self.value} in Crossref")
         self.crossref = CrossrefEngine(doi=self)
-        self.crossref.lookup_work()
+        self.crossref.lookup_work(fetch=fetch)
         if self.crossref.work is not None:
             # This helps us easily in WikipediaPage to get an overview
             self.found_in_crossref = True
@@ -48,21 +61,89 @@ class Doi(Identifier):
             self.found_in_crossref = False
 
     def __lookup_in_crossref_and_then_wikidata__(self):
-        self.wikidata_scientific_item = WikidataScientificItem(doi=self)
+        if self.wikidata_scientific_item is None:
+            self.wikidata_scientific_item = WikidataScientificItem(doi=self)
         self.wikidata_scientific_item.lookup()
         self.found_in_wikidata = self.wikidata_scientific_item.found_in_wikidata
+        self.hub_lookup_failed = self.wikidata_scientific_item.hub_lookup_failed
+
+    def check_the_bloom_filter(self):
+        """If the DOI is not in the Bloom filter it is not in Wikidata
+        so we don't have to look it up"""
+        if (
+                runtime_variables.doi_bloom_filter is not None and
+                self.wikidata_scientific_item is None and
+                self.regex_validated and
+                runtime_variables.doi_bloom_filter.is_missing_in_wikidata(self.value.upper())
+        ):
+            logger.debug(f"{self.value} is not in the Bloom filter")
+            self.wikidata_scientific_item = WikidataScientificItem(doi=self, resolved_in_bulk=True)
+
+    def __add_to_the_resolved_doi_cache__(self):
+        if self.crossref is not None and self.crossref.lookup_failed:
+            logger.debug("Not caching a DOI that we could not look up in Crossref")
+            return
+        if self.wikidata_scientific_item.hub_lookup_failed:
+            logger.debug("Not caching a DOI that we could not look up in Hub")
+            return
+        subjects = []
+        matched_qids = []
+        if self.crossref is not None and self.crossref.work is not None:
+            work = self.crossref.work
+            subjects = work.subject or []
+            if work.ner is not None:
+                matched_qids = [match.qid.value for match in work.ner.subject_matches]
+        qid = self.wikidata_scientific_item.qid
+        runtime_variables.resolved_doi_cache.add(ResolvedDoi(
+            doi=self.value,
+            found_in_wikidata=self.found_in_wikidata,
+            qid=qid.value if qid is not None else None,
+            found_in_crossref=self.found_in_crossref,
+            subjects=subjects,
+            matched_qids=matched_qids
+        ))
+
+    def read_from_the_resolved_doi_cache(self):
+        """A DOI that was resolved recently is not looked up again.
+        Its subjects were matched and uploaded the first time"""
+        if (
+                runtime_variables.resolved_doi_cache is None or
+                self.resolved_cache_checked or
+                self.wikidata_scientific_item is not None
+        ):
+            return
+        self.resolved_cache_checked = True
+        resolved_doi = runtime_variables.resolved_doi_cache.get(self.value)
+        if resolved_doi is not None:
+            logger.debug(f"{self.value} was resolved recently")
+            self.resolved_from_cache = True
+            self.found_in_wikidata = resolved_doi.found_in_wikidata
+            self.found_in_crossref = resolved_doi.found_in_crossref
+            self.wikidata_scientific_item = WikidataScientificItem(
+                doi=self,
+                found_in_wikidata=resolved_doi.found_in_wikidata,
+                qid=EntityId(resolved_doi.qid) if resolved_doi.qid is not None else None,
+                resolved_in_bulk=True
+            )
 
     def lookup_and_match_subjects(self):
         """Looking up in Wikidata also entails looking"""
+        self.read_from_the_resolved_doi_cache()
+        if self.resolved_from_cache:
+            return
+        self.check_the_bloom_filter()
         self.__lookup_in_crossref_and_then_wikidata__()
         if self.crossref is not None:
             self.crossref.match_subjects()
+        if runtime_variables.resolved_doi_cache is not None:
+            self.__add_to_the_resolved_doi_cache__()
 
     def upload_subjects_to_wikidata(self):
         """Upload all the matched subjects to Wikidata"""
         if (
                 self.found_in_wikidata and
-                self.found_in_crossref
+                self.found_in_crossref and
+                self.crossref is not None
         ):
             logger.debug("Found in both WD and Crossref")
             if (
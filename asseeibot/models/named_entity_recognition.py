@@ -5,6 +5,7 @@ from typing import Optional, List
 from pandas import DataFrame
 from pydantic import BaseModel
 
+from asseeibot import runtime_variables
 from asseeibot.models.fuzzy_match import FuzzyMatch
 from asseeibot.models.ontology import Ontology
 from asseeibot.models.ontology_dataframe import Dataframe
@@ -37,9 +38,10 @@ class NamedEntityRecognition(BaseModel):
 
     def start(self):
         if self.raw_subjects is not None:
-            dataframe = Dataframe()
-            dataframe.prepare_the_dataframe()
-            self.__lookup_subjects__()
+            with runtime_variables.interactive_lock:
+                dataframe = Dataframe()
+                dataframe.prepare_the_dataframe()
+                self.__lookup_subjects__()
 
     def __lookup_subjects__(self):
         """This function splits the subject string
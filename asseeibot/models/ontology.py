@@ -1,9 +1,8 @@
 import logging
-from typing import Optional
+from typing import List, Optional, Set, Tuple
 
-from fuzzywuzzy import fuzz
 from pandas import DataFrame
-from pydantic import BaseModel, PositiveInt
+from pydantic import BaseModel
 
 import asseeibot.runtime_variables
 import config
@@ -11,6 +10,7 @@ from asseeibot.helpers.util import yes_no_question
 from asseeibot.models.fuzzy_match import FuzzyMatch, MatchBasedOn
 from asseeibot.models.match_cache import MatchCache
 from asseeibot.models.ontology_dataframe import OntologyDataframeColumn
+from asseeibot.models.ontology_scoring_engine import OntologyCandidate
 from asseeibot.models.wikimedia.wikidata.entity import EntityId
 from asseeibot.models.wikimedia.wikidata.search import string_search_url
 
@@ -28,6 +28,11 @@ class Ontology(BaseModel):
     split_subject: bool
     dataframe: DataFrame = None
     match: Optional[FuzzyMatch] = None
+    # The best rows with a score above the thresholds
+    label_candidates: Optional[List[OntologyCandidate]] = None
+    alias_candidates: Optional[List[OntologyCandidate]] = None
+    # The QIDs the user said no to during this lookup so they are not asked about twice
+    rejected_qids: Optional[Set[str]] = None
 
     class Config:
         arbitrary_types_allowed = True
@@ -39,53 +44,32 @@ class Ontology(BaseModel):
             raise TypeError(f"subject was '{self.original_subject}' which is not a string")
 
     def __calculate_scores__(self):
+        """Only the rows that can reach the thresholds are scored"""
         logger.debug(f"Calculating scores")
-        # This code is inspired by Nikhil VJ
-        # https://stackoverflow.com/questions/38577332/apply-fuzzy-matching-across-a-dataframe-column-and-save-results-in-a-new-column
         # We lowercase the string to avoid having the same ratio
         # on petrology->Petrology as petrology->metrology
-        self.dataframe["label_score"] = self.dataframe.label.apply(
-            lambda x: fuzz.ratio(x.lower(), self.crossref_subject.lower())
-        )
-        self.dataframe["alias_score"] = self.dataframe.alias.apply(
-            lambda x: fuzz.ratio(x.lower(), self.crossref_subject.lower())
-        )
-
-    def __extract_top_match_score__(self, column: OntologyDataframeColumn) -> PositiveInt:
-        if not (column == OntologyDataframeColumn.ALIAS or column == OntologyDataframeColumn.LABEL):
-            raise ValueError("did not get a column we support")
-        row = self.__get_first_row__()
-        if column == OntologyDataframeColumn.LABEL:
-            return row.label_score
-        else:
-            return row.alias_score
-
-    def __extract_top_label_match_and_score__(self):
-        self.__sort_dataframe__(OntologyDataframeColumn.LABEL_SCORE)
-        label_score = self.__extract_top_match_score__(column=OntologyDataframeColumn.LABEL)
-        if config.loglevel == logging.INFO or config.loglevel == logging.DEBUG:
-            self.__print_dataframe_head__()
-        return self.__get_top_match__(), label_score
+        self.label_candidates, self.alias_candidates = \
+            asseeibot.runtime_variables.ontology_scoring_engine.top_candidates(
+                subject=self.crossref_subject,
+                k=config.number_of_candidates_to_show,
+                label_threshold=config.label_threshold_ratio,
+                alias_threshold=config.alias_threshold_ratio
+            )
 
-    def __extract_top_alias_match_and_score__(self):
-        self.__sort_dataframe__(OntologyDataframeColumn.ALIAS_SCORE)
-        alias_score = self.__extract_top_match_score__(column=OntologyDataframeColumn.ALIAS)
+    def __extract_top_candidates__(self, candidates: List[OntologyCandidate]) -> List[Tuple[FuzzyMatch, int]]:
+        """Returns the best matches and their scores"""
+        candidates = [(self.__get_top_match__(row=candidate.row), candidate.score)
+                      for candidate in candidates]
         if config.loglevel == logging.INFO or config.loglevel == logging.DEBUG:
-            self.__print_dataframe_head__()
-        return self.__get_top_match__(), alias_score
+            self.__print_candidates__(candidates)
+        return candidates
 
     def __extract_top_matches__(self):
         if self.original_subject is None:
             raise ValueError("self.original_subject was None")
-        top_label_match, label_score = self.__extract_top_label_match_and_score__()
-        top_alias_match, alias_score = self.__extract_top_alias_match_and_score__()
-        return label_score, alias_score, top_label_match, top_alias_match
-
-    def __get_first_row__(self):
-        """Get the first row"""
-        for row in self.dataframe.itertuples(index=False):
-            # This is a NamedTuple
-            return row
+        label_candidates = self.__extract_top_candidates__(self.label_candidates)
+        alias_candidates = self.__extract_top_candidates__(self.alias_candidates)
+        return label_candidates, alias_candidates
 
     def __get_the_dataframe_from_config__(self):
         # This has been populated by __prepare_the_dataframe__()
@@ -94,19 +78,20 @@ class Ontology(BaseModel):
         else:
             raise RuntimeError("config.ontology_dataframe was None")
 
-    def __get_top_match__(self):
+    def __get_top_match__(self, row: int) -> FuzzyMatch:
         if self.original_subject is None:
             raise ValueError("self.original_subject was None")
-        row = self.__get_first_row__()
-        # logger.debug(f"row:{row}")
+        # This is a Series with the columns of the ontology.
+        # We index it because Series.item is a method.
+        row = self.dataframe.iloc[row]
         # present the match
-        if row.label is None:
+        if row[OntologyDataframeColumn.LABEL.value] is None:
             raise ValueError("row.label was None")
         return FuzzyMatch(**dict(
-            qid=EntityId(row.item),
-            alias=row.alias,
-            label=row.label,
-            description=row.description,
+            qid=EntityId(row[OntologyDataframeColumn.ITEM.value]),
+            alias=row[OntologyDataframeColumn.ALIAS.value],
+            label=row[OntologyDataframeColumn.LABEL.value],
+            description=row[OntologyDataframeColumn.DESCRIPTION.value],
             original_subject=self.original_subject,
             split_subject=self.split_subject
         ))
@@ -140,52 +125,77 @@ class Ontology(BaseModel):
         else:
             logger.info(f"No match in cache for {self.crossref_subject}")
 
-    def __lookup_scores_and_matches_in_the_ontology__(self):
-        label_score, alias_score, top_label_match, top_alias_match = self.__extract_top_matches__()
-        if self.match is None and label_score >= alias_score:
-            if label_score >= config.label_threshold_ratio:
-                answer = yes_no_question("Does this match?\n"
-                                         f"{str(top_label_match)}")
-                if answer:
-                    self.match = FuzzyMatch(
-                        label=top_label_match.label,
-                        alias=top_label_match.alias,
-                        description=top_label_match.description,
-                        crossref_subject=self.crossref_subject,
-                        match_based_on=MatchBasedOn.LABEL,
-                        original_subject=self.original_subject,
-                        qid=top_label_match.qid,
-                        split_subject=self.split_subject,
-                    )
-                    cache_instance = MatchCache(match=self.match)
-                    cache_instance.add()
-        if self.match is None and alias_score >= config.alias_threshold_ratio:
-            answer = yes_no_question("Does this match?\n"
-                                     f"{str(top_alias_match)}")
+    def __ask_about_the_candidates__(self,
+                                     candidates: List[Tuple[FuzzyMatch, int]],
+                                     threshold: int,
+                                     match_based_on: MatchBasedOn):
+        """Ask about the candidates in order until one is accepted or
+        the rest are below the threshold"""
+        for number, (candidate, score) in enumerate(candidates, start=1):
+            if score < threshold:
+                break
+            if candidate.qid.url() in self.rejected_qids:
+                continue
+            answer = yes_no_question(f"Does this match? (candidate {number}/{len(candidates)} "
+                                     f"with {match_based_on.value} score {score})\n"
+                                     f"{str(candidate)}")
             if answer:
                 self.match = FuzzyMatch(
-                    label=top_alias_match.label,
-                    alias=top_alias_match.alias,
-                    description=top_alias_match.description,
+                    label=candidate.label,
+                    alias=candidate.alias,
+                    description=candidate.description,
                     crossref_subject=self.crossref_subject,
-                    match_based_on=MatchBasedOn.ALIAS,
+                    match_based_on=match_based_on,
                     original_subject=self.original_subject,
-                    qid=top_alias_match.qid,
+                    qid=candidate.qid,
                     split_subject=self.split_subject,
                 )
                 cache_instance = MatchCache(match=self.match)
                 cache_instance.add()
-        # None of the ratios reached the threshold
-        # We probably have either a gap in our ontology or in Wikidata
-        logger.warning(f"No match with a sufficient rating found. ")
-        logger.info(
-            f"Search for the subject on Wikidata: "
-            f"{string_search_url(string=self.crossref_subject)}"
-        )
+                return
+            self.rejected_qids.add(candidate.qid.url())
+
+    def __lookup_in_the_subject_match_table__(self) -> bool:
+        """Returns True if the subject was in the table, even if the user did not accept any of the candidates"""
+        if asseeibot.runtime_variables.subject_match_table is None:
+            return False
+        candidates = asseeibot.runtime_variables.subject_match_table.get(self.crossref_subject)
+        if candidates is None:
+            return False
+        logger.info(f"Found {self.crossref_subject} in the subject match table")
+        self.label_candidates, self.alias_candidates = candidates
+        self.__lookup_scores_and_matches_in_the_ontology__()
+        return True
+
+    def __lookup_exact_match__(self):
+        """Subjects that are the same as a label or alias are asked about without any scoring"""
+        self.label_candidates, self.alias_candidates = \
+            asseeibot.runtime_variables.ontology_scoring_engine.exact_candidates(
+                subject=self.crossref_subject,
+                k=config.number_of_candidates_to_show
+            )
+        if len(self.label_candidates) > 0 or len(self.alias_candidates) > 0:
+            logger.info(f"Found an exact match for {self.crossref_subject} in the ontology")
+            self.__lookup_scores_and_matches_in_the_ontology__()
+
+    def __lookup_scores_and_matches_in_the_ontology__(self):
+        label_candidates, alias_candidates = self.__extract_top_matches__()
+        label_score = label_candidates[0][1] if len(label_candidates) > 0 else 0
+        alias_score = alias_candidates[0][1] if len(alias_candidates) > 0 else 0
+        if self.match is None and label_score >= alias_score:
+            self.__ask_about_the_candidates__(candidates=label_candidates,
+                                              threshold=config.label_threshold_ratio,
+                                              match_based_on=MatchBasedOn.LABEL)
+        if self.match is None:
+            self.__ask_about_the_candidates__(candidates=alias_candidates,
+                                              threshold=config.alias_threshold_ratio,
+                                              match_based_on=MatchBasedOn.ALIAS)
         # exit()
 
-    def __print_dataframe_head__(self):
-        print(self.dataframe.head(2))
+    @staticmethod
+    def __print_candidates__(candidates: List[Tuple[FuzzyMatch, int]]):
+        for candidate, score in candidates:
+            print(f"{score}: {str(candidate)}")
 
     def __print_subject_information__(self):
         from asseeibot.helpers.console import console
@@ -196,8 +206,15 @@ class Ontology(BaseModel):
             console.print(f"Trying now to match [bold green]'{self.crossref_subject}'[/bold green] which was found in Crossref")
 
     def __sort_dataframe__(self, column: OntologyDataframeColumn):
+        """This scores every row and copies and sorts the whole ontology so it is only used for debugging"""
         if isinstance(column, OntologyDataframeColumn):
-            self.dataframe = self.dataframe.sort_values(column.value, ascending=False)
+            label_scores, alias_scores = asseeibot.runtime_variables.ontology_scoring_engine.score(
+                self.crossref_subject
+            )
+            self.dataframe = self.dataframe.assign(**{
+                OntologyDataframeColumn.LABEL_SCORE.value: label_scores,
+                OntologyDataframeColumn.ALIAS_SCORE.value: alias_scores,
+            }).sort_values(column.value, ascending=False)
         else:
             raise ValueError(f"{column} is not a DataframeColumns")
 
@@ -220,14 +237,25 @@ class Ontology(BaseModel):
     def lookup_subject(self) -> None:
         """Looks up the subject in the ontology and try to fuzzymatch it to a QID"""
         self.match = None
+        self.rejected_qids = set()
         self.__check_subject_and_original_subject__()
         self.__get_the_dataframe_from_config__()
         self.__print_subject_information__()
         self.__lookup_in_cache__()
-        if self.match is None:
-            logger.info(f"We proceed to look up in the ontology "
-                        f"because we could not a match for {self.crossref_subject} in the cache")
-            self.__calculate_scores__()
-            self.__lookup_scores_and_matches_in_the_ontology__()
+        # The table has the same candidates as the matching below would find
+        if self.match is None and not self.__lookup_in_the_subject_match_table__():
+            self.__lookup_exact_match__()
+            if self.match is None:
+                logger.info(f"We proceed to look up in the ontology "
+                            f"because we could not a match for {self.crossref_subject} in the cache")
+                self.__calculate_scores__()
+                self.__lookup_scores_and_matches_in_the_ontology__()
+                if self.match is None:
+                    # None of the ratios reached the threshold
+                    # We probably have either a gap in our ontology or in Wikidata
+                    logger.warning(f"No match with a sufficient rating found. ")
+                    logger.info(
+                        f"Search for the subject on Wikidata: "
+                        f"{string_search_url(string=self.crossref_subject)}"
+                    )
         self.__validate_the_match__()
-
@@ -3,6 +3,7 @@ from enum import Enum
 import pandas as pd
 
 import asseeibot.runtime_variables
+import config
 
 
 class OntologyDataframeColumn(Enum):
@@ -28,6 +29,19 @@ class Dataframe:
                 raise
             # This is needed for the fuzzymatching to work properly
             asseeibot.runtime_variables.ontology_dataframe = dataframe.fillna('')
+            # Imported here because the engine needs OntologyDataframeColumn from this module
+            from asseeibot.models.ontology_scoring_engine import OntologyScoringEngine
+            asseeibot.runtime_variables.ontology_scoring_engine = OntologyScoringEngine(
+                dataframe=asseeibot.runtime_variables.ontology_dataframe
+            )
+            from asseeibot.models.subject_match_table import SubjectMatchTable
+            asseeibot.runtime_variables.subject_match_table = SubjectMatchTable.load(
+                filename=config.subject_match_table_filename,
+                dataframe=asseeibot.runtime_variables.ontology_dataframe,
+                k=config.number_of_candidates_to_show,
+                label_threshold=config.label_threshold_ratio,
+                alias_threshold=config.alias_threshold_ratio
+            )
 
     def __download_the_ontology_pickle__(self):
         raise NotImplementedError
@@ -0,0 +1,101 @@
+import logging
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def ngrams(string: str, n: int = 3) -> Counter:
+    """Returns the character n-grams of the string and how many times each occurs"""
+    return Counter(string[position:position + n] for position in range(len(string) - n + 1))
+
+
+class OntologyNgramIndex:
+    """This is an inverted index from character n-grams to the strings in one column of the ontology
+
+    It finds the rows that can still reach a threshold of fuzz.ratio without
+    scoring them. fuzz.ratio is 200 * LCS / (len(a) + len(b)) where LCS is the
+    length of the longest common subsequence so:
+
+    1. A score of t needs LCS >= t * (len(a) + len(b)) / 200 which can't be more
+    than the shorter string. This bounds the length of the candidates, and the rows
+    are sorted by length so the candidates of a subject are a slice.
+
+    2. Every character that is not part of the LCS breaks at most n - 1 of the
+    n-grams of the LCS in each string, so the strings share at least
+    LCS - n + 1 - (n - 1) * (len(a) + len(b) - 2 * LCS) n-grams.
+
+    Rows that fail either bound can't reach the threshold, so the top matches
+    above the threshold are exactly the same as when every row is scored."""
+    n: int = 3
+    # The rows of the ontology sorted by the length of the string
+    rows: np.ndarray = None
+    lengths: np.ndarray = None
+    # An object array so the candidates can be picked without a Python loop
+    strings: np.ndarray = None
+    # The positions in the sorted rows and the count of each n-gram there
+    postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = None
+
+    def __init__(self, strings: List[str] = None, n: int = 3):
+        """The strings are expected to be lowercased already"""
+        if strings is None:
+            raise ValueError("strings was None")
+        self.n = n
+        lengths = np.fromiter((len(string) for string in strings), dtype=np.int64, count=len(strings))
+        self.rows = np.argsort(lengths, kind="stable")
+        self.lengths = lengths[self.rows]
+        self.strings = np.array(strings, dtype=object)[self.rows]
+        positions = defaultdict(list)
+        counts = defaultdict(list)
+        for position, string in enumerate(self.strings):
+            for ngram, count in ngrams(string, n=n).items():
+                positions[ngram].append(position)
+                counts[ngram].append(count)
+        self.postings = {ngram: (np.array(positions[ngram], dtype=np.int64),
+                                 np.array(counts[ngram], dtype=np.int64))
+                         for ngram in positions}
+        logger.debug(f"Indexed {len(strings)} strings with {len(self.postings)} different {n}-grams")
+
+    def __len__(self):
+        return len(self.rows)
+
+    def candidates(self, subject: str, threshold: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the rows in ascending order that can reach the threshold
+        and their strings. The subject is expected to be lowercased already."""
+        if subject is None:
+            raise ValueError("subject was None")
+        # A score is rounded so anything from threshold - 0.5 can reach it
+        ratio = (threshold - 0.5) / 200
+        subject_length = len(subject)
+        # The shortest and longest strings where the LCS can reach the threshold
+        shortest = int(np.ceil(ratio * subject_length / (1 - ratio) - 1e-9))
+        longest = int(np.floor(subject_length * (1 - ratio) / ratio + 1e-9)) if ratio > 0 else np.iinfo(np.int64).max
+        start = int(np.searchsorted(self.lengths, shortest, side="left"))
+        end = int(np.searchsorted(self.lengths, longest, side="right"))
+        if start >= end:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=object)
+        lengths = self.lengths[start:end]
+        minimum_lcs = np.ceil(ratio * (lengths + subject_length) - 1e-9)
+        minimum_shared_ngrams = (minimum_lcs - self.n + 1 -
+                                 (self.n - 1) * (lengths + subject_length - 2 * minimum_lcs))
+        positions = []
+        weights = []
+        for ngram, subject_count in ngrams(subject, n=self.n).items():
+            posting = self.postings.get(ngram)
+            if posting is not None:
+                # The postings are sorted so the part within the length bounds is a slice
+                first, last = np.searchsorted(posting[0], [start, end])
+                positions.append(posting[0][first:last] - start)
+                weights.append(np.minimum(posting[1][first:last], subject_count))
+        if len(positions) > 0:
+            shared_ngrams = np.bincount(np.concatenate(positions), weights=np.concatenate(weights),
+                                        minlength=end - start)
+        else:
+            shared_ngrams = np.zeros(end - start)
+        selected = np.flatnonzero((minimum_lcs <= np.minimum(lengths, subject_length)) &
+                                  (shared_ngrams >= minimum_shared_ngrams)) + start
+        order = np.argsort(self.rows[selected])
+        selected = selected[order]
+        return self.rows[selected], self.strings[selected]
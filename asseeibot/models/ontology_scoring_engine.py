@@ -0,0 +1,137 @@
+import logging
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+from pandas import DataFrame
+from rapidfuzz import fuzz, process
+
+from asseeibot.models.ontology_dataframe import OntologyDataframeColumn
+from asseeibot.models.ontology_ngram_index import OntologyNgramIndex
+
+logger = logging.getLogger(__name__)
+
+
+class OntologyCandidate(NamedTuple):
+    """A row in the ontology and the score of the subject against it"""
+    row: int
+    score: int
+
+
+class OntologyScoringEngine:
+    """This scores a subject against all the labels and aliases in the ontology at once
+
+    The labels and aliases are lowercased once when the ontology is loaded.
+    The scores are the same as fuzzywuzzy's fuzz.ratio on the lowercased strings
+    (the normalized InDel similarity rounded to an int) but rapidfuzz computes
+    all of them in one call in C++ without holding the GIL.
+
+    top_candidates only scores the rows that the n-gram indexes
+    say can reach the thresholds. exact_candidates finds the rows
+    that are the same as the subject in a dict without scoring."""
+    aliases: list = None
+    alias_index: OntologyNgramIndex = None
+    exact_aliases: Dict[str, List[int]] = None
+    exact_labels: Dict[str, List[int]] = None
+    exact_hits: int = 0
+    exact_misses: int = 0
+    labels: list = None
+    label_index: OntologyNgramIndex = None
+
+    def __init__(self, dataframe: DataFrame = None):
+        if dataframe is None:
+            raise ValueError("dataframe was None")
+        self.labels = dataframe[OntologyDataframeColumn.LABEL.value].str.lower().tolist()
+        self.aliases = dataframe[OntologyDataframeColumn.ALIAS.value].str.lower().tolist()
+        self.exact_labels = self.__build_exact_index__(self.labels)
+        self.exact_aliases = self.__build_exact_index__(self.aliases)
+        self.label_index = OntologyNgramIndex(strings=self.labels)
+        self.alias_index = OntologyNgramIndex(strings=self.aliases)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @staticmethod
+    def __build_exact_index__(strings: List[str]) -> Dict[str, List[int]]:
+        """Maps every lowercased string to its rows in ascending order"""
+        index = defaultdict(list)
+        for row, string in enumerate(strings):
+            if string != "":
+                index[string].append(row)
+        return dict(index)
+
+    @property
+    def exact_match_rate(self) -> float:
+        """The share of the subjects that were the same as a label or alias"""
+        total = self.exact_hits + self.exact_misses
+        return self.exact_hits / total if total > 0 else 0.0
+
+    def exact_candidates(self, subject: str, k: int) -> Tuple[List[OntologyCandidate], List[OntologyCandidate]]:
+        """Returns up to k label and alias candidates that are the same as the subject
+
+        They have a score of 100 and are the first ones top_candidates would return."""
+        if subject is None:
+            raise ValueError("subject was None")
+        subject = subject.lower()
+        label_candidates = [OntologyCandidate(row=row, score=100) for row in self.exact_labels.get(subject, [])[:k]]
+        alias_candidates = [OntologyCandidate(row=row, score=100) for row in self.exact_aliases.get(subject, [])[:k]]
+        if len(label_candidates) > 0 or len(alias_candidates) > 0:
+            self.exact_hits += 1
+        else:
+            self.exact_misses += 1
+        return label_candidates, alias_candidates
+
+    @staticmethod
+    def __score__(subject: str, choices: list) -> np.ndarray:
+        scores = process.cdist([subject], choices, scorer=fuzz.ratio, dtype=np.float64)[0]
+        # float64 so the ties are rounded like fuzzywuzzy does it, half to even like np.rint
+        return np.rint(scores).astype(np.int64)
+
+    def score(self, subject: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the label and alias scores of every row in the ontology"""
+        if subject is None:
+            raise ValueError("subject was None")
+        subject = subject.lower()
+        return self.__score__(subject, self.labels), self.__score__(subject, self.aliases)
+
+    @staticmethod
+    def top_k(scores: np.ndarray, k: int, rows: np.ndarray = None) -> List[OntologyCandidate]:
+        """Returns the k best rows without sorting all of them
+
+        The k-th best score is found with a partial partition in O(n) and only
+        the k candidates are sorted. Ties go to the lowest row so the result
+        does not depend on the sorting algorithm.
+
+        rows are the ascending rows of the scores when only some rows were scored"""
+        if scores is None:
+            raise ValueError("scores was None")
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        kth_score = np.partition(scores, len(scores) - k)[len(scores) - k]
+        better_positions = np.flatnonzero(scores > kth_score)
+        tied_positions = np.flatnonzero(scores == kth_score)[:k - len(better_positions)]
+        positions = np.concatenate([better_positions, tied_positions])
+        positions = positions[np.lexsort((positions, -scores[positions]))]
+        return [OntologyCandidate(row=int(position if rows is None else rows[position]),
+                                  score=int(scores[position])) for position in positions]
+
+    def __top_candidates__(self, subject: str, index: OntologyNgramIndex,
+                           threshold: int, k: int) -> List[OntologyCandidate]:
+        rows, strings = index.candidates(subject=subject, threshold=threshold)
+        if len(rows) == 0:
+            return []
+        scores = self.__score__(subject, strings)
+        above_the_threshold = scores >= threshold
+        return self.top_k(scores[above_the_threshold], k=k, rows=rows[above_the_threshold])
+
+    def top_candidates(self, subject: str, k: int, label_threshold: int,
+                       alias_threshold: int) -> Tuple[List[OntologyCandidate], List[OntologyCandidate]]:
+        """Returns the k best label and alias matches with a score of at least the thresholds
+
+        They are the same as top_k over the scores of every row above the thresholds."""
+        if subject is None:
+            raise ValueError("subject was None")
+        subject = subject.lower()
+        return (self.__top_candidates__(subject, index=self.label_index, threshold=label_threshold, k=k),
+                self.__top_candidates__(subject, index=self.alias_index, threshold=alias_threshold, k=k))
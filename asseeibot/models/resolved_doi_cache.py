@@ -0,0 +1,138 @@
+import json
+import logging
+import sqlite3
+import threading
+from time import time
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class ResolvedDoi(BaseModel):
+    """The outcome of looking up a DOI in Wikidata and Crossref and matching its subjects"""
+    doi: str
+    found_in_wikidata: bool = False
+    qid: Optional[str]
+    found_in_crossref: bool = False
+    subjects: List[str] = []
+    matched_qids: List[str] = []
+    timestamp: float = None
+
+
+class ResolvedDoiCache:
+    """This remembers how the DOIs were resolved so a DOI cited on many
+    pages is only looked up once
+
+    DOIs found in Wikidata are remembered for longer than the DOIs that were
+    not because the missing items might be created any time. The expired
+    DOIs are deleted now and then and the oldest ones when there are more
+    than max_dois.
+
+    The workers use it from several threads so all access is locked."""
+    connection: sqlite3.Connection = None
+    lock: threading.Lock = None
+    max_dois: int = 1000000
+    misses: int = 0
+    negative_hits: int = 0
+    negative_ttl_seconds: float = 0
+    positive_hits: int = 0
+    positive_ttl_seconds: float = 0
+    puts_since_eviction: int = 0
+
+    def __init__(self,
+                 filename: str = None,
+                 positive_ttl_seconds: float = 0,
+                 negative_ttl_seconds: float = 0,
+                 max_dois: int = 1000000):
+        """The cache is only kept in memory if no filename is given"""
+        self.positive_ttl_seconds = positive_ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_dois = max_dois
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(filename if filename is not None else ":memory:",
+                                          check_same_thread=False)
+        self.connection.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS resolved_doi (
+                doi TEXT PRIMARY KEY,
+                found_in_wikidata INTEGER NOT NULL,
+                qid TEXT,
+                found_in_crossref INTEGER NOT NULL,
+                subjects TEXT NOT NULL,
+                matched_qids TEXT NOT NULL,
+                timestamp REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS resolved_doi_timestamp ON resolved_doi (timestamp);
+        """)
+        self.__evict__()
+        self.connection.commit()
+
+    def __evict__(self):
+        """This is done now and then because counting the rows is not free"""
+        self.puts_since_eviction = 0
+        now = time()
+        deleted = self.connection.execute(
+            "DELETE FROM resolved_doi WHERE timestamp < CASE found_in_wikidata WHEN 1 THEN ? ELSE ? END",
+            (now - self.positive_ttl_seconds, now - self.negative_ttl_seconds)
+        ).rowcount
+        count = self.connection.execute("SELECT COUNT(*) FROM resolved_doi").fetchone()[0]
+        if count > self.max_dois:
+            deleted += self.connection.execute(
+                "DELETE FROM resolved_doi WHERE doi IN "
+                "(SELECT doi FROM resolved_doi ORDER BY timestamp LIMIT ?)",
+                (count - self.max_dois,)
+            ).rowcount
+        if deleted > 0:
+            logger.debug(f"Evicted {deleted} DOIs from the resolved DOI cache")
+
+    def add(self, resolved_doi: ResolvedDoi):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO resolved_doi VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (resolved_doi.doi.upper(), resolved_doi.found_in_wikidata, resolved_doi.qid,
+                 resolved_doi.found_in_crossref, json.dumps(resolved_doi.subjects),
+                 json.dumps(resolved_doi.matched_qids), time())
+            )
+            self.puts_since_eviction += 1
+            if self.puts_since_eviction >= 1000:
+                self.__evict__()
+            self.connection.commit()
+
+    def get(self, doi: str) -> Optional[ResolvedDoi]:
+        """Returns None if the DOI is not cached or expired"""
+        with self.lock:
+            row = self.connection.execute("SELECT * FROM resolved_doi WHERE doi = ?", (doi.upper(),)).fetchone()
+            if row is not None:
+                resolved_doi = ResolvedDoi(
+                    doi=row[0],
+                    found_in_wikidata=bool(row[1]),
+                    qid=row[2],
+                    found_in_crossref=bool(row[3]),
+                    subjects=json.loads(row[4]),
+                    matched_qids=json.loads(row[5]),
+                    timestamp=row[6]
+                )
+                age = time() - resolved_doi.timestamp
+                if resolved_doi.found_in_wikidata and age < self.positive_ttl_seconds:
+                    self.positive_hits += 1
+                    return resolved_doi
+                if not resolved_doi.found_in_wikidata and age < self.negative_ttl_seconds:
+                    self.negative_hits += 1
+                    return resolved_doi
+            self.misses += 1
+            return None
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM resolved_doi").fetchone()[0]
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.positive_hits + self.negative_hits + self.misses
+        if lookups > 0:
+            return (self.positive_hits + self.negative_hits) / lookups
+        else:
+            return 0.0
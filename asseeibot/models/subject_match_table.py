@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+from hashlib import blake2b
+from typing import Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+from pandas import DataFrame
+
+from asseeibot.helpers.util import open_text_file
+from asseeibot.models.named_entity_recognition import SupportedSplit
+from asseeibot.models.ontology_dataframe import OntologyDataframeColumn
+from asseeibot.models.ontology_scoring_engine import OntologyCandidate, OntologyScoringEngine
+
+logger = logging.getLogger(__name__)
+
+# The label and alias candidates as (row, score) tuples
+TableEntry = Tuple[Tuple[Tuple[int, int], ...], Tuple[Tuple[int, int], ...]]
+
+
+def ontology_hash(dataframe: DataFrame) -> str:
+    """The hash of the rows, items, labels and aliases. The table stores rows so their order matters."""
+    columns = [OntologyDataframeColumn.ITEM.value,
+               OntologyDataframeColumn.LABEL.value,
+               OntologyDataframeColumn.ALIAS.value]
+    hashes = pd.util.hash_pandas_object(dataframe[columns], index=True)
+    return blake2b(hashes.values.tobytes(), digest_size=16).hexdigest()
+
+
+def subjects_to_look_up(original_subject: str) -> List[str]:
+    """The whole subject and the parts NamedEntityRecognition looks up after splitting it"""
+    original_subject = original_subject.strip()
+    subjects = [original_subject]
+    for supported_split in SupportedSplit:
+        parts = original_subject.split(supported_split.value)
+        if len(parts) > 1:
+            subjects.extend(part.strip() for part in parts)
+    return subjects
+
+
+class SubjectMatchTableBuilder:
+    """Matches a vocabulary of Crossref subjects against the ontology once
+
+    The vocabulary file has one subject per line, e.g. the ASJC categories."""
+    vocabulary_filename: str = None
+
+    def __init__(self, vocabulary_filename: str = None):
+        if vocabulary_filename is None or vocabulary_filename == "":
+            raise ValueError("vocabulary_filename was None or empty string")
+        self.vocabulary_filename = vocabulary_filename
+
+    def __read_subjects__(self) -> Set[str]:
+        subjects = set()
+        with open_text_file(self.vocabulary_filename) as file:
+            for line in file:
+                if line.strip() != "":
+                    subjects.update(subjects_to_look_up(line))
+        return subjects
+
+    def build(self, filename: str, dataframe: DataFrame, engine: OntologyScoringEngine,
+              k: int, label_threshold: int, alias_threshold: int) -> int:
+        """Write the table and return the number of subjects in it"""
+        matches: Dict[str, TableEntry] = dict()
+        for subject in self.__read_subjects__():
+            key = subject.lower()
+            if key in matches:
+                continue
+            label_candidates, alias_candidates = engine.top_candidates(
+                subject=subject, k=k, label_threshold=label_threshold, alias_threshold=alias_threshold
+            )
+            matches[key] = (tuple((int(row), int(score)) for row, score in label_candidates),
+                            tuple((int(row), int(score)) for row, score in alias_candidates))
+        # JSON instead of pickle so loading a table can't run any code
+        with open(filename, "w") as file:
+            json.dump(dict(
+                ontology_hash=ontology_hash(dataframe),
+                k=k,
+                label_threshold=label_threshold,
+                alias_threshold=alias_threshold,
+                matches=matches,
+            ), file, separators=(",", ":"))
+        return len(matches)
+
+
+class SubjectMatchTable:
+    """The candidates of the subjects in the vocabulary matched by SubjectMatchTableBuilder
+
+    The table is only used if it was built from the same ontology with the
+    same thresholds and number of candidates, otherwise load returns None."""
+    hits: int = 0
+    matches: Dict[str, TableEntry] = None
+    misses: int = 0
+
+    def __init__(self, matches: Dict[str, TableEntry] = None):
+        if matches is None:
+            raise ValueError("matches was None")
+        self.matches = matches
+
+    def __len__(self):
+        return len(self.matches)
+
+    @classmethod
+    def load(cls, filename: str, dataframe: DataFrame, k: int,
+             label_threshold: int, alias_threshold: int) -> Optional["SubjectMatchTable"]:
+        if filename is None or not os.path.exists(filename):
+            return None
+        with open(filename) as file:
+            table = json.load(file)
+        if table["ontology_hash"] != ontology_hash(dataframe):
+            logger.warning(f"The subject match table {filename} was built from another version "
+                           f"of the ontology and is not used. Please build it again.")
+            return None
+        if (table["k"], table["label_threshold"], table["alias_threshold"]) != (k, label_threshold, alias_threshold):
+            logger.warning(f"The subject match table {filename} was built with other thresholds "
+                           f"or number of candidates and is not used. Please build it again.")
+            return None
+        logger.info(f"Loaded {len(table['matches'])} subjects from the subject match table")
+        # JSON has no tuples so the candidates come back as lists
+        return cls(matches={subject: (tuple(tuple(candidate) for candidate in label_candidates),
+                                      tuple(tuple(candidate) for candidate in alias_candidates))
+                            for subject, (label_candidates, alias_candidates) in table["matches"].items()})
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def get(self, subject: str) -> Optional[Tuple[List[OntologyCandidate], List[OntologyCandidate]]]:
+        """Returns the label and alias candidates or None if the subject was not in the vocabulary"""
+        entry = self.matches.get(subject.lower())
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        label_candidates, alias_candidates = entry
+        return ([OntologyCandidate(*candidate) for candidate in label_candidates],
+                [OntologyCandidate(*candidate) for candidate in alias_candidates])
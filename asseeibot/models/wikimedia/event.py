@@ -5,28 +5,48 @@ from urllib.parse import quote
 
 from asseeibot.models.wikimedia.enums import WikimediaEditType
 from asseeibot.models.wikimedia.wikipedia.wikipedia_page import WikipediaPage
+from asseeibot.models.wikimedia.wikipedia.wikitext_fetcher import FetchedRevision
 
 
 class WikimediaEvent:
     """This models a WMF kafka event from the EventStream API"""
     bot_edit: bool
+    checkpoint_sequence: int = None
     edit_type: WikimediaEditType = None
     event_data: Dict[str, str] = None
+    event_datetime: str = None
+    event_id: str = None
     event_stream: Any = None  # We can't type this because of pydantic
     language_code: str = None
     namespace: int = None
+    new_revision_id: int = None
+    old_revision: FetchedRevision = None
+    old_revision_id: int = None
+    # The key of the page in the PageDeduplicationStore
+    page_key: int = None
+    # The asyncio.Task started by the EventStream that fetches the revisions
+    revisions_prefetch: Any = None
     page_title: str = None
+    # These are fetched by the EventStream before the event is processed
+    revision: FetchedRevision = None
     server_name: str = None
     wikipedia_page: WikipediaPage = None
 
     def __init__(self, event: Any = None,
-                 event_stream: Any = None):
+                 event_stream: Any = None,
+                 event_data: Dict[str, Any] = None):
+        """The event_data can be given if the event was already parsed during triage"""
         if event is None:
             raise ValueError("event was None")
-        self.event_data = json.loads(str(event))
+        if event_data is not None:
+            self.event_data = event_data
+        else:
+            self.event_data = json.loads(str(event))
         if self.event_data is None:
             raise ValueError(f"got None after parsing the event {event} to json")
         self.event_stream = event_stream
+        # This is the id of the server side event and not the id of the change
+        self.event_id = getattr(event, "id", None)
         if self.event_stream.event_site is None:
             raise ValueError("got no site")
         if self.event_stream.language_code is None:
@@ -34,20 +54,31 @@ class WikimediaEvent:
         self.__parse__()
 
     def __parse__(self):
-        # meta = data["meta"]
+        self.event_datetime = self.event_data.get('meta', {}).get('dt')
         self.server_name = self.event_data['server_name']
         self.namespace = int(self.event_data['namespace'])
         self.language_code = self.server_name.replace(f".{self.event_stream.event_site.value}.org", "")
         self.page_title = self.event_data['title']
         self.bot_edit = bool(self.event_data['bot'])
         self.edit_type = WikimediaEditType(self.event_data['type'])
+        # This is missing for log events and the old revision is missing for new pages
+        revision = self.event_data.get('revision') or {}
+        self.old_revision_id = revision.get('old')
+        self.new_revision_id = revision.get('new')
+
+    def is_article_edit(self) -> bool:
+        """This is cheap and is used by the reader to filter the events
+        before they are queued for processing"""
+        if self.language_code != self.event_stream.language_code:
+            return False
+        # We only want the article namespace (0)
+        return self.server_name.find(self.event_stream.event_site.value) != -1 and self.namespace == 0
 
     def process(self):
+        """This blocks while fetching the page and looking up the DOIs
+        so it is run by the workers in a thread"""
         logger = logging.getLogger(__name__)
-        if self.language_code != "en":
-            return
-        # We only want the article namespace (0)
-        if self.server_name.find(self.event_stream.event_site.value) != -1 and self.namespace == 0:
+        if self.is_article_edit():
             logger.info("Found enwp article edit")
             self.__print_progress__()
             self.wikipedia_page = WikipediaPage(wikimedia_event=self)
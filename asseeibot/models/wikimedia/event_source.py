@@ -0,0 +1,118 @@
+import asyncio
+import json
+import logging
+import random
+from datetime import datetime, timezone
+from time import monotonic, time
+from typing import AsyncGenerator, IO, List
+
+from aiosseclient import Event
+
+from asseeibot.helpers.util import open_text_file
+
+logger = logging.getLogger(__name__)
+
+
+class EventRecorder:
+    """This records the raw events from the stream to a JSONL file
+    with one recentchange event per line, so they can be replayed later"""
+    file: IO = None
+    filename: str = None
+    number_of_events: int = 0
+
+    def __init__(self, filename: str = None):
+        self.filename = filename
+        self.file = open_text_file(filename=filename, mode="a")
+
+    def close(self):
+        self.file.close()
+        logger.info(f"Recorded {self.number_of_events} events to {self.filename}")
+
+    def record(self, event: Event):
+        # The data of an event from the stream is the JSON on a single line
+        self.file.write(event.data.replace("\n", ""))
+        self.file.write("\n")
+        self.number_of_events += 1
+
+
+class ReplayEventSource:
+    """This replays events recorded by the EventRecorder
+
+    With a speed of 0 the events are replayed as fast as possible.
+    Otherwise they are replayed at speed times the pace of their
+    original timestamps."""
+    filename: str = None
+    speed: float = 0
+
+    def __init__(self, filename: str = None, speed: float = 0):
+        if speed < 0:
+            raise ValueError("speed cannot be negative")
+        self.filename = filename
+        self.speed = speed
+
+    @staticmethod
+    def __get_timestamp__(line: str):
+        try:
+            return json.loads(line).get("timestamp")
+        except ValueError:
+            return None
+
+    async def events(self) -> AsyncGenerator[Event, None]:
+        first_timestamp = None
+        start = monotonic()
+        with open_text_file(filename=self.filename, mode="r") as file:
+            for number, line in enumerate(file):
+                line = line.strip()
+                if line == "":
+                    continue
+                if self.speed > 0:
+                    timestamp = self.__get_timestamp__(line)
+                    if timestamp is not None:
+                        if first_timestamp is None:
+                            first_timestamp = timestamp
+                        delay = (timestamp - first_timestamp) / self.speed - (monotonic() - start)
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                elif number % 1000 == 0:
+                    # Let the workers have a go now and then
+                    await asyncio.sleep(0)
+                yield Event(data=line)
+
+
+class SyntheticEventSource:
+    """This generates fake recentchange events with roughly the mix of
+    the real stream, so the pipeline can be measured without network access"""
+    article_share: float = 0.05
+    number_of_events: int = 0
+    number_of_titles: int = 10000
+    other_server_names: List[str] = ["www.wikidata.org", "commons.wikimedia.org",
+                                     "de.wikipedia.org", "fr.wikipedia.org"]
+
+    def __init__(self, number_of_events: int = 0, article_share: float = 0.05):
+        if number_of_events < 1:
+            raise ValueError("number_of_events must be positive")
+        self.number_of_events = number_of_events
+        self.article_share = article_share
+
+    def __generate__(self, number: int) -> str:
+        # This is not used for anything security related
+        article_edit = random.random() < self.article_share  # nosec: B311
+        old_length = random.randint(100, 100000)  # nosec: B311
+        return json.dumps(dict(
+            id=number,
+            type="edit" if article_edit else random.choice(["edit", "new", "log", "categorize"]),  # nosec: B311
+            namespace=0 if article_edit else random.choice([0, 1, 2, 4, 6, 14]),  # nosec: B311
+            title=f"Synthetic page {random.randrange(self.number_of_titles)}",  # nosec: B311
+            timestamp=int(time()),
+            bot=random.random() < 0.1,  # nosec: B311
+            length=dict(old=old_length, new=old_length + random.randint(-500, 500)),  # nosec: B311
+            revision=dict(old=number, new=number + 1),
+            server_name="en.wikipedia.org" if article_edit else random.choice(self.other_server_names),  # nosec: B311
+            meta=dict(dt=datetime.now(timezone.utc).isoformat()),
+        ))
+
+    async def events(self) -> AsyncGenerator[Event, None]:
+        for number in range(self.number_of_events):
+            if number % 1000 == 0:
+                await asyncio.sleep(0)
+            yield Event(data=self.__generate__(number), id=None)
@@ -1,23 +1,47 @@
 import asyncio
 import logging
-from typing import List, Set
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from time import monotonic
+from typing import AsyncGenerator, Dict, List, Set
 
 import pywikibot
-from aiohttp import ClientPayloadError
-from aiosseclient import aiosseclient
+from aiohttp import ClientError
+from aiosseclient import aiosseclient, Event
 from purl import URL
 from pywikibot import APISite
 
 import config
+from asseeibot import runtime_variables
 from asseeibot.helpers.console import console
+from asseeibot.models.crossref.client import CrossrefClient
+from asseeibot.models.crossref.response_cache import CrossrefResponseCache
 from asseeibot.models.identifiers.doi import Doi
+from asseeibot.models.resolved_doi_cache import ResolvedDoiCache
 from asseeibot.models.pywikibot import PywikibotSite
 from asseeibot.models.wikimedia.enums import WikimediaSite
 from asseeibot.models.wikimedia.event import WikimediaEvent
+from asseeibot.models.wikimedia.event_source import EventRecorder, ReplayEventSource, SyntheticEventSource
+from asseeibot.models.wikimedia.event_triage import EventTriage
+from asseeibot.models.wikimedia.wikidata.doi_bloom_filter import DoiBloomFilter
+from asseeibot.models.wikimedia.wikidata.doi_index import DoiIndex
+from asseeibot.models.wikimedia.wikidata.hub_client import HubClient
+from asseeibot.models.wikimedia.page_deduplication_store import PageDeduplicationStore
+from asseeibot.models.wikimedia.stream_checkpoint import StreamCheckpoint
+from asseeibot.models.wikimedia.wikipedia.wikitext_cache import WikitextCache
+from asseeibot.models.wikimedia.wikipedia.wikitext_fetcher import WikitextFetcher
 
 
 class EventStream:
-    """This models an event stream from WMF"""
+    """This models an event stream from WMF
+
+    The stream is consumed by a reader task that only pulls and filters
+    events and puts them on a bounded queue. A configurable number of
+    workers take the events from the queue and fetch the page, resolve
+    the DOIs and match the subjects in a thread pool, so a slow lookup
+    does not stall the connection to the stream."""
     language_code: str = None
     pywikibot_site: PywikibotSite = None
     event_site: WikimediaSite = None
@@ -26,73 +50,340 @@ class EventStream:
     missing_identitifier_limit: int = config.missing_identitifier_limit
     total_number_of_missing_dois: int = 0
     total_number_of_dois: int = 0
+    total_number_of_failed_lookups: int = 0
     total_number_of_missing_isbn: int = 0
     total_number_of_isbn: int = 0
     event_count: int = 0
-    earlier_events: Set[str] = set()
+    page_store: PageDeduplicationStore = None
+    # The keys of the pages that are queued or being processed. They are only
+    # added to the page_store when processed so a crash does not lose them.
+    pages_in_flight: Set[int] = None
+    # The workers that are processing an event and not waiting for one
+    busy_workers: Set[int] = None
+    checkpoint: StreamCheckpoint = None
+    triage: EventTriage = None
+    executor: ThreadPoolExecutor = None
+    fetcher: WikitextFetcher = None
+    queue: asyncio.Queue = None
+    number_of_events_queued: int = 0
+    number_of_events_read: int = 0
+    process_events: bool = True
+    recorder: EventRecorder = None
+    replay_file: str = None
+    replay_speed: float = 0
+    start_time: float = None
+    # Set when a limit is reached. The workers finish their events and return
+    stop_requested: asyncio.Event = None
+    synthetic_events: int = 0
+    wikitext_cache: WikitextCache = None
 
     async def __get_events__(self):
         """Get events from the event stream until missing identifier limit"""
-        logger = logging.getLogger(__name__)
         if not isinstance(self.missing_identitifier_limit, int) and self.missing_identitifier_limit > 0:
             raise ValueError("missing_identitifier_limit not an int or 0")
+        if not isinstance(config.number_of_workers, int) or config.number_of_workers < 1:
+            raise ValueError("number_of_workers must be a positive int")
         self.pywikibot_site: APISite = self.__instantiate_pywikibot__()
         self.event_count = 0
+        self.queue = asyncio.Queue(maxsize=config.event_queue_size)
+        # The page processing uses blocking libraries (pywikibot, habanero
+        # and requests) so we run it in threads outside the event loop
+        self.executor = ThreadPoolExecutor(max_workers=config.number_of_workers,
+                                           thread_name_prefix="worker")
+        if config.number_of_processes_for_large_pages > 0:
+            # Forking a process with running threads is unsafe
+            runtime_variables.process_pool = ProcessPoolExecutor(
+                max_workers=config.number_of_processes_for_large_pages,
+                mp_context=multiprocessing.get_context("forkserver")
+            )
+        self.fetcher = WikitextFetcher(
+            api_url=f"https://{self.language_code}.{self.event_site.value}.org/w/api.php",
+            batch_size=config.wikitext_fetch_batch_size,
+            max_wait_seconds=config.wikitext_fetch_max_wait_seconds,
+            max_connections=config.wikitext_fetch_max_connections
+        )
+        runtime_variables.hub_client = HubClient(
+            loop=asyncio.get_running_loop(),
+            max_concurrent_requests=config.hub_max_concurrent_requests,
+            timeout_seconds=config.hub_timeout_seconds
+        )
+        runtime_variables.crossref_client = CrossrefClient(
+            loop=asyncio.get_running_loop(),
+            mailto=config.crossref_polite_pool_email,
+            max_concurrent_requests=config.crossref_max_concurrent_requests,
+            timeout_seconds=config.crossref_timeout_seconds,
+            batch_size=config.crossref_batch_size
+        )
+        self.busy_workers = set()
+        self.stop_requested = asyncio.Event()
+        reader = asyncio.ensure_future(self.__read_events__())
+        workers = {number: asyncio.ensure_future(self.__process_events__(worker_number=number))
+                   for number in range(config.number_of_workers)}
+        stop = asyncio.ensure_future(self.stop_requested.wait())
+        try:
+            # The reader only returns when replayed or synthetic events run out,
+            # the workers return when a limit is reached or if something went wrong
+            done, _ = await asyncio.wait([reader, stop, *workers.values()],
+                                         return_when=asyncio.FIRST_COMPLETED)
+            await self.__stop__(reader=reader, workers=workers)
+            stop.cancel()
+            for task in [reader, *workers.values()]:
+                if task.done() and not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        finally:
+            self.executor.shutdown(wait=False)
+            if runtime_variables.process_pool is not None:
+                runtime_variables.process_pool.shutdown(wait=False)
+                runtime_variables.process_pool = None
+            await self.fetcher.close()
+            await runtime_variables.hub_client.close()
+            await runtime_variables.crossref_client.close()
+            self.checkpoint.save()
+            if self.recorder is not None:
+                self.recorder.close()
+
+    async def __stop__(self, reader: asyncio.Task, workers: Dict[int, asyncio.Task]):
+        """Stop reading and let the busy workers finish their events
+        so they are marked done in the checkpoint"""
+        self.stop_requested.set()
+        reader.cancel()
+        for number, worker in workers.items():
+            if number not in self.busy_workers:
+                worker.cancel()
+        await asyncio.gather(reader, *workers.values(), return_exceptions=True)
+        # The events left on the queue are read again after a restart
+        while not self.queue.empty():
+            wmf_event = self.queue.get_nowait()
+            if wmf_event.revisions_prefetch is not None:
+                wmf_event.revisions_prefetch.cancel()
+
+    async def __read_events__(self):
+        """Read events from the source and put the ones we want to process on the queue
+
+        This should never block on anything but the queue"""
+        self.start_time = monotonic()
+        async for event in self.__events__():
+            self.number_of_events_read += 1
+            if self.recorder is not None:
+                self.recorder.record(event)
+            await self.__handle_event__(event=event)
+        # Only replayed and synthetic events run out
+        await self.queue.join()
+        self.__print_throughput__()
+
+    def __events__(self) -> AsyncGenerator[Event, None]:
+        if self.replay_file is not None:
+            return ReplayEventSource(filename=self.replay_file,
+                                     speed=self.replay_speed).events()
+        elif self.synthetic_events > 0:
+            return SyntheticEventSource(number_of_events=self.synthetic_events).events()
+        else:
+            return self.__live_events__()
+
+    async def __handle_event__(self, event: Event):
+        logger = logging.getLogger(__name__)
+        event_data = self.triage.triage(str(event))
+        if event_data is None:
+            self.checkpoint.mark_skipped(event_id=event.id)
+            return
+        wmf_event = WikimediaEvent(event=event,
+                                   event_data=event_data,
+                                   event_stream=self)
+        wmf_event.checkpoint_sequence = self.checkpoint.register(
+            event_id=wmf_event.event_id,
+            event_datetime=wmf_event.event_datetime
+        )
+        if wmf_event.page_title is not None:
+            logger.debug(f"Page title found: {wmf_event.page_title}")
+            if await self.__queue_if_new_article_edit__(wmf_event=wmf_event):
+                # The worker marks it done in the checkpoint
+                return
+        else:
+            logger.error("page title was None")
+        self.checkpoint.mark_done(wmf_event.checkpoint_sequence)
+
+    async def __live_events__(self) -> AsyncGenerator[Event, None]:
+        """Get events from the live stream forever and reconnect when needed"""
+        logger = logging.getLogger(__name__)
+        attempt = 0
         # We run in a while loop so we can continue even if we get a ClientPayloadError
         while True:
             try:
                 async for event in aiosseclient(
-                        'https://stream.wikimedia.org/v2/stream/recentchange',
+                        self.__stream_url__(),
+                        last_id=self.checkpoint.event_id
                 ):
-                    wmf_event = WikimediaEvent(event=event,
-                                               event_stream=self)
-                    if wmf_event.page_title is not None:
-                        logger.debug(f"Page title found: {wmf_event.page_title}")
-                        if wmf_event.page_title not in self.earlier_events:
-                            logger.debug("Processing new event")
-                            wmf_event.process()
-                            self.earlier_events.add(wmf_event.page_title)
-                            if wmf_event.wikipedia_page is not None:
-                                self.total_number_of_missing_dois += wmf_event.wikipedia_page.number_of_missing_dois
-                                self.total_number_of_dois += wmf_event.wikipedia_page.number_of_dois
-                                missing_dois = wmf_event.wikipedia_page.missing_dois
-                                if missing_dois is not None and len(missing_dois) > 0:
-                                    self.missing_dois.extend(missing_dois)
-                                self.__print_statistics__()
-                                self.event_count += 1
-                        else:
-                            logger.debug("Skipping page already processed earlier")
-                    else:
-                        logger.error("page title was None")
-                    if (
-                            self.total_number_of_missing_dois  # +
-                            # self.total_number_of_missing_isbn
-                    ) >= self.missing_identitifier_limit:
-                        print(f"Reached missing identifier limit of {self.missing_identitifier_limit}. Exiting")
-                        self.__print_missing_dois__()
-                        self.__print_sourcemd_link__()
-                        exit(0)
-                    if config.max_events > 0 and self.event_count == config.max_events:
-                        exit(0)
-            except ClientPayloadError:
-                logger.error("ClientPayloadError")
-                continue
-            if config.max_events > 0 and self.event_count == config.max_events:
-                exit(0)
+                    attempt = 0
+                    yield event
+            except (ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"{type(e).__name__}: {e}")
+            delay = self.__reconnect_delay__(attempt=attempt)
+            attempt += 1
+            logger.info(f"Reconnecting to the stream in {round(delay, 1)}s")
+            await asyncio.sleep(delay)
+
+    async def __queue_if_new_article_edit__(self, wmf_event: WikimediaEvent) -> bool:
+        """Returns True if the event was queued"""
+        logger = logging.getLogger(__name__)
+        if not wmf_event.is_article_edit():
+            logger.debug(f"Skipping event from {wmf_event.server_name}")
+            return False
+        key = self.page_store.key(server_name=wmf_event.server_name,
+                                  page_title=wmf_event.page_title)
+        if key in self.pages_in_flight:
+            logger.debug("Skipping page already queued")
+            return False
+        if self.page_store.seen(key):
+            logger.debug("Skipping page already processed recently")
+            return False
+        logger.debug("Queueing new event")
+        # We remember it here already so that no other worker picks up the same page
+        self.pages_in_flight.add(key)
+        wmf_event.page_key = key
+        if self.process_events:
+            # The fetch starts when the event is queued so the requests of all the
+            # queued events fill the batches instead of only those of the workers
+            wmf_event.revisions_prefetch = asyncio.ensure_future(self.__fetch_revisions__(wmf_event=wmf_event))
+        await self.queue.put(wmf_event)
+        self.number_of_events_queued += 1
+        return True
+
+    async def __process_events__(self, worker_number: int):
+        """Process events from the queue until a limit is reached"""
+        logger = logging.getLogger(__name__)
+        loop = asyncio.get_running_loop()
+        while not self.stop_requested.is_set():
+            wmf_event = await self.queue.get()
+            self.busy_workers.add(worker_number)
+            try:
+                logger.debug(f"Worker {worker_number} is processing '{wmf_event.page_title}'")
+                if self.process_events:
+                    await wmf_event.revisions_prefetch
+                    await loop.run_in_executor(self.executor, wmf_event.process)
+                self.__update_statistics__(wmf_event=wmf_event)
+                self.page_store.add(wmf_event.page_key)
+                self.checkpoint.mark_done(wmf_event.checkpoint_sequence)
+            finally:
+                self.busy_workers.discard(worker_number)
+                self.pages_in_flight.discard(wmf_event.page_key)
+                self.queue.task_done()
+            if self.__limit_reached__():
+                self.stop_requested.set()
+
+    async def __fetch_revisions__(self, wmf_event: WikimediaEvent):
+        """Fetch the wikitext in batches together with the other queued events.
+        Revisions in the wikitext cache are not fetched again and
+        the page falls back to pywikibot for the revisions we could not fetch"""
+        async def no_revision():
+            return None
+
+        if wmf_event.new_revision_id is None:
+            new_revision = self.fetcher.fetch_title(wmf_event.page_title)
+        elif wmf_event.new_revision_id in self.wikitext_cache:
+            new_revision = no_revision()
+        else:
+            new_revision = self.fetcher.fetch_revision(wmf_event.new_revision_id)
+        if (
+                config.only_lookup_dois_added_by_the_edit and
+                wmf_event.old_revision_id is not None and
+                wmf_event.old_revision_id not in self.wikitext_cache
+        ):
+            old_revision = self.fetcher.fetch_revision(wmf_event.old_revision_id)
+        else:
+            old_revision = no_revision()
+        wmf_event.revision, wmf_event.old_revision = await asyncio.gather(new_revision, old_revision)
 
     def __init__(self,
                  language_code: str = None,
-                 event_site: WikimediaSite = None
+                 event_site: WikimediaSite = None,
+                 replay_file: str = None,
+                 replay_speed: float = 0,
+                 synthetic_events: int = 0,
+                 record_file: str = None,
+                 process_events: bool = True
                  ):
+        """Replayed or synthetic events are read instead of the live stream if given.
+        They don't touch the deduplication store on disk or the checkpoint"""
         if language_code is None or event_site is None:
             raise ValueError("did not get what we need")
         self.language_code = language_code
         self.event_site = event_site
+        self.replay_file = replay_file
+        self.replay_speed = replay_speed
+        self.synthetic_events = synthetic_events
+        self.process_events = process_events
+        live = self.replay_file is None and self.synthetic_events == 0
+        if record_file is not None:
+            if not live:
+                raise ValueError("only the live stream can be recorded")
+            self.recorder = EventRecorder(filename=record_file)
         self.missing_dois = []
+        self.pages_in_flight = set()
+        self.page_store = PageDeduplicationStore(
+            max_entries_in_memory=config.dedup_max_pages_in_memory,
+            reprocess_window_seconds=config.dedup_reprocess_window_hours * 3600,
+            sqlite_filename=config.dedup_sqlite_filename if live else None,
+            max_entries_on_disk=config.dedup_max_pages_on_disk
+        )
+        self.triage = EventTriage(
+            server_names=config.triage_server_names,
+            namespaces=config.triage_namespaces,
+            edit_types=config.triage_edit_types,
+            skip_bot_edits=config.triage_skip_bot_edits,
+            min_length_change=config.triage_min_length_change
+        )
+        self.checkpoint = StreamCheckpoint(filename=config.checkpoint_filename if live else None,
+                                           interval_seconds=config.checkpoint_interval_seconds)
+        # The revisions never change so the cache is also useful when replaying
+        self.wikitext_cache = WikitextCache(
+            filename=config.wikitext_cache_filename,
+            max_revisions_in_memory=config.wikitext_cache_max_revisions_in_memory,
+            max_revisions_on_disk=config.wikitext_cache_max_revisions_on_disk
+        )
+        if config.doi_index_filename is not None and os.path.exists(config.doi_index_filename):
+            runtime_variables.doi_index = DoiIndex(filename=config.doi_index_filename,
+                                                   max_age_seconds=config.doi_index_max_age_days * 86400)
+            console.print(f"Loaded {len(runtime_variables.doi_index)} DOIs from {config.doi_index_filename}")
+        runtime_variables.crossref_response_cache = CrossrefResponseCache(
+            filename=config.crossref_cache_filename,
+            ttl_seconds=config.crossref_cache_ttl_days * 86400,
+            max_megabytes=config.crossref_cache_max_megabytes
+        )
+        runtime_variables.resolved_doi_cache = ResolvedDoiCache(
+            filename=config.resolved_doi_cache_filename,
+            positive_ttl_seconds=config.resolved_doi_cache_positive_ttl_hours * 3600,
+            negative_ttl_seconds=config.resolved_doi_cache_negative_ttl_hours * 3600,
+            max_dois=config.resolved_doi_cache_max_dois
+        )
+        if config.doi_bloom_filter_filename is not None and os.path.exists(config.doi_bloom_filter_filename):
+            runtime_variables.doi_bloom_filter = DoiBloomFilter(
+                filename=config.doi_bloom_filter_filename,
+                max_age_seconds=config.doi_bloom_filter_max_age_days * 86400
+            )
+            console.print(f"Loaded a Bloom filter of {runtime_variables.doi_bloom_filter.size // 1024} kB "
+                          f"with {runtime_variables.doi_bloom_filter.number_of_dois} DOIs "
+                          f"from {config.doi_bloom_filter_filename}")
         self.__instantiate_pywikibot__()
         loop = asyncio.get_event_loop()
         loop.run_until_complete(self.__get_events__())
 
+    def __limit_reached__(self) -> bool:
+        """Returns True if we reached one of the limits in the config"""
+        if self.stop_requested.is_set():
+            return True
+        if (
+                self.total_number_of_missing_dois  # +
+                # self.total_number_of_missing_isbn
+        ) >= self.missing_identitifier_limit:
+            print(f"Reached missing identifier limit of {self.missing_identitifier_limit}. Exiting")
+            self.__print_missing_dois__()
+            self.__print_sourcemd_link__()
+            return True
+        if config.max_events > 0 and self.event_count >= config.max_events:
+            print(f"Reached the limit of {config.max_events} events. Exiting")
+            return True
+        return False
+
     def __instantiate_pywikibot__(self):
         return pywikibot.Site(code=self.language_code, fam=self.event_site.value)
 
@@ -119,4 +410,79 @@ class EventStream:
             console.print(f"Processed {self.event_count} events and found {self.total_number_of_dois}" +
                           f" DOIs. {self.total_number_of_missing_dois} "
                           f"({percentage}%) "
-                          f"are missing in WD.")
+                          f"are missing in WD. "
+                          f"{self.total_number_of_failed_lookups} could not be looked up via Hub. "
+                          f"{self.queue.qsize()} events are waiting in the queue.")
+            console.print(f"Remembering {len(self.page_store)} pages using "
+                          f"~{self.page_store.memory_footprint // 1024} kB. "
+                          f"{int(round(self.page_store.hit_rate * 100, 0))}% of the "
+                          f"article edits were to pages processed recently.")
+            console.print(self.triage.summary())
+            console.print(f"{int(round(self.wikitext_cache.hit_rate * 100, 0))}% of the revisions "
+                          f"were found in the wikitext cache.")
+            resolved_doi_cache = runtime_variables.resolved_doi_cache
+            console.print(f"{int(round(resolved_doi_cache.hit_rate * 100, 0))}% of the DOIs were "
+                          f"resolved recently ({resolved_doi_cache.positive_hits} found and "
+                          f"{resolved_doi_cache.negative_hits} missing in Wikidata).")
+            console.print(f"{int(round(runtime_variables.crossref_response_cache.hit_rate * 100, 0))}% "
+                          f"of the works were found in the Crossref cache.")
+            if runtime_variables.doi_index is not None:
+                console.print(f"The DOI index found {runtime_variables.doi_index.hits} DOIs and "
+                              f"did not find {runtime_variables.doi_index.misses}.")
+            bloom_filter = runtime_variables.doi_bloom_filter
+            if bloom_filter is not None:
+                if bloom_filter.is_stale:
+                    console.print(f"The Bloom filter is stale. It had {bloom_filter.hits} hits and "
+                                  f"{bloom_filter.misses} misses that were looked up anyway.")
+                else:
+                    console.print(f"The Bloom filter had {bloom_filter.hits} hits and "
+                                  f"skipped {bloom_filter.misses} DOIs that are not in Wikidata.")
+            if runtime_variables.ontology_scoring_engine is not None:
+                engine = runtime_variables.ontology_scoring_engine
+                console.print(f"{int(round(engine.exact_match_rate * 100, 0))}% of the "
+                              f"{engine.exact_hits + engine.exact_misses} subjects matched a label "
+                              f"or alias exactly without fuzzy matching.")
+            if runtime_variables.subject_match_table is not None:
+                console.print(f"{int(round(runtime_variables.subject_match_table.hit_rate * 100, 0))}% of the "
+                              f"subjects were found in the subject match table.")
+
+    def __print_throughput__(self):
+        seconds = monotonic() - self.start_time
+        if seconds > 0:
+            events_per_second = int(round(self.number_of_events_read / seconds, 0))
+        else:
+            events_per_second = 0
+        console.print(f"Read {self.number_of_events_read} events in {round(seconds, 1)}s "
+                      f"({events_per_second} events/s). {self.number_of_events_queued} were queued "
+                      f"and {self.event_count} pages were processed.")
+        console.print(self.triage.summary())
+
+    @staticmethod
+    def __reconnect_delay__(attempt: int) -> float:
+        """Exponential backoff with full jitter so many jobs don't reconnect at the same time"""
+        ceiling = min(config.reconnect_max_delay_seconds,
+                      config.reconnect_base_delay_seconds * 2 ** attempt)
+        return random.uniform(0, ceiling)  # nosec: B311
+
+    def __stream_url__(self) -> str:
+        """The stream prefers the Last-Event-ID header that aiosseclient sends for us.
+        If we only know the time of the last event we ask the stream to start from there"""
+        url = URL.from_string("https://stream.wikimedia.org/v2/stream/recentchange")
+        if self.checkpoint.event_id is None and self.checkpoint.event_datetime is not None:
+            url = url.query_param("since", self.checkpoint.event_datetime)
+        return url.as_string()
+
+    def __update_statistics__(self, wmf_event: WikimediaEvent):
+        """This is only called from the event loop so the workers don't race on the counters
+
+        The events are counted even without a page so max_events and
+        the throughput also work with --no-processing"""
+        self.event_count += 1
+        if wmf_event.wikipedia_page is not None:
+            self.total_number_of_missing_dois += wmf_event.wikipedia_page.number_of_missing_dois
+            self.total_number_of_dois += wmf_event.wikipedia_page.number_of_dois
+            self.total_number_of_failed_lookups += wmf_event.wikipedia_page.number_of_failed_lookups
+            missing_dois = wmf_event.wikipedia_page.missing_dois
+            if missing_dois is not None and len(missing_dois) > 0:
+                self.missing_dois.extend(missing_dois)
+            self.__print_statistics__()
@@ -0,0 +1,95 @@
+import json
+import logging
+from collections import Counter
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TriageRejection(Enum):
+    BOT = "bot"
+    EDIT_TYPE = "type"
+    INVALID = "invalid"
+    LENGTH_CHANGE = "length change"
+    NAMESPACE = "namespace"
+    SERVER_NAME = "server name"
+
+
+class EventTriage:
+    """This rejects the events we don't want as cheaply as possible
+
+    Most of the recentchange stream is Wikidata and Commons traffic,
+    so we start with a substring check on the raw data and only parse
+    the JSON of events that can be interesting. Nothing else is
+    allocated before an event is accepted."""
+    accepted: int = 0
+    edit_types: List[str] = None
+    min_length_change: Optional[int] = None
+    namespaces: List[int] = None
+    rejections: Counter = None
+    server_names: List[str] = None
+    skip_bot_edits: bool = False
+
+    def __init__(self,
+                 server_names: List[str] = None,
+                 namespaces: List[int] = None,
+                 edit_types: List[str] = None,
+                 skip_bot_edits: bool = False,
+                 min_length_change: Optional[int] = None):
+        if not server_names:
+            raise ValueError("server_names was None or empty")
+        if not namespaces:
+            raise ValueError("namespaces was None or empty")
+        if not edit_types:
+            raise ValueError("edit_types was None or empty")
+        self.server_names = list(server_names)
+        self.namespaces = list(namespaces)
+        self.edit_types = list(edit_types)
+        self.skip_bot_edits = skip_bot_edits
+        self.min_length_change = min_length_change
+        self.rejections = Counter()
+
+    def __reject__(self, reason: TriageRejection) -> None:
+        self.rejections[reason] += 1
+        return None
+
+    @property
+    def number_of_rejections(self) -> int:
+        return sum(self.rejections.values())
+
+    def triage(self, raw_event: str) -> Optional[Dict[str, Any]]:
+        """Returns the parsed event data if it passed the triage and None otherwise"""
+        for server_name in self.server_names:
+            if server_name in raw_event:
+                break
+        else:
+            return self.__reject__(TriageRejection.SERVER_NAME)
+        try:
+            event_data = json.loads(raw_event)
+        except ValueError:
+            logger.error(f"Could not parse the event {raw_event}")
+            return self.__reject__(TriageRejection.INVALID)
+        if not isinstance(event_data, dict):
+            return self.__reject__(TriageRejection.INVALID)
+        # The substring could be in e.g. the edit summary
+        if event_data.get("server_name") not in self.server_names:
+            return self.__reject__(TriageRejection.SERVER_NAME)
+        if event_data.get("namespace") not in self.namespaces:
+            return self.__reject__(TriageRejection.NAMESPACE)
+        if event_data.get("type") not in self.edit_types:
+            return self.__reject__(TriageRejection.EDIT_TYPE)
+        if self.skip_bot_edits and event_data.get("bot"):
+            return self.__reject__(TriageRejection.BOT)
+        if self.min_length_change is not None:
+            length = event_data.get("length") or {}
+            if (length.get("new") or 0) - (length.get("old") or 0) < self.min_length_change:
+                return self.__reject__(TriageRejection.LENGTH_CHANGE)
+        self.accepted += 1
+        return event_data
+
+    def summary(self) -> str:
+        reasons = ", ".join(f"{reason.value}: {count}"
+                            for reason, count in self.rejections.most_common())
+        return (f"Triage accepted {self.accepted} and rejected "
+                f"{self.number_of_rejections} events ({reasons})")
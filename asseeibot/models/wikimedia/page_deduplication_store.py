@@ -0,0 +1,204 @@
+import logging
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from hashlib import blake2b
+from time import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryDeduplicationTier:
+    """This keeps the most recently seen pages in memory and evicts the
+    least recently used ones when it is full"""
+    max_entries: int = None
+    entries: OrderedDict = None
+
+    def __init__(self, max_entries: int = None):
+        if not isinstance(max_entries, int) or max_entries < 1:
+            raise ValueError("max_entries must be a positive int")
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def delete(self, key: int):
+        self.entries.pop(key, None)
+
+    def get(self, key: int) -> Optional[float]:
+        timestamp = self.entries.get(key)
+        if timestamp is not None:
+            self.entries.move_to_end(key)
+        return timestamp
+
+    def set(self, key: int, timestamp: float):
+        self.entries[key] = timestamp
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    @property
+    def memory_footprint(self) -> int:
+        """Approximate size in bytes. All keys are 64-bit ints and all values are floats"""
+        if len(self.entries) == 0:
+            return sys.getsizeof(self.entries)
+        key, value = next(iter(self.entries.items()))
+        return sys.getsizeof(self.entries) + len(self.entries) * (sys.getsizeof(key) + sys.getsizeof(value))
+
+
+class SqliteDeduplicationTier:
+    """This keeps the seen pages on disk so they survive a restart
+
+    It is pruned now and then to the max_entries most recently processed pages"""
+    filename: str = None
+    connection: sqlite3.Connection = None
+    max_entries: int = None
+    sets_since_pruning: int = 0
+
+    def __init__(self, filename: str = None, max_entries: int = 1000000):
+        if filename is None or filename == "":
+            raise ValueError("filename was None or empty string")
+        if not isinstance(max_entries, int) or max_entries < 1:
+            raise ValueError("max_entries must be a positive int")
+        self.filename = filename
+        self.max_entries = max_entries
+        # The workers mark the pages as processed from their threads.
+        # PageDeduplicationStore serializes the access with its lock.
+        self.connection = sqlite3.connect(self.filename, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS processed_page "
+            "(key INTEGER PRIMARY KEY, timestamp REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS processed_page_timestamp ON processed_page (timestamp)"
+        )
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM processed_page").fetchone()[0]
+
+    def delete(self, key: int):
+        self.connection.execute("DELETE FROM processed_page WHERE key = ?", (key,))
+        self.connection.commit()
+
+    def get(self, key: int) -> Optional[float]:
+        row = self.connection.execute("SELECT timestamp FROM processed_page WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            return row[0]
+
+    def prune(self, older_than: float = None):
+        """Remove the pages older than the timestamp and the oldest pages above max_entries"""
+        self.sets_since_pruning = 0
+        if older_than is not None:
+            self.connection.execute("DELETE FROM processed_page WHERE timestamp < ?", (older_than,))
+        self.connection.execute(
+            "DELETE FROM processed_page WHERE key IN "
+            "(SELECT key FROM processed_page ORDER BY timestamp DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self.connection.commit()
+
+    def set(self, key: int, timestamp: float) -> bool:
+        """Returns True when it is time to prune"""
+        self.connection.execute("INSERT OR REPLACE INTO processed_page (key, timestamp) VALUES (?, ?)",
+                                (key, timestamp))
+        self.connection.commit()
+        self.sets_since_pruning += 1
+        return self.sets_since_pruning >= 1000
+
+
+class PageDeduplicationStore:
+    """This remembers which pages we processed recently
+
+    Pages are keyed by a 64-bit hash of the server name and the title which is
+    much more compact than the title strings. The in-memory tier is bounded and
+    the optional disk tier makes the store survive restarts. Both are bounded.
+    A page can be processed again when the reprocess window has passed.
+    A window of 0 means that a page is never processed again unless it was
+    evicted. The store is safe to use from the worker threads."""
+    hits: int = 0
+    misses: int = 0
+    lock: threading.Lock = None
+    memory_tier: MemoryDeduplicationTier = None
+    disk_tier: Optional[SqliteDeduplicationTier] = None
+    reprocess_window_seconds: float = 0
+
+    def __init__(self,
+                 max_entries_in_memory: int = None,
+                 reprocess_window_seconds: float = 0,
+                 sqlite_filename: str = None,
+                 max_entries_on_disk: int = 1000000):
+        self.lock = threading.Lock()
+        self.memory_tier = MemoryDeduplicationTier(max_entries=max_entries_in_memory)
+        self.reprocess_window_seconds = reprocess_window_seconds
+        if sqlite_filename is not None:
+            self.disk_tier = SqliteDeduplicationTier(filename=sqlite_filename, max_entries=max_entries_on_disk)
+            logger.debug("Removing expired pages from the disk tier")
+            self.__prune_the_disk_tier__()
+
+    def __prune_the_disk_tier__(self):
+        if self.reprocess_window_seconds > 0:
+            self.disk_tier.prune(older_than=time() - self.reprocess_window_seconds)
+        else:
+            self.disk_tier.prune()
+
+    def __len__(self):
+        return len(self.memory_tier)
+
+    def __expired__(self, timestamp: float) -> bool:
+        return 0 < self.reprocess_window_seconds < time() - timestamp
+
+    def __lookup__(self, key: int) -> Optional[float]:
+        timestamp = self.memory_tier.get(key)
+        if timestamp is None and self.disk_tier is not None:
+            timestamp = self.disk_tier.get(key)
+            if timestamp is not None:
+                # Promote it so the next lookup is cheap
+                self.memory_tier.set(key, timestamp)
+        if timestamp is not None and self.__expired__(timestamp):
+            self.memory_tier.delete(key)
+            if self.disk_tier is not None:
+                self.disk_tier.delete(key)
+            return None
+        return timestamp
+
+    @staticmethod
+    def key(server_name: str, page_title: str) -> int:
+        """A signed 64-bit int fits in the INTEGER PRIMARY KEY of SQLite"""
+        digest = blake2b(f"{server_name}:{page_title}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, byteorder="big", signed=True)
+
+    def add(self, key: int):
+        timestamp = time()
+        with self.lock:
+            self.memory_tier.set(key, timestamp)
+            if self.disk_tier is not None and self.disk_tier.set(key, timestamp):
+                self.__prune_the_disk_tier__()
+
+    def seen(self, key: int) -> bool:
+        """Returns True if the page was processed within the reprocess window"""
+        with self.lock:
+            if self.__lookup__(key) is not None:
+                self.hits += 1
+                return True
+            else:
+                self.misses += 1
+                return False
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        if lookups > 0:
+            return self.hits / lookups
+        else:
+            return 0.0
+
+    @property
+    def memory_footprint(self) -> int:
+        """Approximate size of the in-memory tier in bytes"""
+        return self.memory_tier.memory_footprint
@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+from collections import OrderedDict
+from os.path import exists
+from time import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StreamCheckpoint:
+    """This keeps track of the last fully processed event in the stream
+
+    The workers finish the events out of order, so we keep every event
+    read since the checkpoint and only move the checkpoint forward past
+    events that are all done. The checkpoint is saved to disk
+    periodically so we can resume the stream after a restart."""
+    event_id: Optional[str] = None
+    event_datetime: Optional[str] = None
+    filename: Optional[str] = None
+    interval_seconds: float = 10
+    last_save: float = 0
+    next_sequence: int = 0
+    # sequence -> [event_id, event_datetime, done]
+    pending: OrderedDict = None
+
+    def __init__(self, filename: str = None, interval_seconds: float = 10):
+        self.filename = filename
+        self.interval_seconds = interval_seconds
+        self.pending = OrderedDict()
+        self.last_save = time()
+        self.__load__()
+
+    def __advance__(self):
+        """Move the checkpoint forward past all the finished events at the front"""
+        while len(self.pending) > 0:
+            sequence, (event_id, event_datetime, done) = next(iter(self.pending.items()))
+            if not done:
+                break
+            self.pending.popitem(last=False)
+            if event_id is not None:
+                self.event_id = event_id
+            if event_datetime is not None:
+                self.event_datetime = event_datetime
+
+    def __load__(self):
+        if self.filename is not None and exists(self.filename):
+            with open(self.filename) as file:
+                data = json.load(file)
+            self.event_id = data.get("event_id")
+            self.event_datetime = data.get("event_datetime")
+            logger.info(f"Resuming the stream from {self.event_datetime}")
+
+    def mark_done(self, sequence: int):
+        if sequence in self.pending:
+            self.pending[sequence][2] = True
+            self.__advance__()
+        if time() - self.last_save >= self.interval_seconds:
+            self.save()
+
+    def mark_skipped(self, event_id: Optional[str]):
+        """This is for events rejected before they were parsed. They are done
+        as soon as they are read so we don't need to register them first"""
+        if len(self.pending) == 0:
+            if event_id is not None:
+                self.event_id = event_id
+        else:
+            self.pending[self.next_sequence] = [event_id, None, True]
+            self.next_sequence += 1
+        if time() - self.last_save >= self.interval_seconds:
+            self.save()
+
+    def register(self, event_id: Optional[str], event_datetime: Optional[str]) -> int:
+        """Register an event that was read from the stream and return its sequence number"""
+        sequence = self.next_sequence
+        self.next_sequence += 1
+        self.pending[sequence] = [event_id, event_datetime, False]
+        return sequence
+
+    def save(self):
+        self.last_save = time()
+        if self.filename is not None and (self.event_id is not None or self.event_datetime is not None):
+            # We write to a temporary file first so a crash cannot leave a broken checkpoint
+            temporary_filename = f"{self.filename}.tmp"
+            with open(temporary_filename, "w") as file:
+                json.dump(dict(event_id=self.event_id,
+                               event_datetime=self.event_datetime), file)
+            os.replace(temporary_filename, self.filename)
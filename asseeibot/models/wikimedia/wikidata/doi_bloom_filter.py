@@ -0,0 +1,127 @@
+import logging
+import math
+import os
+import struct
+from array import array
+from time import time
+
+import numpy as np
+
+from asseeibot.helpers.util import normalize_doi
+from asseeibot.models.wikimedia.wikidata.doi_index import hash_doi
+from asseeibot.models.wikimedia.wikidata.wikidata_doi_dump import WikidataDoiDump
+
+logger = logging.getLogger(__name__)
+
+# The file starts with the magic, the number of bits, the number of hashes,
+# the number of DOIs and the time of the data followed by the bits
+magic = b"DOIBLM02"
+header = struct.Struct("<8sQIQd")
+
+
+def bit_positions(doi_hash: int, number_of_bits: int, number_of_hashes: int):
+    """Double hashing derives all the positions from the two halves of one 64 bit hash"""
+    first = doi_hash & 0xFFFFFFFF
+    # The step must be odd so it does not get stuck on a few positions
+    second = (doi_hash >> 32) | 1
+    return [(first + i * second) % number_of_bits for i in range(number_of_hashes)]
+
+
+class DoiBloomFilterBuilder:
+    """Builds a Bloom filter over all the DOIs in a Wikidata JSON dump
+    or a CSV/TSV extract with the DOI in the last column
+
+    With a false positive rate of 1% it takes less than 10 bits per DOI."""
+    dump_filename: str = None
+    false_positive_rate: float = 0.01
+
+    def __init__(self, dump_filename: str = None, false_positive_rate: float = 0.01):
+        if dump_filename is None or dump_filename == "":
+            raise ValueError("dump_filename was None or empty string")
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("false_positive_rate must be between 0 and 1")
+        self.dump_filename = dump_filename
+        self.false_positive_rate = false_positive_rate
+
+    def build(self, filename: str) -> int:
+        """Write the filter and return the number of DOIs in it"""
+        hashes = array("Q")
+        for _, raw_doi in WikidataDoiDump(filename=self.dump_filename).rows():
+            doi = normalize_doi(raw_doi)
+            if doi is not None:
+                hashes.append(hash_doi(doi))
+        hash_array = np.unique(np.frombuffer(hashes, dtype=np.uint64))
+        number_of_dois = len(hash_array)
+        number_of_bits = max(8, math.ceil(-max(1, number_of_dois) * math.log(self.false_positive_rate) /
+                                          math.log(2) ** 2))
+        number_of_hashes = max(1, round(number_of_bits / max(1, number_of_dois) * math.log(2)))
+        bits = np.zeros((number_of_bits + 7) // 8, dtype=np.uint8)
+        first = hash_array & np.uint64(0xFFFFFFFF)
+        second = (hash_array >> np.uint64(32)) | np.uint64(1)
+        for i in range(number_of_hashes):
+            positions = (first + np.uint64(i) * second) % np.uint64(number_of_bits)
+            np.bitwise_or.at(bits, positions >> np.uint64(3),
+                             np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+        # The time of the data is the time the dump was written, not the time we built the filter
+        data_time = os.path.getmtime(self.dump_filename)
+        temporary_filename = f"{filename}.tmp"
+        with open(temporary_filename, "wb") as file:
+            file.write(header.pack(magic, number_of_bits, number_of_hashes, number_of_dois, data_time))
+            file.write(bits.tobytes())
+        os.replace(temporary_filename, filename)
+        logger.info(f"Wrote a filter of {len(bits) // 1024} kB with {number_of_hashes} hashes "
+                    f"for {number_of_dois} DOIs to {filename}")
+        return number_of_dois
+
+
+class DoiBloomFilter:
+    """A memory mapped Bloom filter over the DOIs in Wikidata
+
+    A DOI that is not in the filter is definitely not in Wikidata as of the
+    dump, so we don't have to ask the network as long as the dump is younger
+    than the max age like with the DoiIndex. A DOI in the filter is probably
+    in Wikidata and looked up as usual."""
+    bits: np.ndarray = None
+    data_time: float = None
+    filename: str = None
+    hits: int = 0
+    max_age_seconds: float = 0
+    misses: int = 0
+    number_of_bits: int = 0
+    number_of_dois: int = 0
+    number_of_hashes: int = 0
+
+    def __init__(self, filename: str = None, max_age_seconds: float = 0):
+        if filename is None or filename == "":
+            raise ValueError("filename was None or empty string")
+        self.filename = filename
+        self.max_age_seconds = max_age_seconds
+        with open(filename, "rb") as file:
+            (file_magic, self.number_of_bits, self.number_of_hashes,
+             self.number_of_dois, self.data_time) = header.unpack(file.read(header.size))
+        if file_magic != magic:
+            raise ValueError(f"{filename} is not a DOI Bloom filter")
+        self.bits = np.memmap(filename, dtype=np.uint8, mode="r", offset=header.size,
+                              shape=((self.number_of_bits + 7) // 8,))
+
+    def __contains__(self, doi: str) -> bool:
+        """The DOI has to be normalized"""
+        for position in bit_positions(hash_doi(doi), self.number_of_bits, self.number_of_hashes):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                self.misses += 1
+                return False
+        self.hits += 1
+        return True
+
+    @property
+    def is_stale(self) -> bool:
+        return time() - self.data_time > self.max_age_seconds
+
+    def is_missing_in_wikidata(self, doi: str) -> bool:
+        """True if the normalized DOI is definitely not in Wikidata. When the
+        filter is stale the DOI could have been added after the dump"""
+        return doi not in self and not self.is_stale
+
+    @property
+    def size(self) -> int:
+        return len(self.bits)
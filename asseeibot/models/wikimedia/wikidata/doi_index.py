@@ -0,0 +1,156 @@
+import logging
+import os
+import struct
+from array import array
+from hashlib import blake2b
+from time import time
+from typing import List, Optional
+
+import numpy as np
+
+from asseeibot.helpers.util import normalize_doi
+from asseeibot.models.wikimedia.wikidata.entity import EntityId
+from asseeibot.models.wikimedia.wikidata.scientific_item import WikidataScientificItem
+from asseeibot.models.wikimedia.wikidata.wikidata_doi_dump import WikidataDoiDump
+
+logger = logging.getLogger(__name__)
+
+# The file starts with the magic, the number of DOIs and the time of the data
+# followed by the sorted DOI hashes and the QID numbers in the same order
+magic = b"DOIQID01"
+header = struct.Struct("<8sQd")
+
+
+def hash_doi(doi: str) -> int:
+    """The 64 bit hash of the normalized DOI. Collisions are very unlikely even with 40M DOIs"""
+    return int.from_bytes(blake2b(doi.encode(), digest_size=8).digest(), "little")
+
+
+class DoiIndexBuilder:
+    """Builds the DOI index from a Wikidata JSON dump or a CSV/TSV
+    extract with the item in the first column and the DOI in the second
+
+    The dump is streamed line by line so only the hashes and
+    QID numbers are held in memory, about 12 bytes per DOI."""
+    dump_filename: str = None
+    number_of_duplicates: int = 0
+
+    def __init__(self, dump_filename: str = None):
+        if dump_filename is None or dump_filename == "":
+            raise ValueError("dump_filename was None or empty string")
+        self.dump_filename = dump_filename
+
+    @staticmethod
+    def __qid_number__(raw_qid: Optional[str]) -> Optional[int]:
+        """This is called for every DOI so we avoid building an EntityId"""
+        if raw_qid is None:
+            return None
+        qid = raw_qid.strip().rsplit("/", 1)[-1]
+        if qid.startswith("Q") and qid[1:].isdigit():
+            return int(qid[1:])
+        else:
+            return None
+
+    def build(self, filename: str) -> int:
+        """Write the index and return the number of DOIs in it"""
+        hashes = array("Q")
+        qid_numbers = array("I")
+        for raw_qid, raw_doi in WikidataDoiDump(filename=self.dump_filename).rows():
+            doi = normalize_doi(raw_doi)
+            qid_number = self.__qid_number__(raw_qid)
+            if doi is None or qid_number is None:
+                # This skips the header of the extracts too
+                continue
+            hashes.append(hash_doi(doi))
+            qid_numbers.append(qid_number)
+            if len(hashes) % 1000000 == 0:
+                logger.info(f"Read {len(hashes)} DOIs")
+        hash_array = np.frombuffer(hashes, dtype=np.uint64)
+        qid_array = np.frombuffer(qid_numbers, dtype=np.uint32)
+        # A stable sort keeps the first item of DOIs that are on more than one item
+        order = np.argsort(hash_array, kind="stable")
+        hash_array = hash_array[order]
+        qid_array = qid_array[order]
+        unique = np.ones(len(hash_array), dtype=bool)
+        unique[1:] = hash_array[1:] != hash_array[:-1]
+        self.number_of_duplicates = int(len(unique) - unique.sum())
+        hash_array = hash_array[unique]
+        qid_array = qid_array[unique]
+        # The time of the data is the time the dump was written, not the time we built the index
+        data_time = os.path.getmtime(self.dump_filename)
+        temporary_filename = f"{filename}.tmp"
+        with open(temporary_filename, "wb") as file:
+            file.write(header.pack(magic, len(hash_array), data_time))
+            file.write(hash_array.tobytes())
+            file.write(qid_array.tobytes())
+        os.replace(temporary_filename, filename)
+        logger.info(f"Wrote {len(hash_array)} DOIs to {filename} "
+                    f"and skipped {self.number_of_duplicates} duplicates")
+        return len(hash_array)
+
+
+class DoiIndex:
+    """A memory mapped index of DOI to QID built from a Wikidata dump
+
+    Loading it only maps the file and a lookup is a binary search, so
+    it answers in microseconds even with 40M DOIs. A hit is always trusted.
+    A miss only means that the DOI is not in Wikidata if the index is
+    younger than the max age, otherwise we still ask the network."""
+    data_time: float = None
+    filename: str = None
+    hashes: np.ndarray = None
+    hits: int = 0
+    max_age_seconds: float = 0
+    misses: int = 0
+    qid_numbers: np.ndarray = None
+
+    def __init__(self, filename: str = None, max_age_seconds: float = 0):
+        if filename is None or filename == "":
+            raise ValueError("filename was None or empty string")
+        self.filename = filename
+        self.max_age_seconds = max_age_seconds
+        with open(filename, "rb") as file:
+            file_magic, count, self.data_time = header.unpack(file.read(header.size))
+        if file_magic != magic:
+            raise ValueError(f"{filename} is not a DOI index")
+        self.hashes = np.memmap(filename, dtype=np.uint64, mode="r", offset=header.size, shape=(count,))
+        self.qid_numbers = np.memmap(filename, dtype=np.uint32, mode="r",
+                                     offset=header.size + 8 * count, shape=(count,))
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @property
+    def is_stale(self) -> bool:
+        return time() - self.data_time > self.max_age_seconds
+
+    def lookup(self, doi: str) -> Optional[str]:
+        """Returns the QID of the normalized DOI if found"""
+        if len(self.hashes) == 0:
+            return None
+        doi_hash = np.uint64(hash_doi(doi))
+        position = int(np.searchsorted(self.hashes, doi_hash))
+        if position < len(self.hashes) and self.hashes[position] == doi_hash:
+            return f"Q{self.qid_numbers[position]}"
+        else:
+            return None
+
+    def resolve(self, dois: List) -> None:
+        """Set the WikidataScientificItem of the DOIs we know the answer for"""
+        stale = self.is_stale
+        for doi in dois:
+            if not doi.regex_validated or doi.wikidata_scientific_item is not None:
+                continue
+            qid = self.lookup(doi.value.upper())
+            if qid is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                if stale:
+                    continue
+            doi.wikidata_scientific_item = WikidataScientificItem(
+                doi=doi,
+                found_in_wikidata=qid is not None,
+                qid=EntityId(qid) if qid is not None else None,
+                resolved_in_bulk=True
+            )
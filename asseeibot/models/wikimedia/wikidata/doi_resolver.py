@@ -0,0 +1,75 @@
+import logging
+from typing import Any, Dict, List
+
+from asseeibot.helpers.wikidata import wikidata_query
+from asseeibot.models.wikimedia.wikidata.entity import EntityId
+from asseeibot.models.wikimedia.wikidata.scientific_item import WikidataScientificItem
+
+logger = logging.getLogger(__name__)
+
+
+class DoiResolver:
+    """Resolves the DOIs of a page to QIDs with a few SPARQL queries
+    instead of a handful of Hub calls per DOI
+
+    The DOIs are supposed to be uppercase in Wikidata but we ask for the
+    lowercase variant too. The DOIs we resolve get a WikidataScientificItem
+    so the lookup of each DOI only falls back to Hub when the queries failed
+    or Crossref gave us a mixed case variant."""
+    batch_size: int = 100
+    number_of_queries: int = 0
+
+    def __init__(self, batch_size: int = 100):
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive int")
+        self.batch_size = batch_size
+
+    @staticmethod
+    def __quote__(value: str) -> str:
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+    def __query__(self, dois: List[str]) -> Dict[str, str]:
+        """Returns the QIDs found by uppercase DOI or None if the query failed"""
+        values = " ".join(self.__quote__(variant)
+                          for doi in dois
+                          for variant in sorted({doi.upper(), doi.lower()}))
+        self.number_of_queries += 1
+        df = wikidata_query(f'''
+            SELECT ?item ?doi
+            WHERE
+            {{
+            VALUES ?doi {{ {values} }}
+            ?item wdt:P356 ?doi.
+            }}
+            ''')
+        if df is None:
+            return None
+        qids = {}
+        for qid, doi in zip(df["item"], df["doi"]):
+            doi = doi.upper()
+            if doi in qids and qids[doi] != qid:
+                logger.warning(f"Got more than one item with the DOI {doi} in Wikidata. "
+                               f"Please check if they are duplicates and should be merged.")
+            else:
+                qids[doi] = qid
+        return qids
+
+    def resolve(self, dois: List[Any]) -> None:
+        """Set the WikidataScientificItem of the DOIs we could resolve"""
+        unresolved_dois = [doi for doi in dois
+                           if doi.regex_validated and doi.wikidata_scientific_item is None]
+        for start in range(0, len(unresolved_dois), self.batch_size):
+            batch = unresolved_dois[start:start + self.batch_size]
+            logger.info(f"Looking up {len(batch)} DOIs in Wikidata with SPARQL")
+            qids = self.__query__([doi.value for doi in batch])
+            if qids is None:
+                logger.warning("The SPARQL query failed, falling back to Hub")
+                continue
+            for doi in batch:
+                qid = qids.get(doi.value.upper())
+                doi.wikidata_scientific_item = WikidataScientificItem(
+                    doi=doi,
+                    found_in_wikidata=qid is not None,
+                    qid=EntityId(qid) if qid is not None else None,
+                    resolved_in_bulk=True
+                )
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from enum import Enum
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import quote
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class HubResult(Enum):
+    FOUND = "found"
+    NOT_FOUND = "not found"
+    # The lookup failed and can be tried again later
+    RETRYABLE = "retryable"
+
+
+class HubLookup(NamedTuple):
+    result: HubResult
+    qid: Optional[str] = None
+
+
+class HubClient:
+    """This looks up DOIs via hub.toolforge.org over a pooled session
+
+    Concurrent lookups of the same DOI share one request and at most
+    max_concurrent_requests are in flight at a time. Errors and
+    unexpected answers are returned as retryable lookups.
+
+    The workers run in threads so they call lookup_blocking() which
+    runs the lookup on the event loop of the EventStream."""
+    in_flight: Dict[str, asyncio.Future] = None
+    loop: asyncio.AbstractEventLoop = None
+    max_concurrent_requests: int = 8
+    number_of_requests: int = 0
+    number_of_retryable_lookups: int = 0
+    semaphore: asyncio.Semaphore = None
+    session: Optional[ClientSession] = None
+    timeout_seconds: float = 10
+
+    def __init__(self,
+                 loop: asyncio.AbstractEventLoop = None,
+                 max_concurrent_requests: int = 8,
+                 timeout_seconds: float = 10):
+        if loop is None:
+            raise ValueError("loop was None")
+        self.loop = loop
+        self.max_concurrent_requests = max_concurrent_requests
+        self.timeout_seconds = timeout_seconds
+        self.in_flight = dict()
+
+    async def __get__(self, doi: str) -> HubLookup:
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        url = f"https://hub.toolforge.org/doi:{quote(doi)}?site:wikidata?format=json"
+        async with self.semaphore:
+            self.number_of_requests += 1
+            try:
+                async with self.__get_session__().get(url, allow_redirects=False) as response:
+                    if response.status == 302:
+                        logger.debug("Found QID via Hub")
+                        return HubLookup(result=HubResult.FOUND, qid=response.headers["Location"])
+                    elif response.status == 400:
+                        return HubLookup(result=HubResult.NOT_FOUND)
+                    else:
+                        logger.error(f"Got {response.status} from Hub: {await response.text()}")
+            except (ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"Could not look up {doi} via Hub: {e}")
+        self.number_of_retryable_lookups += 1
+        return HubLookup(result=HubResult.RETRYABLE)
+
+    def __get_session__(self) -> ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = ClientSession(
+                connector=TCPConnector(limit=self.max_concurrent_requests),
+                headers={"User-Agent": config.user_agent},
+                timeout=ClientTimeout(total=self.timeout_seconds)
+            )
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def lookup(self, doi: str) -> HubLookup:
+        if doi is None or doi == "":
+            raise ValueError("doi was None or empty string")
+        future = self.in_flight.get(doi)
+        if future is None:
+            future = asyncio.ensure_future(self.__get__(doi))
+            self.in_flight[doi] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(doi, None))
+        # Shielded because the future can be shared by several callers
+        return await asyncio.shield(future)
+
+    def lookup_blocking(self, doi: str) -> HubLookup:
+        """This is called from the worker threads, never from the event loop"""
+        return asyncio.run_coroutine_threadsafe(self.lookup(doi), self.loop).result()
@@ -1,9 +1,9 @@
+import asyncio
 import logging
 from datetime import datetime, timezone
 from typing import Any
 from urllib.parse import quote
 
-import requests
 from wikibaseintegrator import wbi_login, wbi_config, WikibaseIntegrator
 from wikibaseintegrator.datatypes import Time, Item as WbiItemType, String
 from wikibaseintegrator.entities.item import Item as WbiEntityItem
@@ -17,15 +17,30 @@ from asseeibot.models.fuzzy_match import FuzzyMatch
 from asseeibot.models.statistic_dataframe import StatisticDataframe
 from asseeibot.models.wikimedia.enums import StatedIn, Property, DeterminationMethod
 from asseeibot.models.wikimedia.wikidata.entity import EntityId
+from asseeibot.models.wikimedia.wikidata.hub_client import HubClient, HubLookup, HubResult
 from asseeibot.models.wikimedia.wikidata.item import Item
 
 logger = logging.getLogger(__name__)
 
 
+async def lookup_with_a_local_hub_client(doi: str) -> HubLookup:
+    """This is used when there is no EventStream running that shares its HubClient"""
+    hub_client = HubClient(loop=asyncio.get_running_loop(),
+                           max_concurrent_requests=1,
+                           timeout_seconds=config.hub_timeout_seconds)
+    try:
+        return await hub_client.lookup(doi)
+    finally:
+        await hub_client.close()
+
+
 class WikidataScientificItem(Item):
     doi: Any
     found_in_wikidata: bool = False
     qid: EntityId = None
+    # The DoiResolver already looked for the upper and lowercase variants
+    resolved_in_bulk: bool = False
+    hub_lookup_failed: bool = False
 
     def __add_main_subject__(
             self,
@@ -121,18 +136,18 @@ class WikidataScientificItem(Item):
             raise ValueError("doi was None")
         if doi == "":
             raise ValueError("doi was empty string")
-        url = f"https://hub.toolforge.org/doi:{quote(doi)}?site:wikidata?format=json"
-        response = requests.get(url, allow_redirects=False)
-        if response.status_code == 302:
-            logger.debug("Found QID via Hub")
+        if asseeibot.runtime_variables.hub_client is not None:
+            hub_lookup = asseeibot.runtime_variables.hub_client.lookup_blocking(doi)
+        else:
+            hub_lookup = asyncio.run(lookup_with_a_local_hub_client(doi))
+        if hub_lookup.result == HubResult.FOUND:
             self.found_in_wikidata = True
-            self.qid = EntityId(response.headers['Location'])
-        elif response.status_code == 400:
+            self.qid = EntityId(hub_lookup.qid)
+        elif hub_lookup.result == HubResult.NOT_FOUND:
             self.found_in_wikidata = False
         else:
-            logger.error(f"Got {response.status_code} from Hub")
-            console.print(response.json())
-            exit()
+            # We don't know, so the DOI should be looked up again next time
+            self.hub_lookup_failed = True
 
     def __lookup_via_hub__(self) -> None:
         """Lookup via hub.toolforge.org
@@ -140,19 +155,23 @@ class WikidataScientificItem(Item):
         https://hub.toolforge.org/doi:10.1111/j.1746-8361.1978.tb01321.x?site:wikidata?format=json"""
         logger.info("Looking up via Hub")
         if self.doi.found_in_crossref:
-            doi: str = self.doi.crossref.work.doi
-            logger.info("Using DOI from Crossref to lookup in Hub")
-            self.__call_the_hub_api__(doi)
+            crossref_doi: str = self.doi.crossref.work.doi
+            # The bulk lookups already tried the DOI from Wikipedia in upper and lowercase
+            if self.resolved_in_bulk and crossref_doi.upper() == self.doi.value.upper():
+                logger.debug("The DOI from Crossref was already looked up in bulk")
+            else:
+                logger.info("Using DOI from Crossref to lookup in Hub")
+                self.__call_the_hub_api__(crossref_doi)
+        if not self.found_in_wikidata and not self.resolved_in_bulk:
+            # The DOI from Wikipedia, then uppercase and lowercase without asking twice for the same
+            variants = list(dict.fromkeys([self.doi.value, self.doi.value.upper(), self.doi.value.lower()]))
+            for variant in variants:
+                if self.found_in_wikidata or self.hub_lookup_failed:
+                    break
+                logger.info(f"Using {variant} from Wikipedia to lookup in Hub")
+                self.__call_the_hub_api__(variant)
         if not self.found_in_wikidata:
-            logger.info("Using DOI from Wikipedia to lookup in Hub")
-            self.__call_the_hub_api__(self.doi.value)
-            if not self.found_in_wikidata:
-                logger.info("Using uppercase DOI from Wikipedia to lookup in Hub")
-                self.__call_the_hub_api__(self.doi.value.upper())
-                if not self.found_in_wikidata:
-                    logger.info("Using lowercase DOI from Wikipedia to lookup in Hub")
-                    self.__call_the_hub_api__(self.doi.value.lower())
-        logger.info("DOI not found via Hub")
+            logger.info("DOI not found via Hub")
 
     def add_subjects(self, crossref: CrossrefEngine):
         logger = logging.getLogger(__name__)
@@ -166,7 +185,10 @@ class WikidataScientificItem(Item):
         """This looks up first in Crossref to get the correct DOI-string
         and then in Wikidata"""
         self.doi.lookup_in_crossref()
-        self.__lookup_via_hub__()
+        if self.found_in_wikidata:
+            logger.debug("Already found in Wikidata with SPARQL")
+        else:
+            self.__lookup_via_hub__()
 
     def wikidata_doi_search_url(self):
         # quote to guard against äöå and the like
@@ -0,0 +1,47 @@
+import csv
+import json
+from typing import IO, Iterator, Optional, Tuple
+
+from asseeibot.helpers.util import open_text_file
+
+
+class WikidataDoiDump:
+    """Streams the DOIs from a Wikidata JSON dump or a CSV/TSV extract
+
+    The extracts have the item in the first column and the DOI in the last.
+    Extracts with only one column have no items."""
+    filename: str = None
+
+    def __init__(self, filename: str = None):
+        if filename is None or filename == "":
+            raise ValueError("filename was None or empty string")
+        self.filename = filename
+
+    def __read_extract__(self, file: IO) -> Iterator[Tuple[Optional[str], str]]:
+        delimiter = "\t" if ".tsv" in self.filename else ","
+        for row in csv.reader(file, delimiter=delimiter):
+            if len(row) == 1:
+                yield None, row[0]
+            elif len(row) > 1:
+                yield row[0], row[-1]
+
+    @staticmethod
+    def __read_json_dump__(file: IO) -> Iterator[Tuple[Optional[str], str]]:
+        """The dump is a JSON array with one entity per line"""
+        for line in file:
+            # Most entities have no DOI so we avoid parsing them
+            if '"P356"' not in line:
+                continue
+            entity = json.loads(line.rstrip().rstrip(","))
+            for claim in entity.get("claims", {}).get("P356", []):
+                datavalue = claim.get("mainsnak", {}).get("datavalue")
+                if datavalue is not None:
+                    yield entity["id"], datavalue["value"]
+
+    def rows(self) -> Iterator[Tuple[Optional[str], str]]:
+        """Yields the raw item and DOI. The DOIs are not normalized"""
+        with open_text_file(self.filename) as file:
+            if ".json" in self.filename:
+                yield from self.__read_json_dump__(file)
+            else:
+                yield from self.__read_extract__(file)
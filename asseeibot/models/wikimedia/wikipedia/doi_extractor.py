@@ -0,0 +1,87 @@
+import logging
+import re
+from typing import List, NamedTuple, Tuple
+
+import config
+from asseeibot import runtime_variables
+from asseeibot.helpers.util import normalize_doi
+
+logger = logging.getLogger(__name__)
+
+# One pass over the wikitext finds the start and end of every template
+# and every place a DOI can hide. The order of the alternatives matters.
+token_pattern = re.compile(
+    r"(?P<doi_template>\{\{\s*doi\s*\|\s*(?P<doi_template_value>[^|{}]+))"
+    r"|(?P<open>\{\{\s*(?P<name>[^|{}<\n]*))"
+    r"|(?P<close>\}\})"
+    r"|\|\s*doi\s*=\s*(?P<parameter_value>[^|{}<\n]+)"
+    r"|doi\.org/(?P<link_value>10\.[^\s|{}\[\]<>\"]+)",
+    re.IGNORECASE
+)
+
+
+class ExtractedDoi(NamedTuple):
+    """This is compact so it can be passed cheaply between processes"""
+    doi: str
+    # The lowercased name of the template the DOI was found in.
+    # Empty for bare links outside templates.
+    template: str
+
+
+def extract_dois(wikitext: str) -> List[ExtractedDoi]:
+    """Find the unique normalized DOIs in the wikitext in the order they appear
+
+    This covers the doi parameter of every template (cite journal, cite book,
+    citation, cite web, ...), the {{doi}} template and doi.org links."""
+    if wikitext is None:
+        raise ValueError("wikitext was None")
+    if "doi" not in wikitext and "DOI" not in wikitext and "Doi" not in wikitext:
+        return []
+    templates: List[str] = []
+    seen = set()
+    extracted_dois = []
+    for match in token_pattern.finditer(wikitext):
+        kind = match.lastgroup
+        if kind == "close":
+            if len(templates) > 0:
+                templates.pop()
+            continue
+        if kind == "open":
+            templates.append(match.group("name").strip().lower())
+            continue
+        if kind == "doi_template":
+            templates.append("doi")
+            value = match.group("doi_template_value")
+            template = "doi"
+        elif kind == "parameter_value":
+            value = match.group("parameter_value")
+            template = templates[-1] if len(templates) > 0 else ""
+        else:
+            value = match.group("link_value")
+            template = templates[-1] if len(templates) > 0 else ""
+        doi = normalize_doi(value)
+        if doi is not None and doi not in seen:
+            seen.add(doi)
+            extracted_dois.append(ExtractedDoi(doi=doi, template=template))
+    return extracted_dois
+
+
+def extract_doi_tuples(wikitext: str) -> List[Tuple[str, str]]:
+    """This runs in the process pool. Only the plain tuples travel back"""
+    return [tuple(extracted_doi) for extracted_doi in extract_dois(wikitext)]
+
+
+def extract_dois_from_any_page(wikitext: str) -> List[ExtractedDoi]:
+    """Large pages are scanned in the process pool so they don't hold the GIL
+    while the other workers wait. Small pages are faster to scan right here
+    than to send to another process."""
+    if (
+            runtime_variables.process_pool is not None and
+            wikitext is not None and
+            len(wikitext) >= config.process_pool_min_wikitext_length
+    ):
+        logger.debug(f"Extracting DOIs from {len(wikitext)} characters in the process pool")
+        doi_tuples = runtime_variables.process_pool.submit(extract_doi_tuples, wikitext).result()
+        return [ExtractedDoi(*doi_tuple) for doi_tuple in doi_tuples]
+    else:
+        return extract_dois(wikitext)
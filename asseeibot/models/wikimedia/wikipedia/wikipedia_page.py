@@ -1,15 +1,19 @@
 import json
 import logging
-from typing import List, Any
+from typing import List, Any, Set
 
 import pywikibot
-from pywikibot import Page
+from pywikibot import Page, textlib
 
 import config
+from asseeibot import runtime_variables
 from asseeibot.helpers.console import console
 from asseeibot.models.identifiers.doi import Doi
+from asseeibot.models.wikimedia.wikidata.doi_resolver import DoiResolver
+from asseeibot.models.wikimedia.wikipedia.doi_extractor import ExtractedDoi
 from asseeibot.models.wikimedia.wikipedia.templates.enwp.cite_journal import CiteJournal
 from asseeibot.models.wikimedia.wikipedia.wikipedia_page_reference import WikipediaPageReference
+from asseeibot.models.wikimedia.wikipedia.wikitext_cache import WikitextCache
 
 logger = logging.getLogger(__name__)
 
@@ -17,17 +21,23 @@ logger = logging.getLogger(__name__)
 class WikipediaPage:
     """Models a WMF Wikipedia page"""
     number_of_dois: int = 0
+    number_of_failed_lookups: int = 0
     number_of_isbns: int = 0
     number_of_missing_dois: int = 0
     number_of_missing_isbns: int = 0
     page_id: int = None
     pywikibot_page: Page = None
-    references: List[WikipediaPageReference] = None
+    __references: List[WikipediaPageReference] = None
     title: str = None
+    wikitext: str = None
     # We can't type this with WikimediaEvent because of pydantic
     wikimedia_event: Any = None
     missing_dois: List[Doi] = None
     dois: List[Doi] = None
+    extracted_dois: List[ExtractedDoi] = None
+    number_of_unchanged_dois: int = 0
+    revision_id: int = None
+    dois_unchanged_since_last_processed: bool = False
 
     def __init__(
             self,
@@ -41,21 +51,80 @@ class WikipediaPage:
         self.title = self.wikimedia_event.page_title
         if self.title is None or self.title == "":
             raise ValueError("title not set correctly")
-        logger.info("Fetching the wikitext")
         self.pywikibot_page = pywikibot.Page(self.wikimedia_event.event_stream.pywikibot_site, self.title)
-        self.page_id = int(self.pywikibot_page.pageid)
-        self.__parse_templates__()
+        self.__get_wikitext__()
+        self.__extract_dois__()
+        if self.dois_unchanged_since_last_processed:
+            logger.info("The DOIs on this page did not change since we last processed it")
+            self.dois = []
+        elif config.only_lookup_dois_added_by_the_edit:
+            self.__remove_dois_found_in_the_old_revision__()
         self.__populate_missing_dois__()
         self.__upload_subject_qids_to_wikidata__()
         self.__calculate_statistics__()
+        self.__remember_the_processed_dois__()
 
-    def __parse_templates__(self):
-        """We parse all the templates into WikipediaPageReferences"""
+    @property
+    def wikitext_cache(self) -> WikitextCache:
+        return self.wikimedia_event.event_stream.wikitext_cache
+
+    def __get_wikitext__(self):
+        """The revision is usually cached or prefetched by the EventStream already"""
+        logger = logging.getLogger(__name__)
+        cached_revision = None
+        if self.wikimedia_event.new_revision_id is not None:
+            cached_revision = self.wikitext_cache.get(self.wikimedia_event.new_revision_id)
+        if cached_revision is None:
+            revision = self.wikimedia_event.revision
+            if revision is not None:
+                logger.debug("Using the prefetched wikitext")
+                cached_revision = self.wikitext_cache.put(page_id=revision.page_id,
+                                                          revision_id=revision.revision_id,
+                                                          wikitext=revision.wikitext)
+            else:
+                logger.info("Fetching the wikitext")
+                cached_revision = self.wikitext_cache.put(page_id=int(self.pywikibot_page.pageid),
+                                                          revision_id=self.pywikibot_page.latest_revision_id,
+                                                          wikitext=self.pywikibot_page.text)
+        else:
+            logger.debug("Using the cached wikitext")
+        self.page_id = cached_revision.page_id
+        self.revision_id = cached_revision.revision_id
+        self.wikitext = cached_revision.wikitext
+        self.extracted_dois = cached_revision.extracted_dois
+
+    def __extract_dois__(self):
+        """The DOIs were extracted from the wikitext when it was cached"""
+        self.dois = [Doi(value=extracted_doi.doi) for extracted_doi in self.extracted_dois]
+        self.number_of_dois = len(self.dois)
+        self.dois_unchanged_since_last_processed = (
+                self.wikitext_cache.get_processed_dois_digest(page_id=self.page_id) ==
+                self.wikitext_cache.dois_digest(doi.value for doi in self.dois)
+        )
+
+    def __get_dois_in_the_old_revision__(self) -> Set[str]:
+        """Returns the normalized DOIs of the revision before the edit"""
+        old_revision_id = self.wikimedia_event.old_revision_id
+        cached_revision = self.wikitext_cache.get(old_revision_id)
+        if cached_revision is None:
+            if self.wikimedia_event.old_revision is not None:
+                old_wikitext = self.wikimedia_event.old_revision.wikitext
+            else:
+                old_wikitext = self.pywikibot_page.getOldVersion(old_revision_id)
+            cached_revision = self.wikitext_cache.put(page_id=self.page_id,
+                                                      revision_id=old_revision_id,
+                                                      wikitext=old_wikitext)
+        return {extracted_doi.doi for extracted_doi in cached_revision.extracted_dois}
+
+    @staticmethod
+    def parse_cite_journal_templates(wikitext: str) -> List[CiteJournal]:
+        """We parse all the cite journal templates into WikipediaPageReferences
+
+        This is slow, so it is only done when someone asks for the references"""
         logger = logging.getLogger(__name__)
         logger.info("Parsing templates")
-        raw = self.pywikibot_page.raw_extracted_templates
-        self.references = []
-        self.dois = []
+        raw = textlib.extract_templates_and_params(wikitext, True, True)
+        references = []
         for template_name, content in raw:
             logger.debug(f"working on {template_name}")
             if template_name.lower() == "cite journal":
@@ -72,18 +141,53 @@ class WikipediaPage:
                 else:
                     content_as_dict["doi"] = None
                 cite_journal = CiteJournal(**content_as_dict)
-                self.references.append(cite_journal)
-                if cite_journal.doi is not None:
-                    self.number_of_dois += 1
-                    self.dois.append(cite_journal.doi)
-                else:
+                references.append(cite_journal)
+                if cite_journal.doi is None:
                     # We ignore cultural magazines for now
                     if cite_journal.journal_title is not None and "magazine" not in cite_journal.journal_title:
                         logger.warning(f"An article titled {cite_journal.title} "
                                        f"in the journal_title {cite_journal.journal_title} "
                                        f"was found but no DOI. "
                                        f"(pmid:{cite_journal.pmid} jstor:{cite_journal.jstor})")
-        # exit()
+        return references
+
+    @property
+    def references(self) -> List[WikipediaPageReference]:
+        if self.__references is None:
+            self.__references = self.parse_cite_journal_templates(wikitext=self.wikitext)
+        return self.__references
+
+    def __remove_dois_found_in_the_old_revision__(self):
+        """We only look up the DOIs that were added by the edit that triggered the event"""
+        logger = logging.getLogger(__name__)
+        if self.wikimedia_event.old_revision_id is None:
+            logger.debug("This is a new page so all the DOIs were added by the edit")
+            return
+        try:
+            old_dois = self.__get_dois_in_the_old_revision__()
+        except pywikibot.exceptions.Error as e:
+            logger.warning(f"Could not get the old revision so we look up all the DOIs: {e}")
+            return
+        added_dois = [doi for doi in self.dois if doi.value not in old_dois]
+        self.number_of_unchanged_dois = len(self.dois) - len(added_dois)
+        logger.info(f"{len(added_dois)} DOIs were added by the edit and "
+                    f"{self.number_of_unchanged_dois} were already on the page")
+        self.dois = added_dois
+        self.number_of_dois = len(self.dois)
+
+    def __lookup_in_crossref_concurrently__(self):
+        """The works that are not cached are fetched at the same time
+        instead of one at a time when each DOI is looked up"""
+        if runtime_variables.crossref_client is None:
+            return
+        dois = [doi for doi in self.dois
+                if not doi.resolved_from_cache and doi.crossref is None and
+                doi.value not in runtime_variables.crossref_response_cache]
+        if len(dois) > 0:
+            logger.info(f"Fetching {len(dois)} works from Crossref")
+            fetches = runtime_variables.crossref_client.fetch_works_blocking([doi.value for doi in dois])
+            for doi, fetch in zip(dois, fetches):
+                doi.lookup_in_crossref(fetch=fetch)
 
     def __populate_missing_dois__(self):
         logger = logging.getLogger(__name__)
@@ -91,8 +195,19 @@ class WikipediaPage:
         if self.dois is not None and len(self.dois) > 0:
             logger.info(f"Looking up {self.number_of_dois} DOIs in "
                         f"Wikidata and if found also in Crossref")
+            # The DOIs resolved recently and the DOIs that are not in the
+            # Bloom filter of Wikidata are skipped by the queries
+            [doi.read_from_the_resolved_doi_cache() for doi in self.dois]
+            [doi.check_the_bloom_filter() for doi in self.dois]
+            if runtime_variables.doi_index is not None:
+                runtime_variables.doi_index.resolve(self.dois)
+            if config.resolve_dois_with_sparql:
+                DoiResolver(batch_size=config.sparql_doi_batch_size).resolve(self.dois)
+            self.__lookup_in_crossref_concurrently__()
             [doi.lookup_and_match_subjects() for doi in self.dois]
-            missing_dois = [doi for doi in self.dois if not doi.found_in_wikidata]
+            # The DOIs that Hub failed to look up are not known to be missing
+            missing_dois = [doi for doi in self.dois
+                            if not doi.found_in_wikidata and not doi.hub_lookup_failed]
             if missing_dois is not None and len(missing_dois) > 0:
                 self.missing_dois.extend(missing_dois)
 
@@ -109,10 +224,20 @@ class WikipediaPage:
                     print("debug exit after uploads")
                     exit()
 
+    def __remember_the_processed_dois__(self):
+        """The next edit of this page can skip the lookups if it does not change the DOIs"""
+        self.wikitext_cache.set_processed_dois(
+            page_id=self.page_id,
+            dois=[extracted_doi.doi for extracted_doi in self.extracted_dois]
+        )
+
     def __calculate_statistics__(self):
         self.number_of_dois = len(self.dois)
         self.number_of_missing_dois = len(self.missing_dois)
+        self.number_of_failed_lookups = len([doi for doi in self.dois if doi.hub_lookup_failed])
         logger.info(f"Found {self.number_of_missing_dois}/{self.number_of_dois} missing DOIs on this page")
+        if self.number_of_failed_lookups > 0:
+            logger.warning(f"Could not look up {self.number_of_failed_lookups} DOIs via Hub on this page")
         # if len(missing_dois) > 0:
         #     input_output.save_to_wikipedia_list(missing_dois, language_code, title)
         # if config.import_mode:
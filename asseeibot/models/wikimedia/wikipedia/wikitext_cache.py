@@ -0,0 +1,233 @@
+import json
+import logging
+import sqlite3
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from hashlib import sha1
+from time import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from asseeibot.models.wikimedia.wikipedia.doi_extractor import extract_dois_from_any_page, ExtractedDoi
+
+logger = logging.getLogger(__name__)
+
+
+class CachedRevision(NamedTuple):
+    page_id: int
+    revision_id: int
+    sha1: str
+    wikitext: str
+    extracted_dois: List[ExtractedDoi]
+
+
+class WikitextCache:
+    """This caches the wikitext and the extracted DOIs of revisions
+
+    The revisions point to their content by the SHA1 of the wikitext so an
+    identical revert reuses the DOIs we already extracted. The most recently
+    used revisions are kept in memory and all of them in SQLite if a filename
+    is given. The oldest content on disk is evicted when there is too much.
+
+    It also remembers the DOIs of the last processed revision of each page so
+    that edits that don't change the DOIs can skip all the lookups. These are
+    bounded like the revisions, in memory and on disk.
+
+    The workers use it from several threads so all access is locked."""
+    connection: Optional[sqlite3.Connection] = None
+    # The DOIs of the content in memory and how many revisions in memory have it
+    dois_by_sha1: Dict[str, List[ExtractedDoi]] = None
+    revisions_by_sha1: Counter = None
+    hits: int = 0
+    lock: threading.Lock = None
+    max_revisions_on_disk: int = 20000
+    max_revisions_in_memory: int = 1000
+    memory: OrderedDict = None
+    misses: int = 0
+    processed_pages: OrderedDict = None
+    puts_since_eviction: int = 0
+
+    def __init__(self,
+                 filename: str = None,
+                 max_revisions_in_memory: int = 1000,
+                 max_revisions_on_disk: int = 20000):
+        self.max_revisions_in_memory = max_revisions_in_memory
+        self.max_revisions_on_disk = max_revisions_on_disk
+        self.memory = OrderedDict()
+        self.dois_by_sha1 = dict()
+        self.revisions_by_sha1 = Counter()
+        self.processed_pages = OrderedDict()
+        self.lock = threading.Lock()
+        if filename is not None:
+            self.connection = sqlite3.connect(filename, check_same_thread=False)
+            self.connection.executescript("""
+                PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
+                CREATE TABLE IF NOT EXISTS revision
+                    (revision_id INTEGER PRIMARY KEY, page_id INTEGER NOT NULL, sha1 TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS content
+                    (sha1 TEXT PRIMARY KEY, wikitext BLOB NOT NULL, dois TEXT NOT NULL, last_access REAL NOT NULL);
+                CREATE INDEX IF NOT EXISTS content_last_access ON content (last_access);
+                CREATE TABLE IF NOT EXISTS processed_page
+                    (page_id INTEGER PRIMARY KEY, dois_digest TEXT NOT NULL, processed REAL NOT NULL);
+                CREATE INDEX IF NOT EXISTS processed_page_processed ON processed_page (processed);
+            """)
+            self.connection.commit()
+
+    def __contains__(self, revision_id: int) -> bool:
+        with self.lock:
+            if revision_id in self.memory:
+                return True
+            if self.connection is not None:
+                return self.connection.execute(
+                    "SELECT 1 FROM revision JOIN content ON revision.sha1 = content.sha1 "
+                    "WHERE revision.revision_id = ?", (revision_id,)
+                ).fetchone() is not None
+            return False
+
+    def __evict_from_disk__(self):
+        """This is done now and then because counting the rows is not free"""
+        self.puts_since_eviction = 0
+        count = self.connection.execute("SELECT COUNT(*) FROM content").fetchone()[0]
+        if count > self.max_revisions_on_disk:
+            logger.debug(f"Evicting {count - self.max_revisions_on_disk} revisions from the wikitext cache")
+            self.connection.execute(
+                "DELETE FROM content WHERE sha1 IN "
+                "(SELECT sha1 FROM content ORDER BY last_access LIMIT ?)",
+                (count - self.max_revisions_on_disk,)
+            )
+            self.connection.execute("DELETE FROM revision WHERE sha1 NOT IN (SELECT sha1 FROM content)")
+        count = self.connection.execute("SELECT COUNT(*) FROM processed_page").fetchone()[0]
+        if count > self.max_revisions_on_disk:
+            self.connection.execute(
+                "DELETE FROM processed_page WHERE page_id IN "
+                "(SELECT page_id FROM processed_page ORDER BY processed LIMIT ?)",
+                (count - self.max_revisions_on_disk,)
+            )
+        self.connection.commit()
+
+    def __get_from_disk__(self, revision_id: int) -> Optional[CachedRevision]:
+        row = self.connection.execute(
+            "SELECT revision.page_id, revision.sha1, content.wikitext, content.dois "
+            "FROM revision JOIN content ON revision.sha1 = content.sha1 "
+            "WHERE revision.revision_id = ?", (revision_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        page_id, content_sha1, compressed_wikitext, dois = row
+        self.connection.execute("UPDATE content SET last_access = ? WHERE sha1 = ?", (time(), content_sha1))
+        self.connection.commit()
+        return CachedRevision(
+            page_id=page_id,
+            revision_id=revision_id,
+            sha1=content_sha1,
+            wikitext=zlib.decompress(compressed_wikitext).decode(),
+            extracted_dois=[ExtractedDoi(*extracted_doi) for extracted_doi in json.loads(dois)]
+        )
+
+    def __get_dois_by_sha1__(self, content_sha1: str) -> Optional[List[ExtractedDoi]]:
+        extracted_dois = self.dois_by_sha1.get(content_sha1)
+        if extracted_dois is not None:
+            return extracted_dois
+        if self.connection is not None:
+            row = self.connection.execute("SELECT dois FROM content WHERE sha1 = ?", (content_sha1,)).fetchone()
+            if row is not None:
+                return [ExtractedDoi(*extracted_doi) for extracted_doi in json.loads(row[0])]
+
+    def __forget__(self, revision: CachedRevision):
+        self.revisions_by_sha1[revision.sha1] -= 1
+        if self.revisions_by_sha1[revision.sha1] <= 0:
+            del self.revisions_by_sha1[revision.sha1]
+            del self.dois_by_sha1[revision.sha1]
+
+    def __remember__(self, revision: CachedRevision):
+        old_revision = self.memory.pop(revision.revision_id, None)
+        if old_revision is not None:
+            self.__forget__(old_revision)
+        self.memory[revision.revision_id] = revision
+        self.revisions_by_sha1[revision.sha1] += 1
+        self.dois_by_sha1[revision.sha1] = revision.extracted_dois
+        while len(self.memory) > self.max_revisions_in_memory:
+            _, evicted_revision = self.memory.popitem(last=False)
+            self.__forget__(evicted_revision)
+
+    @staticmethod
+    def dois_digest(dois: Iterable[str]) -> str:
+        """A compact fingerprint of a set of DOIs"""
+        return sha1("\n".join(sorted(set(dois))).encode()).hexdigest()  # nosec: B324
+
+    def get(self, revision_id: int) -> Optional[CachedRevision]:
+        with self.lock:
+            revision = self.memory.get(revision_id)
+            if revision is None and self.connection is not None:
+                revision = self.__get_from_disk__(revision_id=revision_id)
+            if revision is not None:
+                self.hits += 1
+                self.__remember__(revision)
+            else:
+                self.misses += 1
+            return revision
+
+    def get_processed_dois_digest(self, page_id: int) -> Optional[str]:
+        with self.lock:
+            digest = self.processed_pages.get(page_id)
+            if digest is None and self.connection is not None:
+                row = self.connection.execute("SELECT dois_digest FROM processed_page WHERE page_id = ?",
+                                              (page_id,)).fetchone()
+                if row is not None:
+                    digest = row[0]
+            return digest
+
+    def put(self, page_id: int, revision_id: int, wikitext: str) -> CachedRevision:
+        """Cache a revision and extract the DOIs unless we have seen the content before"""
+        # MediaWiki uses the same SHA1 of the content, this is not for security
+        content_sha1 = sha1(wikitext.encode()).hexdigest()  # nosec: B324
+        with self.lock:
+            extracted_dois = self.__get_dois_by_sha1__(content_sha1=content_sha1)
+        if extracted_dois is None:
+            # This is done outside the lock because it can take a while on large pages
+            extracted_dois = extract_dois_from_any_page(wikitext)
+        else:
+            logger.debug("We have seen this content before")
+        revision = CachedRevision(page_id=page_id,
+                                  revision_id=revision_id,
+                                  sha1=content_sha1,
+                                  wikitext=wikitext,
+                                  extracted_dois=extracted_dois)
+        with self.lock:
+            self.__remember__(revision)
+            if self.connection is not None:
+                self.connection.execute("INSERT OR REPLACE INTO revision (revision_id, page_id, sha1) VALUES (?, ?, ?)",
+                                        (revision_id, page_id, content_sha1))
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO content (sha1, wikitext, dois, last_access) VALUES (?, ?, ?, ?)",
+                    (content_sha1, zlib.compress(wikitext.encode()),
+                     json.dumps([list(extracted_doi) for extracted_doi in extracted_dois]), time())
+                )
+                self.connection.commit()
+                self.puts_since_eviction += 1
+                if self.puts_since_eviction >= 100:
+                    self.__evict_from_disk__()
+        return revision
+
+    def set_processed_dois(self, page_id: int, dois: Iterable[str]):
+        digest = self.dois_digest(dois)
+        with self.lock:
+            self.processed_pages[page_id] = digest
+            self.processed_pages.move_to_end(page_id)
+            while len(self.processed_pages) > self.max_revisions_in_memory:
+                self.processed_pages.popitem(last=False)
+            if self.connection is not None:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO processed_page (page_id, dois_digest, processed) VALUES (?, ?, ?)",
+                    (page_id, digest, time())
+                )
+                self.connection.commit()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        if lookups > 0:
+            return self.hits / lookups
+        else:
+            return 0.0
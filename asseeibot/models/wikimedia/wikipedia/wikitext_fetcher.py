@@ -0,0 +1,173 @@
+import asyncio
+import logging
+from enum import Enum
+from typing import Any, Dict, Optional, Set, Union
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+from pydantic import BaseModel
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class FetchParameter(Enum):
+    """The API does not allow mixing revision ids and titles in one request"""
+    REVISION_IDS = "revids"
+    TITLES = "titles"
+
+
+class FetchedRevision(BaseModel):
+    """This models a revision fetched from the MediaWiki API"""
+    page_id: int
+    revision_id: int
+    title: str
+    wikitext: str
+
+
+class WikitextFetcher:
+    """This fetches wikitext from the MediaWiki API in batches
+
+    Callers ask for one revision or title at a time. The requests are
+    collected until there are batch_size of them or the oldest one has
+    waited max_wait_seconds and are then fetched with one
+    action=query&prop=revisions request over a pooled session.
+    The result is None if the revision could not be fetched."""
+    api_url: str = None
+    batch_size: int = 50
+    max_connections: int = 4
+    max_wait_seconds: float = 0.5
+    number_of_requests: int = 0
+    pending: Dict[FetchParameter, Dict[Union[int, str], asyncio.Future]] = None
+    session: Optional[ClientSession] = None
+    tasks: Set[asyncio.Task] = None
+    timers: Dict[FetchParameter, asyncio.TimerHandle] = None
+
+    def __init__(self,
+                 api_url: str = None,
+                 batch_size: int = 50,
+                 max_wait_seconds: float = 0.5,
+                 max_connections: int = 4):
+        if api_url is None or api_url == "":
+            raise ValueError("api_url was None or empty string")
+        if not 0 < batch_size <= 50:
+            raise ValueError("batch_size must be between 1 and 50")
+        self.api_url = api_url
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.max_connections = max_connections
+        self.pending = {parameter: dict() for parameter in FetchParameter}
+        self.tasks = set()
+        self.timers = dict()
+
+    async def __enqueue__(self, parameter: FetchParameter, key: Union[int, str]) -> Optional[FetchedRevision]:
+        loop = asyncio.get_running_loop()
+        pending = self.pending[parameter]
+        future = pending.get(key)
+        if future is None:
+            future = loop.create_future()
+            pending[key] = future
+        if len(pending) >= self.batch_size:
+            self.__flush__(parameter)
+        elif parameter not in self.timers:
+            self.timers[parameter] = loop.call_later(self.max_wait_seconds, self.__flush__, parameter)
+        # Shielded because the future can be shared by several callers
+        return await asyncio.shield(future)
+
+    async def __fetch_batch__(self, parameter: FetchParameter, batch: Dict[Union[int, str], asyncio.Future]):
+        results = dict()
+        try:
+            data = await self.__query__(parameter=parameter, keys=list(batch.keys()))
+            results = self.__parse_response__(parameter=parameter, data=data)
+        except (ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"Could not fetch {len(batch)} revisions: {e}")
+        finally:
+            for key, future in batch.items():
+                if not future.done():
+                    future.set_result(results.get(key))
+
+    def __flush__(self, parameter: FetchParameter):
+        """Start fetching up to batch_size of the pending requests"""
+        timer = self.timers.pop(parameter, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self.pending[parameter]
+        keys = list(pending.keys())[:self.batch_size]
+        batch = {key: pending.pop(key) for key in keys}
+        if len(batch) > 0:
+            task = asyncio.ensure_future(self.__fetch_batch__(parameter=parameter, batch=batch))
+            # We keep a reference so the task is not garbage collected
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        if len(pending) > 0:
+            loop = asyncio.get_running_loop()
+            self.timers[parameter] = loop.call_later(self.max_wait_seconds, self.__flush__, parameter)
+
+    def __get_session__(self) -> ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = ClientSession(
+                connector=TCPConnector(limit=self.max_connections),
+                headers={"User-Agent": config.user_agent},
+                timeout=ClientTimeout(total=60)
+            )
+        return self.session
+
+    @staticmethod
+    def __parse_response__(parameter: FetchParameter, data: Dict[str, Any]) -> Dict[Union[int, str], FetchedRevision]:
+        query = data.get("query")
+        if query is None:
+            raise ValueError(f"no query in the response: {data.get('error')}")
+        # The API normalizes titles e.g. "petrology" -> "Petrology"
+        normalized_titles = {normalized["to"]: normalized["from"]
+                             for normalized in query.get("normalized", [])}
+        results = dict()
+        for page in query.get("pages", []):
+            if page.get("missing") or page.get("invalid"):
+                continue
+            for revision in page.get("revisions", []):
+                wikitext = revision.get("slots", {}).get("main", {}).get("content")
+                if wikitext is None:
+                    # The content was hidden or deleted
+                    continue
+                fetched_revision = FetchedRevision(
+                    page_id=page["pageid"],
+                    revision_id=revision["revid"],
+                    title=page["title"],
+                    wikitext=wikitext
+                )
+                if parameter == FetchParameter.REVISION_IDS:
+                    results[fetched_revision.revision_id] = fetched_revision
+                else:
+                    results[normalized_titles.get(page["title"], page["title"])] = fetched_revision
+        return results
+
+    async def __query__(self, parameter: FetchParameter, keys: list) -> Dict[str, Any]:
+        session = self.__get_session__()
+        params = {
+            "action": "query",
+            "prop": "revisions",
+            "rvprop": "ids|content",
+            "rvslots": "main",
+            "format": "json",
+            "formatversion": "2",
+            parameter.value: "|".join(str(key) for key in keys),
+        }
+        logger.debug(f"Fetching {len(keys)} revisions in one request")
+        self.number_of_requests += 1
+        # POST so a batch of long titles does not exceed the maximum length of the URL
+        async with session.post(self.api_url, data=params) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def close(self):
+        for timer in self.timers.values():
+            timer.cancel()
+        if self.session is not None:
+            await self.session.close()
+
+    async def fetch_revision(self, revision_id: int) -> Optional[FetchedRevision]:
+        return await self.__enqueue__(parameter=FetchParameter.REVISION_IDS, key=revision_id)
+
+    async def fetch_title(self, title: str) -> Optional[FetchedRevision]:
+        """This fetches the current revision of the page"""
+        return await self.__enqueue__(parameter=FetchParameter.TITLES, key=title)
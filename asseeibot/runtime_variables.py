@@ -1,4 +1,26 @@
-# These 2 variables are used to hold instances that we want to keep during the whole runtime
+# These variables are used to hold instances that we want to keep during the whole runtime
+import threading
 
 login_instance = None
 ontology_dataframe = None
+# The OntologyScoringEngine with the lowercased labels and aliases of the ontology_dataframe
+ontology_scoring_engine = None
+# The SubjectMatchTable built offline for the same ontology if there is one
+subject_match_table = None
+# The workers of the EventStream run in threads. This lock makes sure only one of them
+# at a time asks the user about matches and reads or writes the match cache.
+interactive_lock = threading.Lock()
+# Large pages are scanned for DOIs in this pool of processes if enabled in the config
+process_pool = None
+# The offline DoiIndex if one has been built
+doi_index = None
+# The DoiBloomFilter if one has been built
+doi_bloom_filter = None
+# The ResolvedDoiCache shared by all the pages
+resolved_doi_cache = None
+# The HubClient running on the event loop of the EventStream
+hub_client = None
+# The CrossrefResponseCache shared by all the pages
+crossref_response_cache = None
+# The CrossrefClient running on the event loop of the EventStream
+crossref_client = None
@@ -0,0 +1,78 @@
+"""Measure the cost of decoding a Crossref work from the raw message
+
+It compares converting every key with caseconverter and validating the
+whole CrossrefWork, which is what we did before, with the memoized key
+mapping and LazyCrossrefWork, validated or built from a trusted cache.
+
+Run it from the root of the repository with
+ $ python -m benchmarks.benchmark_crossref_decoding [JSONL file with Crossref responses or messages]
+
+Without a file a corpus of 100 works with 0-300 references is generated."""
+import json
+import sys
+from timeit import timeit
+from typing import Any, Dict, List
+
+from caseconverter import snakecase
+
+from asseeibot.models.crossref.work import CrossrefWork, LazyCrossrefWork, lazy_fields, snake_case_key, \
+    snake_case_nested_keys
+from benchmarks.benchmark_crossref_parsing import generate_message, read_messages
+
+
+def convert_every_key(message: Dict[str, Any]) -> Dict[str, Any]:
+    """The conversion from before the key mapping was memoized"""
+    def convert(dictionary: Dict) -> Dict:
+        return {snakecase(key).lower(): value for key, value in dictionary.items()}
+
+    data = dict()
+    for key, value in message.items():
+        if isinstance(value, dict):
+            value = convert(value)
+        if isinstance(value, list):
+            value = [convert(item) if isinstance(item, dict) else item for item in value]
+        data[snakecase(key).lower()] = value
+    return data
+
+
+def convert_with_the_mapping(message: Dict[str, Any]) -> Dict[str, Any]:
+    """What CrossrefEngine.__convert_to_snake_case__ does with lazy parsing"""
+    data = dict()
+    for key, value in message.items():
+        renamed_key = snake_case_key(key)
+        data[renamed_key] = value if renamed_key in lazy_fields else snake_case_nested_keys(value)
+    return data
+
+
+def decode_before(message: Dict[str, Any]):
+    return CrossrefWork(**convert_every_key(message))
+
+
+def decode_validated(message: Dict[str, Any]):
+    return LazyCrossrefWork(**convert_with_the_mapping(message))
+
+
+def decode_trusted(message: Dict[str, Any]):
+    return LazyCrossrefWork.construct_trusted(**convert_with_the_mapping(message))
+
+
+def main():
+    if len(sys.argv) > 1:
+        messages: List[Dict[str, Any]] = read_messages(sys.argv[1])
+    else:
+        messages = [generate_message(number_of_references=number * 3) for number in range(100)]
+    print(f"Decoding {len(messages)} works")
+    number = 5
+    results = dict()
+    for name, decode in [("Every key converted and all validated", decode_before),
+                         ("Memoized mapping, lazy and validated", decode_validated),
+                         ("Memoized mapping, lazy and trusted", decode_trusted)]:
+        seconds = timeit(lambda: [decode(message).subject for message in messages], number=number)
+        results[name] = seconds
+        print(f"{name}: {round(seconds / number / len(messages) * 1000000)}µs per work")
+    before = results["Every key converted and all validated"]
+    print(f"The trusted decoding is {round(before / results['Memoized mapping, lazy and trusted'])}x faster")
+
+
+if __name__ == "__main__":
+    main()
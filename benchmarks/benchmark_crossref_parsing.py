@@ -0,0 +1,87 @@
+"""Compare parsing Crossref works eagerly into CrossrefWork with LazyCrossrefWork
+
+Run it from the root of the repository with
+ $ python -m benchmarks.benchmark_crossref_parsing [JSONL file with Crossref messages]
+
+Without a file a work with 300 references and 20 authors is generated."""
+import json
+import sys
+import tracemalloc
+from timeit import timeit
+from typing import Any, Dict, List
+
+import config
+from asseeibot.models.crossref.engine import CrossrefEngine
+from asseeibot.models.crossref.work import CrossrefWork, LazyCrossrefWork
+
+
+def generate_message(number_of_references: int = 300) -> Dict[str, Any]:
+    """Generate a Crossref message that looks like a large journal article"""
+    date = {"date-parts": [[2020, 5, 17]], "date-time": "2020-05-17T10:00:00Z"}
+    return {
+        "DOI": "10.1000/jpet.2020.1",
+        "type": "journal-article",
+        "title": ["On the petrology of igneous rocks"],
+        "subject": ["Geology", "Geochemistry and Petrology"],
+        "score": "1.0",
+        "source": "Crossref",
+        "publisher": "Springer",
+        "references-count": number_of_references,
+        "is-referenced-by-count": 12,
+        "ISSN": ["0022-3530"],
+        "author": [{"given": f"Jane{number}", "family": "Doe", "sequence": "additional",
+                    "affiliation": [{"name": "University of Rocks"}]} for number in range(20)],
+        "link": [{"URL": "https://example.com/fulltext.pdf", "content-type": "application/pdf",
+                  "intended-application": "text-mining"}],
+        "issued": date,
+        "published": date,
+        "published-print": date,
+        "reference": [{"key": f"ref{number}", "first-page": str(number + 1), "DOI": f"10.1000/ref.{number}",
+                       "article-title": f"Reference {number}", "volume": "12", "author": "Doe",
+                       "year": "2001", "journal-title": "Journal of Petrology"}
+                      for number in range(number_of_references)]
+    }
+
+
+def read_messages(filename: str) -> List[Dict[str, Any]]:
+    with open(filename, encoding="utf-8") as file:
+        return [json.loads(line).get("message", json.loads(line)) for line in file if line.strip() != ""]
+
+
+def parse(message: Dict[str, Any], lazy: bool):
+    """This does what CrossrefEngine.__parse_habanero_data__ does"""
+    config.lazy_crossref_parsing = lazy
+    engine = CrossrefEngine(doi=None)
+    engine.data = message
+    engine.__convert_to_snake_case__()
+    if lazy:
+        return LazyCrossrefWork(**engine.data)
+    else:
+        return CrossrefWork(**engine.data)
+
+
+def measure(messages: List[Dict[str, Any]], lazy: bool):
+    number = 10
+    seconds = timeit(lambda: [parse(message, lazy).subject for message in messages], number=number)
+    tracemalloc.start()
+    works = [parse(message, lazy) for message in messages]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{'Lazy' if lazy else 'Eager'}: {round(seconds / number / len(messages) * 1000, 2)}ms and "
+          f"{size // len(works) // 1024} kB per work")
+    return seconds
+
+
+def main():
+    if len(sys.argv) > 1:
+        messages = read_messages(sys.argv[1])
+    else:
+        messages = [generate_message()]
+    print(f"Parsing {len(messages)} works")
+    eager = measure(messages, lazy=False)
+    lazy = measure(messages, lazy=True)
+    print(f"The lazy parsing is {round(eager / lazy, 1)}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Compare the DOI extractor with parsing all templates into CiteJournal models
+
+Run it from the root of the repository with
+ $ python -m benchmarks.benchmark_doi_extraction [number of citations]"""
+import sys
+from timeit import timeit
+
+from asseeibot.models.wikimedia.wikipedia.doi_extractor import extract_dois
+from asseeibot.models.wikimedia.wikipedia.wikipedia_page import WikipediaPage
+
+
+def generate_wikitext(number_of_citations: int) -> str:
+    """Generate a long science article with a mix of citation styles"""
+    paragraphs = []
+    for number in range(number_of_citations):
+        if number % 4 == 0:
+            citation = (f"{{{{cite journal |last=Doe |first=J. |title=On {{{{lang|la|rebus}}}} {number} "
+                        f"|journal=Journal of Petrology |volume=12 |pages=1–10 |year=2001 "
+                        f"|doi=10.1000/jpet.{number} |pmid={number}}}}}")
+        elif number % 4 == 1:
+            citation = (f"{{{{cite book |last=Doe |title=Rocks {number} |publisher=Springer "
+                        f"|isbn=978-3-16-148410-0 |doi=10.1007/978-{number}}}}}")
+        elif number % 4 == 2:
+            citation = f"Doe J. Rocks. Nature. 2001. {{{{doi|10.1038/nature{number}}}}}"
+        else:
+            citation = f"[https://doi.org/10.1126/science.{number} Science {number}]"
+        paragraphs.append(f"Petrology is the study of rocks.{{{{citation needed|date=May 2022}}}} "
+                          f"[[Igneous rock|Igneous rocks]] are common.<ref>{citation}</ref>\n")
+    return "".join(paragraphs)
+
+
+def main():
+    number_of_citations = int(sys.argv[1]) if len(sys.argv) > 1 else 250
+    wikitext = generate_wikitext(number_of_citations)
+    number = 10
+    models = timeit(lambda: [reference.doi for reference in
+                             WikipediaPage.parse_cite_journal_templates(wikitext)], number=number)
+    extractor = timeit(lambda: extract_dois(wikitext), number=number)
+    print(f"Page with {len(wikitext)} characters and {number_of_citations} citations")
+    print(f"CiteJournal models: {round(models / number * 1000, 2)}ms per page "
+          f"finding {len([reference for reference in WikipediaPage.parse_cite_journal_templates(wikitext) if reference.doi])} DOIs")
+    print(f"DOI extractor: {round(extractor / number * 1000, 2)}ms per page "
+          f"finding {len(extract_dois(wikitext))} DOIs")
+    print(f"The extractor is {round(models / extractor, 1)}x faster")
+
+
+if __name__ == "__main__":
+    main()
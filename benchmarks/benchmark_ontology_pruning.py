@@ -0,0 +1,64 @@
+"""Measure how scoring every row and scoring only the candidates from the n-gram indexes
+scale with the size of the ontology
+
+Run it from the root of the repository with
+ $ python -m benchmarks.benchmark_ontology_pruning [number of rows ...]
+
+The ontologies are generated like in benchmark_ontology_scoring but the vocabulary
+grows with the ontology like in a real one, with one made up word per 10 rows."""
+import random
+import sys
+from timeit import default_timer, timeit
+
+import numpy as np
+
+import config
+from asseeibot.models.ontology_scoring_engine import OntologyScoringEngine
+from benchmarks.benchmark_ontology_scoring import generate_ontology, subjects, words
+
+syllables = ["ba", "co", "dri", "en", "fu", "ga", "hy", "io", "ka", "lo", "me", "ni", "ol",
+             "pa", "qu", "ro", "si", "tu", "ul", "vi", "xe", "zo", "an", "th", "gen", "ic"]
+
+
+def generate_vocabulary(number_of_words: int, seed: int = 0) -> list:
+    generator = random.Random(seed)  # nosec B311 reproducible test data, not security
+    return words + ["".join(generator.choice(syllables) for _ in range(generator.randint(2, 5)))
+                    for _ in range(number_of_words)]
+
+
+def brute_force(engine: OntologyScoringEngine, subject: str, k: int = 3):
+    """Score every row and keep the best ones above the thresholds"""
+    candidates = []
+    for scores, threshold in zip(engine.score(subject), [config.label_threshold_ratio,
+                                                         config.alias_threshold_ratio]):
+        rows = np.flatnonzero(scores >= threshold)
+        candidates.append(engine.top_k(scores[rows], k=k, rows=rows))
+    return tuple(candidates)
+
+
+def pruned(engine: OntologyScoringEngine, subject: str, k: int = 3):
+    return engine.top_candidates(subject, k=k,
+                                 label_threshold=config.label_threshold_ratio,
+                                 alias_threshold=config.alias_threshold_ratio)
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] if len(sys.argv) > 1 else [26000, 100000, 400000]
+    number = 5
+    for size in sizes:
+        dataframe = generate_ontology(number_of_rows=size, vocabulary=generate_vocabulary(size // 10))
+        start = default_timer()
+        engine = OntologyScoringEngine(dataframe=dataframe)
+        build = default_timer() - start
+        for subject in subjects:
+            if brute_force(engine, subject) != pruned(engine, subject):
+                raise ValueError(f"the top matches of '{subject}' differ")
+        every_row = timeit(lambda: [brute_force(engine, subject) for subject in subjects], number=number)
+        candidates = timeit(lambda: [pruned(engine, subject) for subject in subjects], number=number)
+        print(f"{size} rows, built in {round(build, 1)}s, the top matches are identical")
+        print(f"  Scoring every row: {round(every_row / number / len(subjects) * 1000, 2)}ms per subject")
+        print(f"  Scoring the candidates: {round(candidates / number / len(subjects) * 1000, 2)}ms per subject")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Compare scoring a subject with DataFrame.apply and fuzzywuzzy with the OntologyScoringEngine
+and picking the best matches by sorting the dataframe with OntologyScoringEngine.top_k
+
+Run it from the root of the repository with
+ $ python -m benchmarks.benchmark_ontology_scoring [ontology pickle]
+
+Without a pickle an ontology of 26000 rows with random science words is generated."""
+import random
+import sys
+from timeit import timeit
+
+import numpy as np
+import pandas as pd
+from fuzzywuzzy import fuzz
+from pandas import DataFrame
+
+from asseeibot.models.ontology_scoring_engine import OntologyScoringEngine
+
+words = ["acid", "algebra", "analysis", "anatomy", "biology", "cell", "chemistry", "climate",
+         "computer", "crystal", "ecology", "energy", "engineering", "genetics", "geology",
+         "history", "igneous", "language", "marine", "materials", "mechanics", "medicine",
+         "metrology", "molecular", "nuclear", "ocean", "organic", "petrology", "physics",
+         "plant", "polymer", "quantum", "rock", "science", "soil", "statistics", "theory"]
+subjects = ["Petrology", "General Earth and Planetary Sciences", "Organic Chemistry",
+            "Computer Science Applications", "Ecology, Evolution, Behavior and Systematics"]
+
+
+def generate_ontology(number_of_rows: int = 26000, seed: int = 0, vocabulary: list = None) -> DataFrame:
+    """Generate an ontology with the columns of ontology.pkl"""
+    generator = random.Random(seed)  # nosec B311 reproducible test data, not security
+    vocabulary = words if vocabulary is None else vocabulary
+
+    def phrase() -> str:
+        return " ".join(generator.choice(vocabulary) for _ in range(generator.randint(1, 4))).capitalize()
+
+    return pd.DataFrame(dict(
+        item=[f"http://www.wikidata.org/entity/Q{number}" for number in range(number_of_rows)],
+        label=[phrase() for _ in range(number_of_rows)],
+        alias=[phrase() if generator.random() < 0.6 else "" for _ in range(number_of_rows)],
+        description=["" for _ in range(number_of_rows)],
+    ))
+
+
+def score_with_apply(dataframe: DataFrame, subject: str):
+    """The scoring from before the engine"""
+    label_scores = dataframe.label.apply(lambda x: fuzz.ratio(x.lower(), subject.lower()))
+    alias_scores = dataframe.alias.apply(lambda x: fuzz.ratio(x.lower(), subject.lower()))
+    return label_scores.to_numpy(), alias_scores.to_numpy()
+
+
+def pick_by_sorting(dataframe: DataFrame, label_scores, alias_scores):
+    """The selection from before top_k, a copy and a full sort per column"""
+    scored = dataframe.assign(label_score=label_scores, alias_score=alias_scores)
+    return [next(scored.sort_values(column, ascending=False).itertuples(index=False))
+            for column in ["label_score", "alias_score"]]
+
+
+def pick_top_k(engine: OntologyScoringEngine, label_scores, alias_scores):
+    return [engine.top_k(label_scores, k=3), engine.top_k(alias_scores, k=3)]
+
+
+def main():
+    if len(sys.argv) > 1:
+        dataframe = pd.read_pickle(sys.argv[1]).fillna('')  # nosec B301 our own ontology.pkl
+    else:
+        dataframe = generate_ontology()
+    engine = OntologyScoringEngine(dataframe=dataframe)
+    for subject in subjects:
+        before, after = score_with_apply(dataframe, subject), engine.score(subject)
+        if not (np.array_equal(before[0], after[0]) and np.array_equal(before[1], after[1])):
+            raise ValueError(f"the scores of '{subject}' differ")
+    number = 5
+    apply = timeit(lambda: [score_with_apply(dataframe, subject) for subject in subjects], number=number)
+    vectorized = timeit(lambda: [engine.score(subject) for subject in subjects], number=number)
+    print(f"Scoring {len(subjects)} subjects against {len(dataframe)} rows, the scores are identical")
+    print(f"DataFrame.apply: {round(apply / number / len(subjects) * 1000, 2)}ms per subject")
+    print(f"OntologyScoringEngine: {round(vectorized / number / len(subjects) * 1000, 2)}ms per subject")
+    print(f"The engine is {round(apply / vectorized, 1)}x faster")
+    scores = [engine.score(subject) for subject in subjects]
+    sorting = timeit(lambda: [pick_by_sorting(dataframe, *score) for score in scores], number=number)
+    top_k = timeit(lambda: [pick_top_k(engine, *score) for score in scores], number=number)
+    print(f"Sorting the dataframe: {round(sorting / number / len(subjects) * 1000, 2)}ms per subject")
+    print(f"Top 3 with top_k: {round(top_k / number / len(subjects) * 1000, 2)}ms per subject")
+
+
+if __name__ == "__main__":
+    main()
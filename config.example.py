@@ -17,14 +17,84 @@ match_subjects_to_qids_and_upload = True  # For this to work you need to specify
 # according to the https://en.wikipedia.org/wiki/Levenshtein_distance
 alias_threshold_ratio: int = 85
 label_threshold_ratio: int = 82
+# The best matches above the threshold are shown one at a time until one is accepted
+number_of_candidates_to_show: int = 3
+# The candidates of a vocabulary of Crossref subjects matched offline with --build-subject-match-table.
+# It is only used if it was built from the current ontology with the settings above.
+subject_match_table_filename = "subject_match_table.json"  # None = always match live
 
 # General settings
 exit_after_uploads_on_one_page = True
 lookup_dois = True
+only_lookup_dois_added_by_the_edit = True  # False = look up all the DOIs on the page
+# How the DOIs were resolved is remembered so a DOI cited on many pages is only looked up once.
+# DOIs that were missing in Wikidata are looked up again sooner because the items might be created
+resolved_doi_cache_filename = "resolved_dois.sqlite"  # None = only remember them in memory
+resolved_doi_cache_positive_ttl_hours = 24 * 30
+resolved_doi_cache_negative_ttl_hours = 24
+resolved_doi_cache_max_dois = 1000000  # The oldest are deleted when there are more
+# Resolve the DOIs of a page with a few SPARQL queries before falling back to Hub for each DOI
+resolve_dois_with_sparql = True
+sparql_doi_batch_size = 100
+# The offline DOI index is built with --build-doi-index and consulted before the network.
+# When the dump is older than this we only trust the DOIs found in it
+doi_index_filename = "doi_index.bin"  # None = don't use an index
+doi_index_max_age_days = 7
+# The Bloom filter is built with --build-doi-bloom-filter. DOIs that are not in it are not looked up.
+# A lower false positive rate costs more memory, 1% is ~1.2 bytes per DOI.
+# When the dump is older than the max age the DOIs that are not in it are looked up anyway.
+doi_bloom_filter_filename = "doi_bloom_filter.bin"  # None = don't use a filter
+doi_bloom_filter_false_positive_rate = 0.01
+doi_bloom_filter_max_age_days = 7
+# The works on a page are fetched concurrently while staying inside the rate limit Crossref tells us
+crossref_max_concurrent_requests = 5
+crossref_timeout_seconds = 30
+# Works fetched together with one filter query. 1 = fetch them one by one
+crossref_batch_size = 20
+# Parse the references, links, authors and dates of the works only when they are used
+lazy_crossref_parsing = True
+# The works fetched from Crossref are cached compressed. --prewarm-crossref-cache loads works from a file
+crossref_cache_filename = "crossref_works.sqlite"  # None = only cache in memory
+crossref_cache_ttl_days = 30
+crossref_cache_max_megabytes = 500
+# Lookups via hub.toolforge.org
+hub_max_concurrent_requests = 8
+hub_timeout_seconds = 10
 ask_before_lookup = False
 max_events = 0  # Max events to read. 0 = unlimited
 missing_identitifier_limit = 2  # How many DOIs to stop after. 0 = unlimited
 loglevel = logging.WARNING
+# Pipeline settings
+event_queue_size = 100  # Max number of events waiting for a worker
+number_of_workers = 4  # Workers fetching pages, looking up DOIs and matching subjects in parallel
+# The wikitext is fetched in batches of up to 50 revisions (the limit of the API).
+# A revision waits at most this long for its batch to fill up
+wikitext_fetch_batch_size = 50
+wikitext_fetch_max_wait_seconds = 0.5
+wikitext_fetch_max_connections = 4
+# The wikitext and DOIs of the revisions we have seen are cached
+wikitext_cache_filename = "wikitext_cache.sqlite"  # None = only cache in memory
+wikitext_cache_max_revisions_in_memory = 1000
+wikitext_cache_max_revisions_on_disk = 20000
+# DOIs are extracted in separate processes on pages with at least this many characters
+number_of_processes_for_large_pages = 2  # 0 = extract all pages in the workers
+process_pool_min_wikitext_length = 200000
+# Events are rejected on these before they are parsed into objects
+triage_server_names = ["en.wikipedia.org"]
+triage_namespaces = [0]
+triage_edit_types = ["edit", "new"]
+triage_skip_bot_edits = False
+triage_min_length_change = None  # e.g. 0 to skip edits that only remove text. None = disabled
+# Pages are only processed once within this window. 0 = never process a page again
+dedup_reprocess_window_hours = 24
+dedup_max_pages_in_memory = 100000
+dedup_sqlite_filename = "processed_pages.sqlite"  # None = only remember the pages in memory
+dedup_max_pages_on_disk = 1000000
+# The last fully processed event is saved here so we can resume the stream after a restart
+checkpoint_filename = "stream_checkpoint.json"  # None = always start from now
+checkpoint_interval_seconds = 10
+reconnect_base_delay_seconds = 1
+reconnect_max_delay_seconds = 60
 cache_pickle_filename = "old_cache.pkl"
 # excluded_wikis = ["ceb", "zh", "ja"]
 # trust_url_file_endings = True
@@ -0,0 +1,36 @@
+import gzip
+import json
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from asseeibot.models.crossref.response_cache import CrossrefResponseCache
+
+
+class TestCrossrefResponseCache(TestCase):
+
+    def test_prewarm_and_get(self):
+        with TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "works.jsonl.gz")
+            with gzip.open(filename, "wt") as file:
+                file.write(json.dumps({"status": "ok", "message": {"DOI": "10.1000/ABC", "type": "journal-article",
+                                                                   "score": 1, "source": "Crossref"}}))
+                file.write("\n")
+                file.write(json.dumps({"DOI": "10.1000/def", "type": "book", "score": 1, "source": "Crossref"}))
+                file.write("\n")
+                # This is skipped because the work would not validate
+                file.write(json.dumps({"DOI": "10.1000/ghi", "type": "journal-article", "score": 1}))
+                file.write("\n")
+            cache = CrossrefResponseCache(ttl_seconds=3600)
+            self.assertEqual(cache.prewarm(filename), 2)
+            self.assertEqual(cache.get("10.1000/abc")["type"], "journal-article")
+            self.assertEqual(cache.get("10.1000/DEF")["type"], "book")
+            self.assertIsNone(cache.get("10.1000/ghi"))
+            self.assertEqual(cache.hits, 2)
+
+    def test_eviction(self):
+        cache = CrossrefResponseCache(ttl_seconds=3600, max_megabytes=0.001)
+        for number in range(200):
+            cache.put(f"10.1000/{number}", {"DOI": f"10.1000/{number}", "title": [str(number) * 20]})
+        self.assertLessEqual(cache.size, cache.max_bytes)
+        self.assertIsNotNone(cache.get("10.1000/199"))
@@ -0,0 +1,29 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from asseeibot.models.wikimedia.wikidata.doi_bloom_filter import DoiBloomFilter, DoiBloomFilterBuilder
+
+
+class TestDoiBloomFilter(TestCase):
+
+    def test_build_and_lookup(self):
+        with TemporaryDirectory() as directory:
+            dump_filename = os.path.join(directory, "dois.csv")
+            with open(dump_filename, "w") as file:
+                file.write("\n".join(f"10.1000/{number}" for number in range(1000)))
+            filter_filename = os.path.join(directory, "filter.bin")
+            DoiBloomFilterBuilder(dump_filename=dump_filename,
+                                  false_positive_rate=0.01).build(filename=filter_filename)
+            bloom_filter = DoiBloomFilter(filename=filter_filename, max_age_seconds=3600)
+            self.assertEqual(bloom_filter.number_of_dois, 1000)
+            for number in range(1000):
+                self.assertIn(f"10.1000/{number}", bloom_filter)
+            false_positives = sum(f"10.2000/{number}" in bloom_filter for number in range(10000))
+            self.assertLess(false_positives, 300)
+            self.assertFalse(bloom_filter.is_stale)
+            self.assertTrue(bloom_filter.is_missing_in_wikidata("10.2000/a"))
+            self.assertFalse(bloom_filter.is_missing_in_wikidata("10.1000/1"))
+            # Negatives are not trusted when the dump is too old
+            stale_bloom_filter = DoiBloomFilter(filename=filter_filename, max_age_seconds=0)
+            self.assertFalse(stale_bloom_filter.is_missing_in_wikidata("10.2000/a"))
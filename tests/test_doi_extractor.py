@@ -0,0 +1,22 @@
+from unittest import TestCase
+
+from asseeibot.models.wikimedia.wikipedia.doi_extractor import extract_dois, ExtractedDoi
+
+
+class TestDoiExtractor(TestCase):
+
+    def test_extract_dois(self):
+        wikitext = (
+            "<ref>{{cite journal |title={{lang|fr|Le}} x |doi= 10.1000/abc.123 <!-- c --> |pmid=1}}</ref>"
+            "<ref>{{Cite book|doi=10.1000/book|title=x}}</ref> {{doi|10.1000/tmpl}} "
+            "[https://doi.org/10.1000/link%28x%29 link] {{citation | DOI = 10.1000/ABC.123 }}"
+        )
+        self.assertEqual(extract_dois(wikitext), [
+            ExtractedDoi(doi="10.1000/ABC.123", template="cite journal"),
+            ExtractedDoi(doi="10.1000/BOOK", template="cite book"),
+            ExtractedDoi(doi="10.1000/TMPL", template="doi"),
+            ExtractedDoi(doi="10.1000/LINK(X)", template=""),
+        ])
+
+    def test_no_doi(self):
+        self.assertEqual(extract_dois("{{cite web |url=https://example.com |doi=}}"), [])
@@ -0,0 +1,39 @@
+import json
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from asseeibot.models.wikimedia.wikidata.doi_index import DoiIndex, DoiIndexBuilder
+
+
+class TestDoiIndex(TestCase):
+
+    def test_build_from_extract(self):
+        with TemporaryDirectory() as directory:
+            dump_filename = os.path.join(directory, "p356.tsv")
+            with open(dump_filename, "w") as file:
+                file.write("item\tdoi\n"
+                           "http://www.wikidata.org/entity/Q1\t10.1000/a\n"
+                           "Q2\t10.1000/B\n"
+                           "Q3\t10.1000/a\n")
+            index_filename = os.path.join(directory, "index.bin")
+            builder = DoiIndexBuilder(dump_filename=dump_filename)
+            self.assertEqual(builder.build(filename=index_filename), 2)
+            self.assertEqual(builder.number_of_duplicates, 1)
+            index = DoiIndex(filename=index_filename, max_age_seconds=3600)
+            self.assertEqual(index.lookup("10.1000/A"), "Q1")
+            self.assertEqual(index.lookup("10.1000/B"), "Q2")
+            self.assertIsNone(index.lookup("10.1000/C"))
+            self.assertFalse(index.is_stale)
+
+    def test_build_from_json_dump(self):
+        with TemporaryDirectory() as directory:
+            dump_filename = os.path.join(directory, "latest-all.json")
+            entity = {"id": "Q42", "claims": {"P356": [
+                {"mainsnak": {"datavalue": {"value": "10.1000/xyz", "type": "string"}}}
+            ]}}
+            with open(dump_filename, "w") as file:
+                file.write("[\n" + json.dumps(entity) + ",\n" + json.dumps({"id": "Q1", "claims": {}}) + "\n]\n")
+            index_filename = os.path.join(directory, "index.bin")
+            DoiIndexBuilder(dump_filename=dump_filename).build(filename=index_filename)
+            self.assertEqual(DoiIndex(filename=index_filename).lookup("10.1000/XYZ"), "Q42")
@@ -0,0 +1,46 @@
+import asyncio
+from unittest import TestCase
+from unittest.mock import patch
+
+import config
+from asseeibot.models.wikimedia.enums import WikimediaSite
+from asseeibot.models.wikimedia.event_stream import EventStream
+from asseeibot.models.wikimedia.stream_checkpoint import StreamCheckpoint
+
+
+class TestEventStream(TestCase):
+    """Runs the whole pipeline on synthetic events without processing the pages
+    so the wiring of the stream, the caches and the workers is tested offline"""
+
+    def setUp(self):
+        # Everything is kept in memory
+        for name in ["wikitext_cache_filename", "crossref_cache_filename", "resolved_doi_cache_filename",
+                     "doi_index_filename", "doi_bloom_filter_filename"]:
+            patcher = patch.object(config, name, None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch("pywikibot.Site")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+
+    def test_synthetic_events(self):
+        with patch.object(config, "max_events", 0):
+            stream = EventStream(language_code="en", event_site=WikimediaSite.WIKIPEDIA,
+                                 synthetic_events=2000, process_events=False)
+        self.assertEqual(stream.number_of_events_read, 2000)
+        self.assertGreater(stream.event_count, 0)
+        self.assertEqual(stream.event_count, stream.number_of_events_queued)
+        self.assertEqual(len(stream.pages_in_flight), 0)
+
+    def test_max_events_stops_the_workers_and_saves_the_checkpoint(self):
+        with patch.object(config, "max_events", 5), patch.object(StreamCheckpoint, "save") as save:
+            stream = EventStream(language_code="en", event_site=WikimediaSite.WIKIPEDIA,
+                                 synthetic_events=100000, process_events=False)
+        # The workers that were busy when the limit was reached finish their events
+        self.assertGreaterEqual(stream.event_count, 5)
+        self.assertLess(stream.event_count, 5 + config.number_of_workers)
+        self.assertLess(stream.number_of_events_read, 100000)
+        save.assert_called_once()
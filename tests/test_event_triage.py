@@ -0,0 +1,33 @@
+import json
+from unittest import TestCase
+
+from asseeibot.models.wikimedia.event_triage import EventTriage, TriageRejection
+
+
+class TestEventTriage(TestCase):
+    article_edit = dict(server_name="en.wikipedia.org", namespace=0, type="edit",
+                        bot=False, title="Petrology", length=dict(old=100, new=120))
+
+    def __triage__(self, **changes):
+        triage = EventTriage(server_names=["en.wikipedia.org"], namespaces=[0],
+                             edit_types=["edit", "new"], skip_bot_edits=True,
+                             min_length_change=0)
+        event = dict(self.article_edit, **changes)
+        return triage, triage.triage(json.dumps(event))
+
+    def test_article_edit_is_accepted(self):
+        triage, event_data = self.__triage__()
+        self.assertEqual(event_data["title"], "Petrology")
+        self.assertEqual(triage.accepted, 1)
+
+    def test_rejections_are_counted(self):
+        for changes, reason in [
+            (dict(server_name="www.wikidata.org"), TriageRejection.SERVER_NAME),
+            (dict(namespace=1), TriageRejection.NAMESPACE),
+            (dict(type="log"), TriageRejection.EDIT_TYPE),
+            (dict(bot=True), TriageRejection.BOT),
+            (dict(length=dict(old=120, new=100)), TriageRejection.LENGTH_CHANGE),
+        ]:
+            triage, event_data = self.__triage__(**changes)
+            self.assertIsNone(event_data)
+            self.assertEqual(triage.rejections[reason], 1)
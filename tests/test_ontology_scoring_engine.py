@@ -0,0 +1,76 @@
+import random
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+from fuzzywuzzy import fuzz
+
+from asseeibot.models.ontology_scoring_engine import OntologyCandidate, OntologyScoringEngine
+
+
+class TestOntologyScoringEngine(TestCase):
+
+    def test_scores_are_the_same_as_fuzzywuzzy(self):
+        dataframe = pd.DataFrame(dict(
+            item=["Q1", "Q2", "Q3", "Q4"],
+            label=["Petrology", "Metrology", "Medicine metrology molecular climate", ""],
+            alias=["", "Study of rocks", "Petrology", "petrology"],
+            description=["", "", "", ""],
+        ))
+        engine = OntologyScoringEngine(dataframe=dataframe)
+        for subject in ["petrology", "Ecology, Evolution, Behavior and Systematics", ""]:
+            label_scores, alias_scores = engine.score(subject)
+            self.assertEqual(list(label_scores),
+                             [fuzz.ratio(label.lower(), subject.lower()) for label in dataframe.label])
+            self.assertEqual(list(alias_scores),
+                             [fuzz.ratio(alias.lower(), subject.lower()) for alias in dataframe.alias])
+        self.assertEqual(dataframe.columns.tolist(), ["item", "label", "alias", "description"])
+
+    def test_top_k(self):
+        scores = np.array([50, 90, 70, 90, 10, 70])
+        self.assertEqual(OntologyScoringEngine.top_k(scores, k=3),
+                         [OntologyCandidate(row=1, score=90),
+                          OntologyCandidate(row=3, score=90),
+                          OntologyCandidate(row=2, score=70)])
+        self.assertEqual(len(OntologyScoringEngine.top_k(scores, k=10)), 6)
+        self.assertEqual(OntologyScoringEngine.top_k(scores, k=0), [])
+
+    def test_top_candidates_are_the_same_as_scoring_every_row(self):
+        generator = random.Random(0)  # nosec B311 reproducible test data, not security
+        words = ["rock", "petrology", "metrology", "igneous", "organic", "chemistry", "science", "of"]
+
+        def phrase() -> str:
+            return " ".join(generator.choice(words) for _ in range(generator.randint(0, 3)))
+
+        dataframe = pd.DataFrame(dict(
+            label=[phrase() for _ in range(500)],
+            alias=[phrase() for _ in range(500)],
+        ))
+        engine = OntologyScoringEngine(dataframe=dataframe)
+        for _ in range(100):
+            subject = phrase()
+            if len(subject) > 0 and generator.random() < 0.5:
+                # A typo
+                position = generator.randrange(len(subject))
+                subject = subject[:position] + "x" + subject[position + 1:]
+            for threshold in [60, 82, 85, 100]:
+                expected = []
+                for scores in engine.score(subject):
+                    rows = np.flatnonzero(scores >= threshold)
+                    expected.append(OntologyScoringEngine.top_k(scores[rows], k=3, rows=rows))
+                self.assertEqual(engine.top_candidates(subject, k=3, label_threshold=threshold,
+                                                       alias_threshold=threshold),
+                                 tuple(expected))
+
+    def test_exact_candidates(self):
+        dataframe = pd.DataFrame(dict(
+            label=["Petrology", "Geology", "petrology", ""],
+            alias=["", "Earth science", "", "Geology"],
+        ))
+        engine = OntologyScoringEngine(dataframe=dataframe)
+        self.assertEqual(engine.exact_candidates("PETROLOGY", k=3),
+                         ([OntologyCandidate(row=0, score=100), OntologyCandidate(row=2, score=100)], []))
+        self.assertEqual(engine.exact_candidates("Geology", k=3),
+                         ([OntologyCandidate(row=1, score=100)], [OntologyCandidate(row=3, score=100)]))
+        self.assertEqual(engine.exact_candidates("Metrology", k=3), ([], []))
+        self.assertEqual(engine.exact_match_rate, 2 / 3)
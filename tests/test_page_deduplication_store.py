@@ -0,0 +1,45 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from asseeibot.models.wikimedia.page_deduplication_store import PageDeduplicationStore
+
+
+class TestPageDeduplicationStore(TestCase):
+
+    def test_seen_after_add(self):
+        store = PageDeduplicationStore(max_entries_in_memory=10)
+        key = store.key(server_name="en.wikipedia.org", page_title="Petrology")
+        self.assertFalse(store.seen(key))
+        store.add(key)
+        self.assertTrue(store.seen(key))
+        self.assertEqual(store.hit_rate, 0.5)
+
+    def test_least_recently_used_is_evicted(self):
+        store = PageDeduplicationStore(max_entries_in_memory=2)
+        keys = [store.key(server_name="en.wikipedia.org", page_title=title)
+                for title in ["A", "B", "C"]]
+        for key in keys:
+            store.add(key)
+        self.assertEqual(len(store), 2)
+        self.assertFalse(store.seen(keys[0]))
+        self.assertTrue(store.seen(keys[2]))
+
+    def test_reprocess_after_window(self):
+        store = PageDeduplicationStore(max_entries_in_memory=10,
+                                       reprocess_window_seconds=60)
+        key = store.key(server_name="en.wikipedia.org", page_title="Petrology")
+        store.memory_tier.set(key, 0)
+        self.assertFalse(store.seen(key))
+
+    def test_disk_tier_is_bounded(self):
+        with TemporaryDirectory() as directory:
+            store = PageDeduplicationStore(max_entries_in_memory=10,
+                                           sqlite_filename=os.path.join(directory, "pages.sqlite"),
+                                           max_entries_on_disk=5)
+            for number in range(10):
+                store.disk_tier.set(number, number)
+            store.__prune_the_disk_tier__()
+            self.assertEqual(len(store.disk_tier), 5)
+            self.assertIsNone(store.disk_tier.get(4))
+            self.assertEqual(store.disk_tier.get(9), 9)
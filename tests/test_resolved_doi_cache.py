@@ -0,0 +1,41 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from asseeibot.models.resolved_doi_cache import ResolvedDoi, ResolvedDoiCache
+
+
+class TestResolvedDoiCache(TestCase):
+
+    def test_ttls(self):
+        cache = ResolvedDoiCache(positive_ttl_seconds=3600, negative_ttl_seconds=0)
+        cache.add(ResolvedDoi(doi="10.1000/a", found_in_wikidata=True, qid="Q1",
+                              found_in_crossref=True, subjects=["Ecology"], matched_qids=["Q7150"]))
+        cache.add(ResolvedDoi(doi="10.1000/B"))
+        resolved_doi = cache.get("10.1000/A")
+        self.assertEqual(resolved_doi.qid, "Q1")
+        self.assertEqual(resolved_doi.matched_qids, ["Q7150"])
+        # The negative result expired right away
+        self.assertIsNone(cache.get("10.1000/B"))
+        self.assertIsNone(cache.get("10.1000/C"))
+        self.assertEqual(cache.positive_hits, 1)
+        self.assertEqual(cache.misses, 2)
+
+    def test_expired_dois_are_deleted_when_opened(self):
+        with TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "resolved_dois.sqlite")
+            cache = ResolvedDoiCache(filename=filename, positive_ttl_seconds=3600, negative_ttl_seconds=3600)
+            cache.add(ResolvedDoi(doi="10.1000/a", found_in_wikidata=True, qid="Q1"))
+            cache.add(ResolvedDoi(doi="10.1000/b"))
+            self.assertEqual(len(cache), 2)
+            # The negative result has expired when the cache is opened again
+            cache = ResolvedDoiCache(filename=filename, positive_ttl_seconds=3600, negative_ttl_seconds=0)
+            self.assertEqual(len(cache), 1)
+            self.assertIsNotNone(cache.get("10.1000/a"))
+
+    def test_the_oldest_dois_are_deleted(self):
+        cache = ResolvedDoiCache(positive_ttl_seconds=3600, negative_ttl_seconds=3600, max_dois=500)
+        for number in range(1000):
+            cache.add(ResolvedDoi(doi=f"10.1000/{number}"))
+        self.assertEqual(len(cache), 500)
+        self.assertIsNotNone(cache.get("10.1000/999"))
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+from typing import List
+from unittest import TestCase
+from unittest.mock import patch
+
+from asseeibot import runtime_variables
+from asseeibot.models.wikimedia.wikidata.hub_client import HubLookup, HubResult
+from asseeibot.models.wikimedia.wikidata.scientific_item import WikidataScientificItem
+
+
+class FakeHubClient:
+    """Nothing is found and the DOIs that were looked up are remembered"""
+
+    def __init__(self):
+        self.dois: List[str] = []
+
+    def lookup_blocking(self, doi: str) -> HubLookup:
+        self.dois.append(doi)
+        return HubLookup(result=HubResult.NOT_FOUND)
+
+
+class TestWikidataScientificItem(TestCase):
+
+    def lookup_via_hub(self, wikipedia_doi: str, crossref_doi: str) -> List[str]:
+        doi = SimpleNamespace(
+            value=wikipedia_doi,
+            found_in_crossref=True,
+            crossref=SimpleNamespace(work=SimpleNamespace(doi=crossref_doi))
+        )
+        hub_client = FakeHubClient()
+        with patch.object(runtime_variables, "hub_client", hub_client):
+            WikidataScientificItem(doi=doi, resolved_in_bulk=True).__lookup_via_hub__()
+        return hub_client.dois
+
+    def test_the_same_doi_is_not_looked_up_again_after_bulk(self):
+        self.assertEqual(self.lookup_via_hub(wikipedia_doi="10.1000/abc", crossref_doi="10.1000/ABC"), [])
+
+    def test_a_different_doi_from_crossref_is_looked_up_after_bulk(self):
+        self.assertEqual(self.lookup_via_hub(wikipedia_doi="10.1000/abc.", crossref_doi="10.1000/abc"),
+                         ["10.1000/abc"])
@@ -0,0 +1,47 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import pandas as pd
+
+from asseeibot.models.ontology_scoring_engine import OntologyScoringEngine
+from asseeibot.models.subject_match_table import SubjectMatchTable, SubjectMatchTableBuilder, subjects_to_look_up
+
+
+class TestSubjectMatchTable(TestCase):
+    dataframe = pd.DataFrame(dict(
+        item=["http://www.wikidata.org/entity/Q1", "http://www.wikidata.org/entity/Q2",
+              "http://www.wikidata.org/entity/Q3"],
+        label=["Petrology", "Geology", "Organic chemistry"],
+        alias=["", "Earth science", ""],
+        description=["", "", ""],
+    ))
+    settings = dict(k=3, label_threshold=82, alias_threshold=85)
+
+    def test_subjects_to_look_up(self):
+        self.assertEqual(subjects_to_look_up(" Geology and Petrology\n"),
+                         ["Geology and Petrology", "Geology", "Petrology"])
+        self.assertEqual(subjects_to_look_up("Ecology, Evolution"), ["Ecology, Evolution", "Ecology", "Evolution"])
+
+    def test_build_and_load(self):
+        engine = OntologyScoringEngine(dataframe=self.dataframe)
+        with TemporaryDirectory() as directory:
+            vocabulary_filename = os.path.join(directory, "subjects.txt")
+            with open(vocabulary_filename, "w") as file:
+                file.write("Geology and Petrology\nOrganic Chemistry\n\n")
+            filename = os.path.join(directory, "table.json")
+            number_of_subjects = SubjectMatchTableBuilder(vocabulary_filename=vocabulary_filename).build(
+                filename=filename, dataframe=self.dataframe, engine=engine, **self.settings
+            )
+            self.assertEqual(number_of_subjects, 4)
+            table = SubjectMatchTable.load(filename=filename, dataframe=self.dataframe, **self.settings)
+            self.assertEqual(table.get("petrology"), engine.top_candidates("Petrology", **self.settings))
+            self.assertEqual(table.get("Organic Chemistry")[0][0].row, 2)
+            self.assertIsNone(table.get("Metrology"))
+            self.assertEqual(table.hit_rate, 2 / 3)
+            # The rows don't match another version of the ontology
+            self.assertIsNone(SubjectMatchTable.load(filename=filename,
+                                                     dataframe=self.dataframe.iloc[::-1].reset_index(drop=True),
+                                                     **self.settings))
+            self.assertIsNone(SubjectMatchTable.load(filename=filename, dataframe=self.dataframe,
+                                                     k=1, label_threshold=82, alias_threshold=85))
@@ -0,0 +1,41 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from asseeibot.models.wikimedia.wikipedia.wikitext_cache import WikitextCache
+
+
+class TestWikitextCache(TestCase):
+
+    def test_cache_on_disk(self):
+        with TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "cache.sqlite")
+            cache = WikitextCache(filename=filename, max_revisions_in_memory=1)
+            cache.put(page_id=1, revision_id=10, wikitext="{{cite journal|doi=10.1000/a}}")
+            cache.put(page_id=1, revision_id=11, wikitext="no dois")
+            self.assertIn(10, cache)
+            self.assertNotIn(12, cache)
+            cache = WikitextCache(filename=filename)
+            revision = cache.get(10)
+            self.assertEqual(revision.page_id, 1)
+            self.assertEqual([extracted_doi.doi for extracted_doi in revision.extracted_dois], ["10.1000/A"])
+            self.assertIsNone(cache.get(12))
+            self.assertEqual(cache.hit_rate, 0.5)
+
+    def test_processed_dois(self):
+        cache = WikitextCache()
+        self.assertIsNone(cache.get_processed_dois_digest(page_id=1))
+        cache.set_processed_dois(page_id=1, dois=["10.1000/B", "10.1000/A"])
+        self.assertEqual(cache.get_processed_dois_digest(page_id=1),
+                         cache.dois_digest(["10.1000/A", "10.1000/B"]))
+
+    def test_same_content_reuses_the_dois_until_evicted(self):
+        cache = WikitextCache(max_revisions_in_memory=2)
+        first = cache.put(page_id=1, revision_id=10, wikitext="{{cite journal|doi=10.1000/a}}")
+        cache.put(page_id=1, revision_id=11, wikitext="{{cite journal|doi=10.1000/a}}")
+        self.assertEqual(cache.revisions_by_sha1[first.sha1], 2)
+        cache.put(page_id=1, revision_id=12, wikitext="no dois")
+        self.assertIn(first.sha1, cache.dois_by_sha1)
+        cache.put(page_id=1, revision_id=13, wikitext="still no dois")
+        self.assertNotIn(first.sha1, cache.dois_by_sha1)
+        self.assertEqual(len(cache.dois_by_sha1), 2)